@@ -0,0 +1,288 @@
+"""
+Compact, immutable representation of the contexts a user can access under each of their roles.
+"""
+
+import sys
+from collections.abc import Iterable, Set
+
+from django.conf import settings
+
+from edx_rbac.constants import ALL_ACCESS_CONTEXT, HIERARCHICAL_CONTEXT_SEPARATOR_SETTING
+
+# Marks a node of a `ContextTrie` whose context was assigned, granting access to everything below it.
+_GRANTED = object()
+
+
+def get_hierarchical_context_separator():
+    """
+    Return the separator between the segments of hierarchical contexts, or None if contexts are not hierarchical.
+    """
+    return getattr(settings, HIERARCHICAL_CONTEXT_SEPARATOR_SETTING, None)
+
+
+def _intern(context):
+    """
+    Intern string contexts, so that the many copies of a context held in memory share one object.
+    """
+    return sys.intern(context) if type(context) is str else context  # pylint: disable=unidiomatic-typecheck
+
+
+def _contexts_from_collection_or_single_item(obj):
+    """
+    Yield the items of a non-string iterable, or the object itself otherwise.
+    """
+    if isinstance(obj, Iterable) and not isinstance(obj, str):
+        yield from obj
+    else:
+        yield obj
+
+
+class ContextTrie:
+    """
+    Prefix trie over the segments of hierarchical contexts.
+
+    A context is covered by the trie if it, or any of its ancestors, was one of the contexts
+    the trie was built from.  Lookups walk at most one node per segment of the requested context.
+    """
+
+    __slots__ = ('separator', '_root')
+
+    def __init__(self, contexts, separator):
+        """
+        Build the trie from an iterable of contexts; contexts which are not strings are ignored.
+        """
+        self.separator = separator
+        self._root = {}
+        for context in contexts:
+            if not isinstance(context, str):
+                continue
+            node = self._root
+            for segment in context.split(separator):
+                node = node.setdefault(segment, {})
+                if _GRANTED in node:
+                    break
+            else:
+                # Everything below this node is now granted, so there's no need to keep it.
+                node.clear()
+                node[_GRANTED] = True
+
+    def covers(self, context):
+        """
+        Return True if the given context, or one of its ancestors, is in the trie.
+        """
+        if not isinstance(context, str):
+            return False
+        node = self._root
+        for segment in context.split(self.separator):
+            node = node.get(segment)
+            if node is None:
+                return False
+            if _GRANTED in node:
+                return True
+        return False
+
+
+class AccessMap(Set):
+    """
+    An immutable set of accessible contexts that remembers which role grants each of them.
+
+    An `AccessMap` behaves like a frozenset of contexts, so it can be used anywhere a set of
+    contexts is expected, and it additionally answers per-role questions.  Contexts are held
+    in one frozenset per role, and whether a role grants the "wildcard" `ALL_ACCESS_CONTEXT`
+    is computed once, on construction.
+
+    Roles whose contexts overflowed the JWT roles claim are tracked separately, as `overflow_roles`,
+    until they are resolved with `resolve_overflow()`.
+
+    When hierarchical contexts are enabled (see `get_hierarchical_context_separator()`), a
+    `ContextTrie` over the contexts is built the first time it's needed, and each context
+    grants access to every context below it.  Set operations always match contexts exactly.
+    """
+
+    __slots__ = ('_contexts_by_role', '_all_access_roles', '_contexts', '_overflow_roles', '_submaps', '_trie')
+
+    def __init__(self, contexts_by_role=None, overflow_roles=()):
+        """
+        Build an `AccessMap` from a dict of role name to an iterable of contexts.
+        """
+        self._initialize(
+            {
+                role_name: frozenset(_intern(context) for context in contexts)
+                for role_name, contexts in (contexts_by_role or {}).items()
+            },
+            frozenset(overflow_roles),
+        )
+
+    def _initialize(self, contexts_by_role, overflow_roles=frozenset()):
+        """
+        Populate the slots from a dict of role name to a frozenset of already-interned contexts.
+        """
+        self._contexts_by_role = contexts_by_role
+        self._overflow_roles = overflow_roles
+        self._all_access_roles = frozenset(
+            role_name for role_name, contexts in contexts_by_role.items() if ALL_ACCESS_CONTEXT in contexts
+        )
+        if len(contexts_by_role) == 1:
+            self._contexts = next(iter(contexts_by_role.values()))
+        else:
+            self._contexts = frozenset().union(*contexts_by_role.values())
+        self._submaps = {}
+        self._trie = None
+
+    @classmethod
+    def _from_contexts_by_role(cls, contexts_by_role, overflow_roles=frozenset()):
+        """
+        Build an `AccessMap` that shares the given frozensets of contexts instead of copying them.
+        """
+        access_map = cls.__new__(cls)
+        access_map._initialize(contexts_by_role, overflow_roles)
+        return access_map
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        Build an `AccessMap` from an iterable of ``(role_name, context)`` pairs.
+
+        As with `UserRoleAssignment.get_assignments()`, each context may be a single
+        context or a (non-string) collection of contexts.
+        """
+        contexts_by_role = {}
+        for role_name, context in pairs:
+            contexts_by_role.setdefault(role_name, set()).update(_contexts_from_collection_or_single_item(context))
+        return cls(contexts_by_role)
+
+    @classmethod
+    def _from_iterable(cls, it):
+        """
+        Set operations with plain sets produce a plain frozenset of contexts.
+        """
+        return frozenset(it)
+
+    @property
+    def roles(self):
+        """
+        The frozenset of role names which grant at least one context.
+        """
+        return frozenset(self._contexts_by_role)
+
+    @property
+    def overflow_roles(self):
+        """
+        The frozenset of role names whose contexts overflowed the JWT roles claim and are yet to be resolved.
+        """
+        return self._overflow_roles
+
+    def resolve_overflow(self, resolved_access_map):
+        """
+        Return the union of this map and `resolved_access_map`, with no overflow roles left.
+
+        `resolved_access_map` should hold the contexts of this map's overflow roles, as found in the
+        roles claim overflow source.
+        """
+        return self._from_contexts_by_role(self._contexts_by_role) | resolved_access_map
+
+    def contexts_for_role(self, role_name):
+        """
+        Return the frozenset of contexts accessible under the given role.
+        """
+        return self._contexts_by_role.get(role_name, frozenset())
+
+    def for_roles(self, role_names):
+        """
+        Return the `AccessMap` of the contexts accessible under any of the given roles.
+
+        The returned map shares its contexts with this one, and is memoized for each set of role names.
+        """
+        key = frozenset(role_names)
+        if key.issuperset(self._contexts_by_role) and key.issuperset(self._overflow_roles):
+            return self
+        submap = self._submaps.get(key)
+        if submap is None:
+            submap = self._from_contexts_by_role(
+                {
+                    role_name: contexts
+                    for role_name, contexts in self._contexts_by_role.items()
+                    if role_name in key
+                },
+                self._overflow_roles.intersection(key),
+            )
+            self._submaps[key] = submap
+        return submap
+
+    def has_access_to_all(self, role_names=None):
+        """
+        Return True if any of the given roles (or any role at all) grants the `ALL_ACCESS_CONTEXT`.
+        """
+        if role_names is None:
+            return bool(self._all_access_roles)
+        return any(role_name in self._all_access_roles for role_name in role_names)
+
+    def covers(self, context):
+        """
+        Return True if the given context is accessible, either exactly or, when hierarchical
+        contexts are enabled, through one of its ancestors.
+        """
+        if context in self._contexts:
+            return True
+        separator = get_hierarchical_context_separator()
+        if not separator:
+            return False
+        if self._trie is None or self._trie.separator != separator:
+            self._trie = ContextTrie(self._contexts, separator)
+        return self._trie.covers(context)
+
+    def grants(self, requested_context=None):
+        """
+        Return True if this map grants access to all of the requested contexts.
+
+        `requested_context` may be a single context or a collection of contexts; if it is
+        empty, access is granted as long as any context is accessible.
+        """
+        if not self._contexts:
+            return False
+        if not requested_context:
+            return True
+        if self._all_access_roles:
+            return True
+        return all(self.covers(context) for context in _contexts_from_collection_or_single_item(requested_context))
+
+    def __contains__(self, context):
+        """
+        Return True if the given context is exactly one of the accessible contexts.
+        """
+        return context in self._contexts
+
+    def __iter__(self):
+        """
+        Iterate over the accessible contexts.
+        """
+        return iter(self._contexts)
+
+    def __len__(self):
+        """
+        Return the number of accessible contexts.
+        """
+        return len(self._contexts)
+
+    def __or__(self, other):
+        """
+        The union of two `AccessMap` objects keeps track of roles; a union with a plain set does not.
+        """
+        if not isinstance(other, AccessMap):
+            return super().__or__(other)
+
+        contexts_by_role = dict(self._contexts_by_role)
+        for role_name, contexts in other._contexts_by_role.items():
+            if role_name in contexts_by_role:
+                contexts_by_role[role_name] = contexts_by_role[role_name] | contexts
+            else:
+                contexts_by_role[role_name] = contexts
+        return self._from_contexts_by_role(contexts_by_role, self._overflow_roles | other._overflow_roles)
+
+    __ror__ = __or__
+
+    def __repr__(self):
+        """
+        Return a representation of the contexts of each role.
+        """
+        return f'{self.__class__.__name__}({self._contexts_by_role!r})'
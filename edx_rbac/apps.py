@@ -3,6 +3,7 @@ edx_rbac Django application initialization.
 """
 
 from django.apps import AppConfig
+from django.core.signals import setting_changed
 
 
 class EdxRbacConfig(AppConfig):
@@ -11,3 +12,17 @@ class EdxRbacConfig(AppConfig):
     """
 
     name = 'edx_rbac'
+
+    def ready(self):
+        """
+        Compile the role mapping and role class settings and keep them in sync with setting changes.
+
+        Caches are invalidated by receivers connected to each model as it's created, in `edx_rbac.models`.
+        """
+        # pylint: disable=import-outside-toplevel
+        from edx_rbac import claims, role_mapping
+
+        role_mapping.compile_role_mapping()
+        setting_changed.connect(role_mapping.handle_setting_changed, dispatch_uid='edx_rbac.role_mapping')
+        claims.compile_claim_builder()
+        setting_changed.connect(claims.handle_setting_changed, dispatch_uid='edx_rbac.claims')
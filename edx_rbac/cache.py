@@ -0,0 +1,317 @@
+"""
+Cross-request caches for the 'edx-rbac' module.
+
+Every cache in here is opt-in via a Django setting; see the setting annotations in `constants.py`.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from edx_rbac.claims import get_roles_claim_version
+from edx_rbac.constants import (
+    ASSIGNMENT_CACHE_TIMEOUT_SETTING,
+    PARSED_ROLE_CLAIM_CACHE_SIZE_SETTING,
+    ROLES_CLAIM_CACHE_TIMEOUT_SETTING,
+    ROLES_CLAIM_MAX_BYTES_SETTING
+)
+from edx_rbac.role_mapping import get_role_mapping
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+_parsed_role_claim_cache = None
+
+
+class ParsedRoleClaimCache:
+    """
+    Size-bounded, per-process LRU cache of parsed JWT roles claims.
+
+    Entries are keyed by a fingerprint of the token and expire at the token's ``exp`` claim.
+    An entry is also discarded if the role mapping it was parsed with has since been recompiled.
+    """
+
+    def __init__(self, maxsize):
+        """
+        Create an empty cache holding at most `maxsize` entries.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(decoded_jwt):
+        """
+        Return a key identifying the roles claim of the given decoded JWT.
+
+        A verified token's ``jti`` (qualified by its issuer) identifies it uniquely; tokens
+        without one are identified by a hash of their roles claim.
+        """
+        if jti := decoded_jwt.get('jti'):
+            return ('jti', decoded_jwt.get('iss'), jti)
+        roles_claim = json.dumps(decoded_jwt.get('roles', []), separators=(',', ':'))
+        return ('roles', hashlib.sha256(roles_claim.encode('utf-8')).digest())
+
+    def get_or_parse(self, decoded_jwt, parse):
+        """
+        Return the cached result of ``parse(decoded_jwt)``, calling `parse` on a miss.
+        """
+        expires_at = decoded_jwt.get('exp')
+        if not isinstance(expires_at, (int, float)):
+            return parse(decoded_jwt)
+
+        key = self.fingerprint(decoded_jwt)
+        role_mapping = get_role_mapping()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_expires_at, entry_role_mapping, value = entry
+                if entry_expires_at > now and entry_role_mapping is role_mapping:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+
+        value = parse(decoded_jwt)
+        if expires_at > now:
+            with self._lock:
+                self._entries[key] = (expires_at, role_mapping, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """
+        Remove every entry and reset the hit and miss counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self):
+        """
+        Return a `CacheInfo` of the hit and miss counters and the current size of the cache.
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+
+def get_parsed_role_claim_cache():
+    """
+    Return the process-wide `ParsedRoleClaimCache`, or None if it is disabled.
+    """
+    global _parsed_role_claim_cache  # pylint: disable=global-statement
+    maxsize = getattr(settings, PARSED_ROLE_CLAIM_CACHE_SIZE_SETTING, 0)
+    if not maxsize:
+        return None
+    if _parsed_role_claim_cache is None or _parsed_role_claim_cache.maxsize != maxsize:
+        _parsed_role_claim_cache = ParsedRoleClaimCache(maxsize)
+    return _parsed_role_claim_cache
+
+
+def get_assignment_cache_timeout():
+    """
+    Return the timeout of the cross-request assignment cache in seconds, or None if it is disabled.
+    """
+    return getattr(settings, ASSIGNMENT_CACHE_TIMEOUT_SETTING, None)
+
+
+def _assignments_version_key(role_assignment_class, user_id):
+    """
+    Return the cache key of the version of a user's assignments of the given `UserRoleAssignment` subclass.
+    """
+    return f'edx_rbac.assignments.version.{role_assignment_class._meta.label_lower}.{user_id}'
+
+
+def _new_version():
+    """
+    Return a fresh version number.
+
+    Versions start from the current time rather than from 1, so that a version key which was evicted
+    from the cache never comes back with a version whose (stale) assignments are still cached.
+    """
+    return time.time_ns()
+
+
+def get_assignments_version(role_assignment_class, user_id):
+    """
+    Return the current version of a user's assignments of the given `UserRoleAssignment` subclass.
+    """
+    return get_assignments_versions([role_assignment_class], user_id)[0]
+
+
+def get_assignments_versions(role_assignment_classes, user_id):
+    """
+    Return the tuple of the current versions of a user's assignments of each of the given
+    `UserRoleAssignment` subclasses, read from the cache at once.
+    """
+    version_keys = [
+        _assignments_version_key(role_assignment_class, user_id) for role_assignment_class in role_assignment_classes
+    ]
+    versions = cache.get_many(version_keys)
+    if missing_keys := [version_key for version_key in version_keys if version_key not in versions]:
+        for version_key in missing_keys:
+            cache.add(version_key, _new_version(), None)
+        versions.update(cache.get_many(missing_keys))
+    return tuple(versions.get(version_key) for version_key in version_keys)
+
+
+async def aget_assignments_versions(role_assignment_classes, user_id):
+    """
+    Async counterpart of `get_assignments_versions()`.
+    """
+    version_keys = [
+        _assignments_version_key(role_assignment_class, user_id) for role_assignment_class in role_assignment_classes
+    ]
+    versions = await cache.aget_many(version_keys)
+    if missing_keys := [version_key for version_key in version_keys if version_key not in versions]:
+        for version_key in missing_keys:
+            await cache.aadd(version_key, _new_version(), None)
+        versions.update(await cache.aget_many(missing_keys))
+    return tuple(versions.get(version_key) for version_key in version_keys)
+
+
+def bump_assignments_version(role_assignment_class, user_id):
+    """
+    Invalidate every cached assignment of a user of the given `UserRoleAssignment` subclass.
+    """
+    version_key = _assignments_version_key(role_assignment_class, user_id)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, _new_version(), None)
+
+
+def get_user_assignments(role_assignment_class, user):
+    """
+    Return the list of all of the user's ``(role_name, context)`` assignments of the given `UserRoleAssignment`
+    subclass, from the cross-request assignment cache when it is enabled.
+    """
+    timeout = get_assignment_cache_timeout()
+    if not timeout or user.is_anonymous:
+        return list(role_assignment_class.get_assignments(user))
+
+    version = get_assignments_version(role_assignment_class, user.pk)
+    key = f'edx_rbac.assignments.{role_assignment_class._meta.label_lower}.{user.pk}.{version}'
+    assignments = cache.get(key)
+    if assignments is None:
+        assignments = list(role_assignment_class.get_assignments(user))
+        cache.set(key, assignments, timeout)
+    return assignments
+
+
+async def aget_user_assignments(role_assignment_class, user):
+    """
+    Async counterpart of `get_user_assignments()`.
+    """
+    timeout = get_assignment_cache_timeout()
+    if not timeout or user.is_anonymous:
+        return [pair async for pair in role_assignment_class.aget_assignments(user)]
+
+    version, = await aget_assignments_versions([role_assignment_class], user.pk)
+    key = f'edx_rbac.assignments.{role_assignment_class._meta.label_lower}.{user.pk}.{version}'
+    assignments = await cache.aget(key)
+    if assignments is None:
+        assignments = [pair async for pair in role_assignment_class.aget_assignments(user)]
+        await cache.aset(key, assignments, timeout)
+    return assignments
+
+
+def get_roles_claim_cache_timeout():
+    """
+    Return the timeout of the roles claim cache in seconds, or None if it is disabled.
+    """
+    return getattr(settings, ROLES_CLAIM_CACHE_TIMEOUT_SETTING, None)
+
+
+def get_or_build_roles_claim(claim_builder, user, claim_version=None, max_claim_bytes=None, deadline=None):
+    """
+    Return the roles claim of the user built by the given `ClaimBuilder`, from the roles claim cache when it is
+    enabled.
+
+    Cached claims are keyed by the versions of the user's assignments of every model source of the
+    builder, so they're invalidated whenever one of those assignments is saved or deleted.  A claim
+    which left out sources that overran the given `ClaimDeadline` is not cached.
+    """
+    timeout = get_roles_claim_cache_timeout()
+    if not timeout or user.is_anonymous:
+        return claim_builder.build(user, claim_version, max_claim_bytes, deadline)
+
+    versions = get_assignments_versions(claim_builder.model_sources, user.pk)
+    key = _roles_claim_key(claim_builder, user, claim_version, max_claim_bytes, versions)
+    claim = cache.get(key)
+    if claim is None:
+        claim = claim_builder.build(user, claim_version, max_claim_bytes, deadline)
+        if not (deadline and deadline.skipped_locations):
+            cache.set(key, claim, timeout)
+    return claim
+
+
+async def aget_or_build_roles_claim(claim_builder, user, claim_version=None, max_claim_bytes=None, deadline=None):
+    """
+    Async counterpart of `get_or_build_roles_claim()`.
+    """
+    timeout = get_roles_claim_cache_timeout()
+    if not timeout or user.is_anonymous:
+        return await claim_builder.abuild(user, claim_version, max_claim_bytes, deadline)
+
+    versions = await aget_assignments_versions(claim_builder.model_sources, user.pk)
+    key = _roles_claim_key(claim_builder, user, claim_version, max_claim_bytes, versions)
+    claim = await cache.aget(key)
+    if claim is None:
+        claim = await claim_builder.abuild(user, claim_version, max_claim_bytes, deadline)
+        if not (deadline and deadline.skipped_locations):
+            await cache.aset(key, claim, timeout)
+    return claim
+
+
+def _roles_claim_key(claim_builder, user, claim_version, max_claim_bytes, versions):
+    """
+    Return the cache key of the roles claim of the user, given the versions of their assignments.
+    """
+    claim_options = [
+        claim_builder.locations,
+        claim_version or get_roles_claim_version(),
+        max_claim_bytes or getattr(settings, ROLES_CLAIM_MAX_BYTES_SETTING, None),
+        versions,
+    ]
+    fingerprint = hashlib.sha256(json.dumps(claim_options).encode('utf-8')).hexdigest()
+    return f'edx_rbac.roles_claim.{user.pk}.{fingerprint}'
+
+
+def handle_assignment_changed(sender, instance, **kwargs):
+    """
+    Invalidate the cached assignments and roles claims of the user of a `UserRoleAssignment` that was saved or deleted.
+    """
+    handle_assignments_changed(sender, [instance.user_id])
+
+
+def handle_assignments_changed(role_assignment_class, user_ids):
+    """
+    Invalidate the cached assignments and roles claims of the given users of a `UserRoleAssignment` subclass.
+
+    Call this after changes which send no signals, like ``bulk_create()``.  The versions are bumped right away,
+    so that the rest of the transaction sees the changes, and again once the transaction commits, so that
+    assignments read and cached by other processes before then are dropped.
+    """
+    if not (get_assignment_cache_timeout() or get_roles_claim_cache_timeout()):
+        return
+    user_ids = list(user_ids)
+
+    def bump_assignments_versions():
+        for user_id in user_ids:
+            bump_assignments_version(role_assignment_class, user_id)
+
+    bump_assignments_versions()
+    transaction.on_commit(bump_assignments_versions)
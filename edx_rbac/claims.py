@@ -0,0 +1,609 @@
+"""
+Encoding and decoding of the JWT roles claim.
+
+Two versions of the roles claim exist:
+
+* Version 1 (legacy) is a list with one string per (role, context) pair: ``'role:context'``,
+  or just ``'role'`` for a role without a context.
+
+      ['enterprise_admin:uuid-1', 'enterprise_admin:uuid-2', 'enterprise_learner']
+
+* Version 2 (compact) is an object that names each role once and lists its contexts under it,
+  using the empty string for a role without a context.
+
+      {'v': 2, 'r': {'enterprise_admin': ['uuid-1', 'uuid-2'], 'enterprise_learner': ['']}}
+
+Readers understand both versions transparently.
+
+Claims are built by a `ClaimBuilder`, compiled once from the ``SYSTEM_WIDE_ROLE_CLASSES`` setting.
+
+Creating a claim may be given a `ClaimDeadline`, which bounds how long function sources are waited for.
+
+Either version may be limited to a maximum size.  The contexts of a role that don't fit are then
+replaced by the single `ROLES_CLAIM_OVERFLOW_CONTEXT` marker, which tells readers to look that
+role's contexts up from the configured overflow source.
+"""
+
+import asyncio
+import contextvars
+import importlib
+import inspect
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, models
+from edx_django_utils.monitoring import increment, set_custom_attribute
+
+from edx_rbac.constants import (
+    ROLE_SOURCE_BUDGETS_SETTING,
+    ROLE_SOURCE_THREADS_SETTING,
+    ROLES_CLAIM_MAX_BYTES_SETTING,
+    ROLES_CLAIM_OVERFLOW_CONTEXT,
+    ROLES_CLAIM_OVERFLOW_SOURCE_SETTING,
+    ROLES_CLAIM_TIMEOUT_SETTING,
+    ROLES_CLAIM_VERSION_COMPACT,
+    ROLES_CLAIM_VERSION_LEGACY,
+    ROLES_CLAIM_VERSION_SETTING
+)
+
+logger = getLogger(__name__)
+
+VERSION_KEY = 'v'
+ROLES_KEY = 'r'
+
+SYSTEM_WIDE_ROLE_CLASSES_SETTING = 'SYSTEM_WIDE_ROLE_CLASSES'
+
+# Number of users whose assignments `ClaimBuilder.build_for_users()` fetches at a time.
+CLAIMS_CHUNK_SIZE = 500
+
+_claim_builder = None
+
+# The ``(max_workers, executor)`` of the thread pool function sources are called on, if any.
+_role_source_executor = (None, None)
+_role_source_executor_lock = threading.Lock()
+
+
+def get_roles_claim_version():
+    """
+    Return the configured version of the roles claim to create.
+    """
+    return getattr(settings, ROLES_CLAIM_VERSION_SETTING, ROLES_CLAIM_VERSION_LEGACY)
+
+
+def encode_roles_claim(pairs, version=None, max_bytes=None):
+    """
+    Encode an ordered iterable of ``(role, context)`` string pairs as a roles claim of the given version.
+
+    An empty context denotes a role without a context.  The order of the pairs is preserved,
+    except that the compact version groups every context of a role at that role's first appearance.
+
+    If `max_bytes` is given (or configured with the ``RBAC_ROLES_CLAIM_MAX_BYTES`` setting),
+    the contexts of each role that doesn't fit in the remaining budget are replaced by the
+    `ROLES_CLAIM_OVERFLOW_CONTEXT` marker.  Overflow markers are always kept, so a claim may exceed
+    a budget that is too small to hold them.
+    """
+    version = version or get_roles_claim_version()
+    if version not in (ROLES_CLAIM_VERSION_LEGACY, ROLES_CLAIM_VERSION_COMPACT):
+        raise ValueError(f'Unknown roles claim version: {version}')
+
+    pairs = list(dict.fromkeys(pairs))
+    max_bytes = max_bytes or getattr(settings, ROLES_CLAIM_MAX_BYTES_SETTING, None)
+    if max_bytes and (overflowed_roles := _overflowed_roles(pairs, version, max_bytes)):
+        pairs = list(dict.fromkeys(
+            (role, ROLES_CLAIM_OVERFLOW_CONTEXT if role in overflowed_roles else context) for role, context in pairs
+        ))
+
+    if version == ROLES_CLAIM_VERSION_LEGACY:
+        return list(dict.fromkeys(f'{role}:{context}' if context else role for role, context in pairs))
+
+    contexts_by_role = {}
+    for role, context in pairs:
+        contexts_by_role.setdefault(role, []).append(context)
+    return {VERSION_KEY: ROLES_CLAIM_VERSION_COMPACT, ROLES_KEY: contexts_by_role}
+
+
+def _json_size(value):
+    """
+    Return the size in bytes of `value` serialized as compact JSON, the way it's serialized in a JWT.
+    """
+    return len(json.dumps(value, separators=(',', ':')))
+
+
+def _overflowed_roles(pairs, version, max_bytes):
+    """
+    Return the set of roles whose contexts don't fit in a claim of `max_bytes`, filling the claim in role order.
+    """
+    contexts_by_role = {}
+    for role, context in pairs:
+        contexts_by_role.setdefault(role, []).append(context)
+
+    # Each cost includes the comma which separates the role's entries from the next ones.
+    if version == ROLES_CLAIM_VERSION_LEGACY:
+        remaining_bytes = max_bytes - _json_size([])
+
+        def cost(role, contexts):
+            return sum(_json_size(f'{role}:{context}' if context else role) + 1 for context in contexts)
+    else:
+        remaining_bytes = max_bytes - _json_size({VERSION_KEY: ROLES_CLAIM_VERSION_COMPACT, ROLES_KEY: {}})
+
+        def cost(role, contexts):
+            # The role, a colon, the list of contexts and a comma.
+            return _json_size(role) + 1 + _json_size(contexts) + 1
+
+    overflowed_roles = set()
+    for role, contexts in contexts_by_role.items():
+        role_cost = cost(role, contexts)
+        if role_cost > remaining_bytes:
+            overflowed_roles.add(role)
+            role_cost = cost(role, [ROLES_CLAIM_OVERFLOW_CONTEXT])
+        remaining_bytes -= role_cost
+    return overflowed_roles
+
+
+def iter_roles_claim(roles_claim):
+    """
+    Yield the ``(role, context)`` pairs of a roles claim of any version.
+
+    The context of a role without a context is the empty string.  A claim of an unknown
+    version grants nothing.
+    """
+    if isinstance(roles_claim, dict):
+        if roles_claim.get(VERSION_KEY) != ROLES_CLAIM_VERSION_COMPACT:
+            logger.warning(
+                '[edx_rbac.iter_roles_claim] Ignoring roles claim of unknown version: %s',
+                roles_claim.get(VERSION_KEY),
+            )
+            return
+        for role, contexts in roles_claim.get(ROLES_KEY, {}).items():
+            for context in contexts:
+                yield role, context
+        return
+
+    for role_data in roles_claim:
+        # split should be more robust because of our cousekeys having colons
+        role, __, context = role_data.partition(':')
+        yield role, context
+
+
+def iter_claim_pairs(pairs):
+    """
+    Normalize the ``(role, context)`` pairs of a role source into the string pairs held by a roles claim.
+
+    A context may be a single context or a (non-string) collection of contexts, and a role without
+    a context gets the empty string as its context.
+    """
+    for role, context in pairs:
+        if context:
+            if isinstance(context, str):
+                yield role, context
+            else:
+                for item in context:
+                    yield role, f'{item}' if item else ''
+        else:
+            yield role, ''
+
+
+def load_role_source(location):
+    """
+    Return the function or `UserRoleAssignment` model found at the given location.
+
+    As in the ``SYSTEM_WIDE_ROLE_CLASSES`` setting, the location is either the dotted path
+    of a function or the ``app_label.ModelName`` of a model.
+    """
+    # location can either be a module or a django model
+    module_name, attr_name = location.rsplit('.', 1)
+    try:
+        # first, assume that this is a plain function
+        module = importlib.import_module(module_name)
+        return getattr(module, attr_name)
+    except (ImportError, AttributeError):
+        # otherwise, assume that it's a django model
+        return apps.get_model(module_name, attr_name)
+
+
+def iter_role_source(source, user, role_names=None):
+    """
+    Yield the ``(role, context)`` pairs of the given user from a source returned by `load_role_source()`.
+
+    If `role_names` is given, only the pairs of those roles are yielded.
+    """
+    if _is_model(source):
+        yield from source.get_assignments(user, role_names)
+        return
+
+    for role, context in source(user):
+        if not role_names or role in role_names:
+            yield role, context
+
+
+async def aiter_role_source(source, user, role_names=None):
+    """
+    Async counterpart of `iter_role_source()`.
+
+    Model sources are read with the async ORM.  A function source may be an async generator function,
+    which is iterated on the event loop; any other function is called in a thread.
+    """
+    if _is_model(source):
+        async for role, context in source.aget_assignments(user, role_names):
+            yield role, context
+        return
+
+    if inspect.isasyncgenfunction(source):
+        pairs = source(user)
+    else:
+        pairs = await sync_to_async(lambda: list(source(user)))()
+    async for role, context in _as_async_iterator(pairs):
+        if not role_names or role in role_names:
+            yield role, context
+
+
+async def _as_async_iterator(iterable):
+    """
+    Yield the items of an iterable or of an async iterable.
+    """
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+def get_role_source_executor():
+    """
+    Return the per-process thread pool function sources are called on, or None if it is disabled.
+    """
+    global _role_source_executor  # pylint: disable=global-statement
+    max_workers = getattr(settings, ROLE_SOURCE_THREADS_SETTING, None)
+    if not max_workers:
+        return None
+    with _role_source_executor_lock:
+        if _role_source_executor[0] != max_workers:
+            if _role_source_executor[1] is not None:
+                _role_source_executor[1].shutdown(wait=False)
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='edx_rbac.role_source')
+            _role_source_executor = (max_workers, executor)
+        return _role_source_executor[1]
+
+
+def _list_role_source(source, user):
+    """
+    Return the list of the ``(role, context)`` pairs of a function source, called on a thread of the pool.
+    """
+    try:
+        return list(iter_role_source(source, user))
+    finally:
+        # Like the end of a request, release the connection this thread may have opened.
+        close_old_connections()
+
+
+def get_roles_claim_overflow_source():
+    """
+    Return the source configured to resolve roles that overflowed the roles claim, or None.
+    """
+    location = getattr(settings, ROLES_CLAIM_OVERFLOW_SOURCE_SETTING, None)
+    return load_role_source(location) if location else None
+
+
+def _is_model(source):
+    """
+    Return True if the given role source is a model, rather than a function.
+    """
+    return isinstance(source, type) and issubclass(source, models.Model)
+
+
+def get_assignments_of_classes(user, role_assignment_classes, role_names=None):
+    """
+    Return a dict of each of the given `UserRoleAssignment` subclasses to the list of the user's
+    (rolename, context) assignments of that class.
+
+    The assignments of every class for which `get_assignment_rows()` is supported are fetched
+    together, with a single ``UNION ALL`` query ordered by class and primary key; those of other
+    classes with `get_assignments()`.
+    """
+    assignments = get_assignments_of_classes_for_users([user], role_assignment_classes, role_names)
+    return {
+        role_assignment_class: assignments_by_user.get(user.pk, [])
+        for role_assignment_class, assignments_by_user in assignments.items()
+    }
+
+
+async def aget_assignments_of_classes(user, role_assignment_classes, role_names=None):
+    """
+    Async counterpart of `get_assignments_of_classes()`.
+    """
+    role_assignment_classes = list(role_assignment_classes)
+    assignments = {role_assignment_class: [] for role_assignment_class in role_assignment_classes}
+    if user.is_anonymous:
+        return assignments
+
+    querysets = []
+    for source, role_assignment_class in enumerate(role_assignment_classes):
+        role_catalog = None
+        if role_names:
+            # pylint: disable=protected-access
+            role_catalog = await role_assignment_class._aget_role_catalog(role_names)
+        rows = role_assignment_class._assignment_rows(  # pylint: disable=protected-access
+            role_catalog, [user.pk], role_names, source
+        )
+        if rows is None:
+            assignments[role_assignment_class] = [
+                pair async for pair in role_assignment_class.aget_assignments(user, role_names)
+            ]
+        else:
+            querysets.append(rows)
+
+    if querysets:
+        rows = querysets[0].union(*querysets[1:], all=True) if len(querysets) > 1 else querysets[0]
+        async for source, __, role_name, context, __ in rows.order_by('rbac_source', 'pk'):
+            assignments[role_assignment_classes[source]].append((role_name, context))
+    return assignments
+
+
+def get_assignments_of_classes_for_users(users, role_assignment_classes, role_names=None):
+    """
+    Like `get_assignments_of_classes()`, but for several users at once: return a dict of each of the given
+    `UserRoleAssignment` subclasses to a dict of the primary key of each user to their assignments of that class.
+
+    There is one query for all the classes which support `get_assignment_rows()`, and one per other class.
+    """
+    users = list(users)
+    role_assignment_classes = list(role_assignment_classes)
+    user_ids = [user.pk for user in users if not user.is_anonymous]
+    assignments = {
+        role_assignment_class: {user_id: [] for user_id in user_ids}
+        for role_assignment_class in role_assignment_classes
+    }
+    if not user_ids:
+        return assignments
+
+    querysets = []
+    for source, role_assignment_class in enumerate(role_assignment_classes):
+        rows = role_assignment_class.get_assignment_rows(user_ids, role_names, source)
+        if rows is None:
+            assignments[role_assignment_class] = role_assignment_class.get_assignments_for_users(users, role_names)
+        else:
+            querysets.append(rows)
+
+    if querysets:
+        rows = querysets[0].union(*querysets[1:], all=True) if len(querysets) > 1 else querysets[0]
+        for source, user_id, role_name, context, __ in rows.order_by('rbac_source', 'pk'):
+            assignments[role_assignment_classes[source]][user_id].append((role_name, context))
+    return assignments
+
+
+async def _alist(aiterable):
+    """
+    Return the list of the items of an async iterable.
+    """
+    return [item async for item in aiterable]
+
+
+class ClaimDeadline:
+    """
+    The overall deadline of the creation of a roles claim, and the time budget of each of its function sources.
+
+    Function sources which overrun either of them are logged, recorded in `overrun_locations` and reported
+    to monitoring, with the ``edx_rbac.role_source_overruns`` counter and the ``edx_rbac.overrun_role_sources``
+    custom attribute.  Those that were left out of the claim are also recorded in `skipped_locations`.
+    """
+
+    def __init__(self, timeout=None, source_budgets=None):
+        """
+        Start the clock: the deadline is `timeout` seconds from now, and `source_budgets` is a dict of the
+        location of a function source to the number of seconds it's given from when it's called.
+        """
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + timeout if timeout else None
+        self.source_budgets = dict(source_budgets or {})
+        self.overrun_locations = []
+        self.skipped_locations = []
+
+    @classmethod
+    def from_settings(cls, timeout=None, source_budgets=None):
+        """
+        Return a `ClaimDeadline` with the given limits, or else the configured ones, or None if there are none.
+        """
+        timeout = timeout or getattr(settings, ROLES_CLAIM_TIMEOUT_SETTING, None)
+        source_budgets = source_budgets or getattr(settings, ROLE_SOURCE_BUDGETS_SETTING, None)
+        return cls(timeout, source_budgets) if timeout or source_budgets else None
+
+    def expired(self):
+        """
+        Return True if the overall deadline has passed.
+        """
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self, location, called_at):
+        """
+        Return the number of seconds left to the source at `location`, called at `called_at`, or None if unlimited.
+        """
+        limits = [] if self.deadline is None else [self.deadline]
+        if (budget := self.source_budgets.get(location)) is not None:
+            limits.append(called_at + budget)
+        return max(0, min(limits) - time.monotonic()) if limits else None
+
+    def record_overrun(self, location, skipped):
+        """
+        Report that the source at `location` overran its budget or the deadline, and whether it was left out.
+        """
+        self.overrun_locations.append(location)
+        if skipped:
+            self.skipped_locations.append(location)
+        logger.warning(
+            '[edx_rbac.ClaimDeadline] Role source %s overran its time budget%s.',
+            location, ' and was left out of the roles claim' if skipped else '',
+        )
+        increment('edx_rbac.role_source_overruns')
+        set_custom_attribute('edx_rbac.overrun_role_sources', ','.join(self.overrun_locations))
+
+
+class ClaimBuilder:
+    """
+    Builds the roles claim of users from role sources resolved once, ahead of time.
+    """
+
+    def __init__(self, locations):
+        """
+        Resolve the given role source locations, as found in the ``SYSTEM_WIDE_ROLE_CLASSES`` setting.
+        """
+        self.locations = tuple(locations)
+        self.sources = tuple(load_role_source(location) for location in self.locations)
+        self.model_sources = tuple(dict.fromkeys(source for source in self.sources if _is_model(source)))
+
+    def iter_pairs(self, user, assignments=None, deadline=None):
+        """
+        Yield the ``(role, context)`` string pairs of the user from every source, in the order of the sources.
+
+        The assignments of every model source are fetched before the first pair is yielded, unless they are
+        given as `assignments`, a dict of each model source to the list of the user's assignments.
+
+        When the ``RBAC_ROLE_SOURCE_THREADS`` setting is configured, the function sources are called
+        concurrently, on a thread pool, meanwhile.
+
+        If a `ClaimDeadline` is given, function sources are waited for until it, or their budget, runs out.
+        """
+        pending_pairs = self._submit_function_sources(user, deadline)
+        if assignments is None:
+            assignments = get_assignments_of_classes(user, self.model_sources) if self.model_sources else {}
+        for location, source in zip(self.locations, self.sources):
+            if source in assignments:
+                yield from iter_claim_pairs(assignments[source])
+            elif source in pending_pairs:
+                yield from iter_claim_pairs(self._await_function_source(location, *pending_pairs[source], deadline))
+            else:
+                yield from iter_claim_pairs(self._call_function_source(location, source, user, deadline))
+
+    def _submit_function_sources(self, user, deadline=None):
+        """
+        Submit a call of every function source for the user to the thread pool, if it is enabled.
+
+        Returns a dict of each function source to the future of the list of its pairs and the time it was submitted.
+        Each call runs in a copy of the current context, so sources see the current request (see
+        `edx_rbac.request_cache`).
+        """
+        executor = get_role_source_executor()
+        if executor is None or (len(self.sources) < 2 and deadline is None):
+            return {}
+        return {
+            source: (executor.submit(contextvars.copy_context().run, _list_role_source, source, user), time.monotonic())
+            for source in dict.fromkeys(self.sources)
+            if not _is_model(source)
+        }
+
+    @staticmethod
+    def _await_function_source(location, future, submitted_at, deadline=None):
+        """
+        Return the pairs of a function source called on the thread pool, or none if it overran the deadline.
+        """
+        try:
+            return future.result(deadline.remaining(location, submitted_at) if deadline else None)
+        except TimeoutError:
+            if future.done():
+                # The source itself raised the error, or just returned.
+                return future.result()
+            future.cancel()
+            deadline.record_overrun(location, skipped=True)
+            return []
+
+    @staticmethod
+    def _call_function_source(location, source, user, deadline=None):
+        """
+        Return the pairs of a function source called inline, or none if the deadline passed before its turn.
+
+        A source can't be interrupted once it's called, so one which overruns is kept, but reported.
+        """
+        if deadline is None:
+            return iter_role_source(source, user)
+        if deadline.expired():
+            deadline.record_overrun(location, skipped=True)
+            return []
+        called_at = time.monotonic()
+        pairs = list(iter_role_source(source, user))
+        if deadline.remaining(location, called_at) == 0:
+            deadline.record_overrun(location, skipped=False)
+        return pairs
+
+    def build(self, user, claim_version=None, max_claim_bytes=None, deadline=None):
+        """
+        Return the roles claim of the user; see `encode_roles_claim()` and `iter_pairs()` for the arguments.
+        """
+        return encode_roles_claim(self.iter_pairs(user, deadline=deadline), claim_version, max_claim_bytes)
+
+    async def abuild(self, user, claim_version=None, max_claim_bytes=None, deadline=None):
+        """
+        Async counterpart of `build()`.
+
+        Model sources are read with the async ORM; function sources as described in `aiter_role_source()`.
+        Waiting for a function source is cancelled once the `ClaimDeadline`, if any, or its budget runs out,
+        although a function called in a thread keeps running there until it returns.
+        """
+        assignments = await aget_assignments_of_classes(user, self.model_sources) if self.model_sources else {}
+        pairs = []
+        for location, source in zip(self.locations, self.sources):
+            if source in assignments:
+                pairs.extend(iter_claim_pairs(assignments[source]))
+            elif deadline is None:
+                pairs.extend(iter_claim_pairs(await _alist(aiter_role_source(source, user))))
+            else:
+                try:
+                    source_pairs = await asyncio.wait_for(
+                        _alist(aiter_role_source(source, user)), deadline.remaining(location, time.monotonic())
+                    )
+                except TimeoutError:
+                    deadline.record_overrun(location, skipped=True)
+                else:
+                    pairs.extend(iter_claim_pairs(source_pairs))
+        return encode_roles_claim(pairs, claim_version, max_claim_bytes)
+
+    def build_for_users(self, users, claim_version=None, max_claim_bytes=None, chunk_size=CLAIMS_CHUNK_SIZE):
+        """
+        Return a dict of each of the given users to their roles claim, identical to the one `build()` returns.
+
+        The assignments of the model sources are fetched for `chunk_size` users at a time, with the same
+        queries as for a single user.  Function sources are still called once per user.
+        """
+        users = list(users)
+        claims = {}
+        for start in range(0, len(users), chunk_size):
+            chunk = users[start:start + chunk_size]
+            assignments = get_assignments_of_classes_for_users(chunk, self.model_sources)
+            for user in chunk:
+                user_assignments = {
+                    source: assignments_by_user.get(user.pk, [])
+                    for source, assignments_by_user in assignments.items()
+                }
+                claims[user] = encode_roles_claim(
+                    self.iter_pairs(user, user_assignments), claim_version, max_claim_bytes
+                )
+        return claims
+
+
+def compile_claim_builder():
+    """
+    Compile the ``SYSTEM_WIDE_ROLE_CLASSES`` setting into the active `ClaimBuilder`.
+    """
+    global _claim_builder  # pylint: disable=global-statement
+    _claim_builder = ClaimBuilder(getattr(settings, SYSTEM_WIDE_ROLE_CLASSES_SETTING, []))
+    return _claim_builder
+
+
+def get_claim_builder():
+    """
+    Return the active `ClaimBuilder`, compiling it first if necessary.
+    """
+    return _claim_builder or compile_claim_builder()
+
+
+def handle_setting_changed(setting, **kwargs):
+    """
+    Recompile the claim builder when ``SYSTEM_WIDE_ROLE_CLASSES`` is changed, e.g. by ``override_settings``.
+    """
+    if setting == SYSTEM_WIDE_ROLE_CLASSES_SETTING:
+        compile_claim_builder()
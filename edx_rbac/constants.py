@@ -14,3 +14,104 @@ ALL_ACCESS_CONTEXT = '*'
 # .. toggle_use_cases: opt_in
 # .. toggle_creation_date: 2024-08-19
 IGNORE_INVALID_JWT_COOKIE_SETTING = 'RBAC_IGNORE_INVALID_JWT_COOKIE'
+
+# .. setting_name: RBAC_PARSED_ROLE_CLAIM_CACHE_SIZE
+# .. setting_default: 0
+# .. setting_description: Maximum number of parsed JWT roles claims to keep in a per-process LRU cache,
+#   so that a JWT presented on many requests only has its roles claim parsed once.  Entries are keyed
+#   by the token's ``jti`` (or a hash of its roles claim) and are never served after the token's ``exp``.
+#   Tokens without an ``exp`` claim are never cached.  A value of 0 disables the cache.
+PARSED_ROLE_CLAIM_CACHE_SIZE_SETTING = 'RBAC_PARSED_ROLE_CLAIM_CACHE_SIZE'
+
+# .. setting_name: RBAC_HIERARCHICAL_CONTEXT_SEPARATOR
+# .. setting_default: None
+# .. setting_description: When set, contexts are treated as hierarchical paths whose segments are joined by
+#   this separator, and a context that is assigned to a user also grants access to every context below it.
+#   For example, with a separator of ``'+'``, an assignment on ``'course-v1:edX'`` grants access to
+#   ``'course-v1:edX+DemoX+Demo_2014'``.  When unset, contexts only ever match exactly.
+HIERARCHICAL_CONTEXT_SEPARATOR_SETTING = 'RBAC_HIERARCHICAL_CONTEXT_SEPARATOR'
+
+# Versions of the encoding of the JWT roles claim; see `edx_rbac.claims`.
+ROLES_CLAIM_VERSION_LEGACY = 1
+ROLES_CLAIM_VERSION_COMPACT = 2
+
+# .. setting_name: RBAC_ROLES_CLAIM_VERSION
+# .. setting_default: 1
+# .. setting_description: The encoding of the roles claim created by ``create_role_auth_claim_for_user()``.
+#   Version 1 is a list of ``'role:context'`` strings.  Version 2 is a compact object that lists the
+#   contexts of each role once under that role.  Every service that reads the JWT must run a release
+#   of edx-rbac that understands version 2 before the service that creates the JWT switches to it.
+ROLES_CLAIM_VERSION_SETTING = 'RBAC_ROLES_CLAIM_VERSION'
+
+# The context that replaces every context of a role whose contexts did not fit in the roles claim,
+# meaning that the role's contexts must be looked up from the roles claim overflow source instead.
+ROLES_CLAIM_OVERFLOW_CONTEXT = '~overflow'
+
+# .. setting_name: RBAC_ROLES_CLAIM_MAX_BYTES
+# .. setting_default: None
+# .. setting_description: The maximum size, in bytes of compact JSON, of the roles claim created by
+#   ``create_role_auth_claim_for_user()``.  Roles are added to the claim in order until one doesn't fit;
+#   that role's contexts are replaced by a single overflow marker, and the next role is tried.  Every service
+#   that reads the JWT must configure ``RBAC_ROLES_CLAIM_OVERFLOW_SOURCE`` to resolve overflowed roles.
+#   When unset, the claim is unbounded.
+ROLES_CLAIM_MAX_BYTES_SETTING = 'RBAC_ROLES_CLAIM_MAX_BYTES'
+
+# .. setting_name: RBAC_ROLES_CLAIM_OVERFLOW_SOURCE
+# .. setting_default: None
+# .. setting_description: Where to look up the contexts of system-wide roles that overflowed the roles claim
+#   of a JWT.  Like the entries of ``SYSTEM_WIDE_ROLE_CLASSES``, it's either the dotted path of a function
+#   which takes a user and returns an iterable of ``(role, context)`` pairs, or the ``app_label.ModelName``
+#   of a ``UserRoleAssignment`` subclass.  When unset, overflowed roles grant no contexts.
+ROLES_CLAIM_OVERFLOW_SOURCE_SETTING = 'RBAC_ROLES_CLAIM_OVERFLOW_SOURCE'
+
+# .. setting_name: RBAC_ASSIGNMENT_CACHE_TIMEOUT
+# .. setting_default: None
+# .. setting_description: When set, each user's role assignments of each ``UserRoleAssignment`` subclass are
+#   cached for this many seconds through Django's default cache, so that they aren't queried on every request.
+#   Cached assignments are invalidated whenever one of the user's assignments is saved or deleted through the
+#   ORM; bulk updates and deletes, which send no signals, are only picked up once the timeout expires.
+#   When unset, assignments are read from the database on every request.
+ASSIGNMENT_CACHE_TIMEOUT_SETTING = 'RBAC_ASSIGNMENT_CACHE_TIMEOUT'
+
+# .. setting_name: RBAC_ROLE_CATALOG_TIMEOUT
+# .. setting_default: None
+# .. setting_description: When set, each process keeps a catalog of the names and primary keys of the roles of
+#   each ``UserRole`` subclass for this many seconds, so that assignment queries filter on the primary keys of roles
+#   instead of joining the role table.  A process discards its catalog when one of its roles is saved or deleted
+#   through the ORM; changes made by other processes are picked up once the timeout expires.
+#   When unset, assignment queries join the role table.
+ROLE_CATALOG_TIMEOUT_SETTING = 'RBAC_ROLE_CATALOG_TIMEOUT'
+
+# .. setting_name: RBAC_ROLES_CLAIM_CACHE_TIMEOUT
+# .. setting_default: None
+# .. setting_description: When set, the roles claim created for a user by ``create_role_auth_claim_for_user()``
+#   is cached for this many seconds through Django's default cache.  A cached claim is invalidated whenever one of
+#   the user's assignments of a model in ``SYSTEM_WIDE_ROLE_CLASSES`` is saved or deleted through the ORM; changes
+#   to what function sources return are only picked up once the timeout expires.  When unset, every call builds
+#   the claim anew.
+ROLES_CLAIM_CACHE_TIMEOUT_SETTING = 'RBAC_ROLES_CLAIM_CACHE_TIMEOUT'
+
+# .. setting_name: RBAC_ROLE_SOURCE_THREADS
+# .. setting_default: None
+# .. setting_description: When set, the function sources of ``SYSTEM_WIDE_ROLE_CLASSES`` are called concurrently
+#   on a per-process pool of this many threads, while the assignments of the model sources are fetched, so that
+#   creating a roles claim takes as long as its slowest source rather than as long as all of them.  The claim is
+#   unchanged: the pairs of every source are still added in the order of the setting.  Function sources which
+#   query the database do so on their own connection.  When unset, sources are called one after another.
+ROLE_SOURCE_THREADS_SETTING = 'RBAC_ROLE_SOURCE_THREADS'
+
+# .. setting_name: RBAC_ROLES_CLAIM_TIMEOUT
+# .. setting_default: None
+# .. setting_description: When set, the number of seconds ``create_role_auth_claim_for_user()`` waits for the
+#   function sources of ``SYSTEM_WIDE_ROLE_CLASSES``.  Function sources which haven't returned by then are left out
+#   of the claim, which is then not cached.  Only sources called on the ``RBAC_ROLE_SOURCE_THREADS`` pool (or
+#   asynchronously) can be interrupted; a source called inline is skipped if the deadline passed before its turn.
+#   Model sources are always included.  When unset, there is no deadline.
+ROLES_CLAIM_TIMEOUT_SETTING = 'RBAC_ROLES_CLAIM_TIMEOUT'
+
+# .. setting_name: RBAC_ROLE_SOURCE_BUDGETS
+# .. setting_default: {}
+# .. setting_description: A dict of the location of a function source in ``SYSTEM_WIDE_ROLE_CLASSES`` to the
+#   number of seconds ``create_role_auth_claim_for_user()`` waits for it, like ``RBAC_ROLES_CLAIM_TIMEOUT`` but
+#   for that source alone.  A source called inline which overruns its budget is kept in the claim, but reported.
+ROLE_SOURCE_BUDGETS_SETTING = 'RBAC_ROLE_SOURCE_BUDGETS'
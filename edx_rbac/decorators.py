@@ -4,40 +4,63 @@ Taken from https://github.com/escodebar/django-rest-framework-rules/blob/master/
 
 import functools
 
-import crum
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from edx_rbac.request_cache import request_scope
 
 
 def permission_required(*permissions, **decorator_kwargs):
     """
     Verify permissions for access to the api.
 
+    The decorated view may be a coroutine function, in which case the permissions are checked
+    in a thread (see ``asgiref.sync.sync_to_async``), so that the event loop is never blocked.
+    The request is the current request (see `edx_rbac.request_cache`) while the view runs.
+
     :param permissions: Permissions added via django_rules add_perm
     :param decorator_kwargs: Arguments for permission checks
     :return: decorator
     """
+    def check_permissions(self, request, *args, **kwargs):
+        """Raise a permission denied exception unless the request's user has all the permissions."""
+        fn = decorator_kwargs.get('fn', None)
+        if callable(fn):
+            obj = fn(request, *args, **kwargs)
+        else:
+            obj = fn
+
+        missing_permissions = [perm for perm in permissions
+                               if not request.user.has_perm(perm, obj)]
+        if any(missing_permissions):
+            # raises a permission denied exception causing a 403 response
+            self.permission_denied(
+                request,
+                message=f"Missing: {', '.join(missing_permissions)}"
+            )
+
     def decorator(view):
         """Verify permissions decorator."""
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapped_view(self, request, *args, **kwargs):
+                """Wrap for the coroutine view function."""
+                def check_permissions_in_thread():
+                    # crum keeps the current request in a thread local, which isn't carried over to the
+                    # thread ``sync_to_async`` runs this in, so rules predicates reading it need it set here.
+                    with request_scope(request):
+                        check_permissions(self, request, *args, **kwargs)
+
+                with request_scope(request):
+                    await sync_to_async(check_permissions_in_thread)()
+                    return await view(self, request, *args, **kwargs)
+            return async_wrapped_view
+
         @functools.wraps(view)
         def wrapped_view(self, request, *args, **kwargs):
             """Wrap for the view function."""
-            fn = decorator_kwargs.get('fn', None)
-            if callable(fn):
-                obj = fn(request, *args, **kwargs)
-            else:
-                obj = fn
-
-            crum.set_current_request(request)
-
-            missing_permissions = [perm for perm in permissions
-                                   if not request.user.has_perm(perm, obj)]
-            if any(missing_permissions):
-                # raises a permission denied exception causing a 403 response
-                self.permission_denied(
-                    request,
-                    message=f"Missing: {', '.join(missing_permissions)}"
-                )
-
-            return view(self, request, *args, **kwargs)
+            with request_scope(request):
+                check_permissions(self, request, *args, **kwargs)
+                return view(self, request, *args, **kwargs)
         return wrapped_view
 
     return decorator
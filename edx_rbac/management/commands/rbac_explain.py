@@ -0,0 +1,103 @@
+"""
+Management command to print the SQL, and the database's plan, of the queries edx_rbac runs for a user.
+"""
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.exceptions import EmptyResultSet
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+
+from edx_rbac.request_cache import request_scope
+
+
+class Command(BaseCommand):
+    """
+    Print the SQL and the EXPLAIN output of the queries run to check a user's DB-persisted role assignments.
+
+    Example usage:
+        $ ./manage.py rbac_explain some_username --role-assignment-class my_app.MyRoleAssignment \\
+            --role some_role --view my_app.views.MyViewSet
+    """
+
+    help = (
+        "Print the SQL, and the database's EXPLAIN output, of UserRoleAssignment.get_assignments(), of the "
+        "all-contexts check, and optionally of a PermissionRequiredForListingMixin's listing, for a user."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='The username of the user whose queries are explained.')
+        parser.add_argument(
+            '--role-assignment-class',
+            required=True,
+            help='The UserRoleAssignment subclass, as app_label.ModelName.',
+        )
+        parser.add_argument(
+            '--role',
+            action='append',
+            dest='role_names',
+            default=[],
+            help='A role name to filter assignments on; may be repeated.  Defaults to all roles.',
+        )
+        parser.add_argument(
+            '--view',
+            help='The dotted path of a PermissionRequiredForListingMixin view whose list queryset is explained.',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run the queries to report their actual cost, on databases that support EXPLAIN ANALYZE.',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{User.USERNAME_FIELD: options['username']})
+        except User.DoesNotExist as error:
+            raise CommandError(f"No user named {options['username']!r}.") from error
+        try:
+            role_assignment_class = apps.get_model(options['role_assignment_class'])
+        except (LookupError, ValueError) as error:
+            raise CommandError(f"Unknown role assignment class {options['role_assignment_class']!r}.") from error
+
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        role_names = options['role_names'] or None
+
+        self._explain(
+            'get_assignments',
+            role_assignment_class.get_assignments_queryset(user, role_names),
+            explain_options,
+        )
+        all_contexts_queryset = role_assignment_class.get_all_contexts_queryset(user, role_names)
+        if all_contexts_queryset is not None:
+            self._explain('all contexts check', all_contexts_queryset, explain_options)
+        if options['view']:
+            self._explain('listing', self._get_listing_queryset(options['view'], user), explain_options)
+
+    def _get_listing_queryset(self, view_path, user):
+        """
+        Return the queryset the given listing view returns to the user for a "list" action.
+        """
+        try:
+            view = import_string(view_path)()
+        except ImportError as error:
+            raise CommandError(f'Unknown view {view_path!r}.') from error
+        view.request = RequestFactory().get('/')
+        view.request.user = user
+        view.action = 'list'
+
+        with request_scope(view.request):
+            return view.get_queryset()
+
+    def _explain(self, title, queryset, explain_options):
+        """
+        Write the SQL and the EXPLAIN output of a queryset.
+        """
+        self.stdout.write(self.style.MIGRATE_HEADING(f'== {title} =='))
+        try:
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+        except EmptyResultSet:
+            self.stdout.write('The queryset is empty, so no query is run.')
+        self.stdout.write('')
@@ -0,0 +1,283 @@
+"""
+Management command to reconcile the assignments of a `UserRoleAssignment` subclass with a CSV or JSONL export.
+"""
+
+import csv
+import json
+import sys
+from contextlib import contextmanager
+from itertools import groupby, islice
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from edx_rbac.cache import handle_assignments_changed
+from edx_rbac.models import UserRoleAssignment
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+@contextmanager
+def _open_input(path):
+    """
+    Open the file at the given path for reading, or stdin if the path is '-'.
+    """
+    if path == '-':
+        yield sys.stdin
+        return
+    try:
+        input_file = open(path, newline='', encoding='utf-8')
+    except OSError as error:
+        raise CommandError(f'Cannot read {path!r}: {error}') from error
+    with input_file:
+        yield input_file
+
+
+class Command(BaseCommand):
+    """
+    Make the assignments of a `UserRoleAssignment` subclass match those listed in a CSV or JSONL file.
+
+    The class must store its context in a single field of its own, named by its `context_fields`, as
+    `ContextualUserRoleAssignment` does, so that each assignment can be told apart from the others of its user.
+    Each row of the input is an assignment, with a ``user_id`` or an ``email`` identifying its user, a ``role``
+    name and an optional ``context``, which is compared with the stored contexts as a string.  An optional
+    ``applies_to_all_contexts`` column defaults to false.  The input is read as a stream, in constant memory,
+    so it must be sorted by user: the rows with a ``user_id`` by increasing id, and those with an ``email`` by
+    email.  Each user must be identified the same way on all of its rows.  The command fails on unsorted input,
+    after reconciling the users before the first row out of order.
+
+    Users are reconciled in chunks: the users of a chunk are looked up together, their existing assignments
+    fetched with one query, and the difference applied with ``bulk_create()`` and a delete in one transaction.
+    The delete sends no signals; the cached assignments of the users of the chunk are invalidated at once instead.
+    Every assignment of a user listed in the input which isn't in the input is deleted; users missing from the
+    input keep their assignments.  Rows of unknown users are skipped, and so are all the rows of a user with a
+    row of an unknown role, whose assignments are left alone; both are reported.
+
+    Example usage:
+        $ ./manage.py rbac_reconcile assignments.csv --role-assignment-class my_app.MyRoleAssignment
+        $ export_assignments | ./manage.py rbac_reconcile - --format jsonl \\
+            --role-assignment-class my_app.MyRoleAssignment --dry-run
+    """
+
+    help = (
+        "Create and delete the assignments of a UserRoleAssignment subclass so that they match a CSV or JSONL "
+        "file of user_id or email, role, context and applies_to_all_contexts, for the users listed in the file."
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.role_assignment_class = None
+        self.context_field = None
+        self.role_ids = {}
+        self.dry_run = False
+        self.counts = {}
+        self.last_user_keys = {}
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The path of the CSV or JSONL file, or '-' to read from stdin.")
+        parser.add_argument(
+            '--role-assignment-class',
+            required=True,
+            help='The UserRoleAssignment subclass, as app_label.ModelName.',
+        )
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'jsonl'),
+            help='The format of the input.  Defaults to jsonl for .jsonl files and csv otherwise.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='The number of users reconciled at a time, each chunk in its own transaction.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the changes without making them.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            role_assignment_class = apps.get_model(options['role_assignment_class'])
+        except (LookupError, ValueError) as error:
+            raise CommandError(f"Unknown role assignment class {options['role_assignment_class']!r}.") from error
+        if not issubclass(role_assignment_class, UserRoleAssignment):
+            raise CommandError(f"{options['role_assignment_class']!r} is not a UserRoleAssignment subclass.")
+        context_fields = role_assignment_class.context_fields or ()
+        if len(context_fields) != 1 or context_fields[0] not in {
+            field.name for field in role_assignment_class._meta.concrete_fields
+        }:
+            raise CommandError(
+                f"{options['role_assignment_class']!r} doesn't store its context in a single field of its own."
+            )
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+
+        path = options['path']
+        input_format = options['format'] or ('jsonl' if path.endswith('.jsonl') else 'csv')
+        self.role_assignment_class = role_assignment_class
+        self.context_field = context_fields[0]
+        self.role_ids = dict(role_assignment_class.role_class.objects.values_list('name', 'pk'))
+        self.dry_run = options['dry_run']
+        self.counts = {'created': 0, 'deleted': 0, 'unchanged': 0, 'skipped': 0}
+        self.last_user_keys = {}
+
+        with _open_input(path) as input_file:
+            rows = csv.DictReader(input_file) if input_format == 'csv' else self._iter_jsonl(input_file)
+            user_groups = ((user_key, list(user_rows)) for user_key, user_rows in groupby(rows, key=self._user_key))
+            while chunk := list(islice(user_groups, options['chunk_size'])):
+                self._reconcile_chunk(chunk)
+
+        summary = ', '.join(f'{count} {name}' for name, count in self.counts.items())
+        self.stdout.write(f"{'Would have' if self.dry_run else 'Reconciled'} assignments: {summary}.")
+
+    @staticmethod
+    def _iter_jsonl(input_file):
+        """
+        Yield the object on each non-blank line of a JSONL file.
+        """
+        for line_number, line in enumerate(input_file, start=1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as error:
+                    raise CommandError(f'Line {line_number} is not valid JSON: {error}') from error
+
+    @staticmethod
+    def _user_key(row):
+        """
+        Return the ``('id', user_id)`` or ``('email', email)`` identifying the user of a row.
+        """
+        if row.get('user_id') not in (None, ''):
+            return ('id', str(row['user_id']))
+        if row.get('email'):
+            return ('email', row['email'])
+        raise CommandError(f'Row has neither a user_id nor an email: {row!r}')
+
+    def _resolve_users(self, user_keys):
+        """
+        Return a dict of the given user keys to the primary keys of the users they identify, with one query per kind.
+        """
+        User = get_user_model()
+        user_ids = {value for kind, value in user_keys if kind == 'id' and value.isdigit()}
+        emails = {value for kind, value in user_keys if kind == 'email'}
+
+        user_ids_by_key = {}
+        if user_ids:
+            for user_id in User.objects.filter(pk__in=user_ids).values_list('pk', flat=True):
+                user_ids_by_key[('id', str(user_id))] = user_id
+        if emails:
+            user_ids_by_email = {}
+            for email, user_id in User.objects.filter(email__in=emails).values_list('email', 'pk'):
+                user_ids_by_email.setdefault(email, []).append(user_id)
+            for email, email_user_ids in user_ids_by_email.items():
+                if len(email_user_ids) == 1:
+                    user_ids_by_key[('email', email)] = email_user_ids[0]
+                else:
+                    self.stderr.write(f'Skipping {email!r}, which is the email of {len(email_user_ids)} users.')
+        return user_ids_by_key
+
+    @staticmethod
+    def _assignment_key(user_id, role_id, context, applies_to_all_contexts):
+        """
+        Return the key identifying an assignment, whether it's read from the input or from the database.
+        """
+        return (user_id, role_id, None if context in (None, '') else str(context), applies_to_all_contexts)
+
+    def _check_user_order(self, user_key):
+        """
+        Raise a `CommandError` unless the given user key comes after the previous one of the same kind.
+        """
+        kind, value = user_key
+        if kind == 'id':
+            if not value.isdigit():
+                # Rows of ids which aren't numbers are skipped, as rows of unknown users.
+                return
+            value = int(value)
+        last_value = self.last_user_keys.get(kind)
+        if last_value is not None and value <= last_value:
+            raise CommandError(
+                f'The input is not sorted by user: {user_key[1]!r} comes after {str(last_value)!r}.'
+            )
+        self.last_user_keys[kind] = value
+
+    def _reconcile_chunk(self, user_groups):
+        """
+        Reconcile the assignments of a chunk of ``(user_key, rows)`` pairs with those in the database.
+        """
+        for user_key, __ in user_groups:
+            self._check_user_order(user_key)
+        user_ids_by_key = self._resolve_users({user_key for user_key, __ in user_groups})
+
+        wanted = {}
+        user_ids = set()
+        listed_user_ids = set()
+        for user_key, rows in user_groups:
+            user_id = user_ids_by_key.get(user_key)
+            if user_id is None:
+                self.stderr.write(f'Skipping {len(rows)} row(s) of unknown user {user_key[1]!r}.')
+                self.counts['skipped'] += len(rows)
+                continue
+            if user_id in listed_user_ids:
+                raise CommandError(f'User {user_key[1]!r} is identified both by id and by email.')
+            listed_user_ids.add(user_id)
+            unknown_roles = sorted({row.get('role') for row in rows if row.get('role') not in self.role_ids}, key=str)
+            if unknown_roles:
+                self.stderr.write(
+                    f"Skipping {len(rows)} row(s) of user {user_key[1]!r}, "
+                    f"which has rows of unknown role(s) {', '.join(map(repr, unknown_roles))}."
+                )
+                self.counts['skipped'] += len(rows)
+                continue
+            user_ids.add(user_id)
+            for row in rows:
+                applies_to_all_contexts = row.get('applies_to_all_contexts')
+                if isinstance(applies_to_all_contexts, str):
+                    applies_to_all_contexts = applies_to_all_contexts.strip().lower() in TRUE_VALUES
+                key = self._assignment_key(
+                    user_id, self.role_ids[row['role']], row.get('context'), bool(applies_to_all_contexts),
+                )
+                wanted[key] = None
+
+        existing_rows = self.role_assignment_class.objects.filter(user_id__in=user_ids).values_list(
+            'pk', 'user_id', 'role_id', 'applies_to_all_contexts', self.context_field,
+        )
+        pks_to_delete = []
+        changed_user_ids = set()
+        for pk, user_id, role_id, applies_to_all_contexts, context in existing_rows.order_by('pk').iterator():
+            key = self._assignment_key(user_id, role_id, context, applies_to_all_contexts)
+            if key in wanted and wanted[key] is None:
+                wanted[key] = pk
+            else:
+                pks_to_delete.append(pk)
+                changed_user_ids.add(user_id)
+        assignments_to_create = [
+            self._new_assignment(*key) for key, existing_pk in wanted.items() if existing_pk is None
+        ]
+
+        self.counts['created'] += len(assignments_to_create)
+        self.counts['deleted'] += len(pks_to_delete)
+        self.counts['unchanged'] += len(wanted) - len(assignments_to_create)
+        if self.dry_run or not (assignments_to_create or pks_to_delete):
+            return
+
+        changed_user_ids.update(assignment.user_id for assignment in assignments_to_create)
+        with transaction.atomic():
+            if pks_to_delete:
+                # Deleting rows without fetching them, as QuerySet.delete() does when no receivers are connected.
+                to_delete = self.role_assignment_class.objects.filter(pk__in=pks_to_delete)
+                to_delete._raw_delete(to_delete.db)  # pylint: disable=protected-access
+            self.role_assignment_class.objects.bulk_create(assignments_to_create)
+            handle_assignments_changed(self.role_assignment_class, changed_user_ids)
+
+    def _new_assignment(self, user_id, role_id, context, applies_to_all_contexts):
+        """
+        Return an unsaved assignment with the given key.
+        """
+        return self.role_assignment_class(
+            user_id=user_id, role_id=role_id, applies_to_all_contexts=applies_to_all_contexts,
+            **{self.context_field: context},
+        )
@@ -0,0 +1,42 @@
+"""
+Middleware for the 'edx-rbac' module.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from edx_rbac.request_cache import request_scope
+
+
+class RequestScopeMiddleware:
+    """
+    Make each request the current request (see `edx_rbac.request_cache`) while it's served, in sync and async stacks.
+
+    Without it, the current request is set by the permission checks, and stays set until the next one.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """
+        Wrap `get_response`, which is async in an async middleware stack.
+        """
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """
+        Serve the request within its scope.
+        """
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_scope(request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        """
+        Serve the request within its scope, in an async middleware stack.
+        """
+        with request_scope(request):
+            return await self.get_response(request)
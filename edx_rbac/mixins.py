@@ -4,11 +4,19 @@ Mixin adapted from https://github.com/escodebar/django-rest-framework-rules/blob
 Keeps py2 backward compatibility and only holds on to the necessary bits of the mixin needed.
 """
 
-import crum
-from django.core.exceptions import ImproperlyConfigured
+import asyncio
+import operator
+from functools import reduce
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import Q, Subquery
 from django.utils.functional import cached_property
 
 from edx_rbac import utils
+from edx_rbac.access_map import get_hierarchical_context_separator
+from edx_rbac.models import STRING_CONTEXT_FIELD_TYPES, _get_lookup_field
+from edx_rbac.request_cache import request_scope, set_current_request
 
 
 class PermissionRequiredMixin:
@@ -45,16 +53,17 @@ class PermissionRequiredMixin:
         If `get_permission_object` is implemented, it will be called and should return the object
         for which the @rules predicate checks against.
         """
-        crum.set_current_request(request)
+        set_current_request(request)
         user = request.user
 
-        if hasattr(self, 'get_permission_object') and callable(self.get_permission_object):
-            obj = self.get_permission_object()
-        else:
-            obj = None
+        with request_scope(request):
+            if hasattr(self, 'get_permission_object') and callable(self.get_permission_object):
+                obj = self.get_permission_object()
+            else:
+                obj = None
 
-        missing_permissions = [perm for perm in self.get_permission_required()
-                               if not user.has_perm(perm, obj)]
+            missing_permissions = [perm for perm in self.get_permission_required()
+                                   if not user.has_perm(perm, obj)]
 
         if any(missing_permissions):
             self.permission_denied(
@@ -62,6 +71,15 @@ class PermissionRequiredMixin:
                 message=f"MISSING: {', '.join(missing_permissions)}"
             )
 
+    async def acheck_permissions(self, request):
+        """
+        Async counterpart of `check_permissions()`, for async views.
+
+        The permissions are checked in a thread (see ``asgiref.sync.sync_to_async``), since
+        permission predicates and `get_permission_object` are sync.
+        """
+        await sync_to_async(self.check_permissions)(request)
+
 
 class PermissionRequiredForListingMixin(PermissionRequiredMixin):
     """
@@ -83,9 +101,20 @@ class PermissionRequiredForListingMixin(PermissionRequiredMixin):
 
     `role_assignment_class` (class) - The RoleAssignmentClass against which DB-defined access is checked.
 
+    `join_role_assignments` (bool) - If True, and the `role_assignment_class` is a `ContextualUserRoleAssignment`,
+    listings join against its ``context`` column instead of loading every accessible context into memory
+    (see `joins_role_assignments`).
+
+    `role_assignment_classes` (list) - Alternatively, several RoleAssignmentClasses against which DB-defined
+    access is checked, with as few queries as possible (see `utils.contexts_accessible_from_databases()`).
+
     `base_queryset` (property) - A queryset which acts as the "base case".  It should generally return
     all accessible instances for a user who has access to anything within this viewset (like a superuser
     or admin).
+
+    Async views should await `acheck_permissions()` instead of calling `check_permissions()`.  It decodes
+    the JWT while the database is queried with the async ORM, and memoizes the accessible contexts for
+    `get_queryset()`.
     """
     # This flag indicates whether requesting users with `is_staff = True`
     # should ever encounter a PermissionDenied exception.
@@ -104,6 +133,12 @@ class PermissionRequiredForListingMixin(PermissionRequiredMixin):
     # The RoleAssignmentClass against which DB-defined access is checked
     role_assignment_class = None
 
+    # Whether listings join against the ``context`` column of a ContextualUserRoleAssignment
+    join_role_assignments = False
+
+    # Alternatively, several RoleAssignmentClasses against which DB-defined access is checked
+    role_assignment_classes = ()
+
     @property
     def base_queryset(self):
         """
@@ -123,22 +158,138 @@ class PermissionRequiredForListingMixin(PermissionRequiredMixin):
     @cached_property
     def accessible_contexts(self):
         """
-        Cached set of contexts (usually model identifiers) the requesting user has access to.
-        Returns a set that contains the `ALL_ACCESS_CONTEXT` identifier
-        if the requesting user is a superuser.
+        Cached, immutable set of contexts (usually model identifiers) the requesting user has access to.
+        It's an `AccessMap` unless the requesting user is a superuser, in which case it's a frozenset
+        that contains the `ALL_ACCESS_CONTEXT` identifier.
         """
-        contexts_via_jwt = utils.contexts_accessible_from_request(self.request, self.allowed_roles)
-        contexts_via_db = set()
-
-        if self.role_assignment_class:
-            contexts_via_db = utils.contexts_accessible_from_database(
+        accessible_contexts = [utils.contexts_accessible_from_request(self.request, self.allowed_roles)]
+
+        if self.role_assignment_classes:
+            accessible_contexts.append(utils.contexts_accessible_from_databases(
+                self.request.user, self.allowed_roles, self.role_assignment_classes
+            ))
+        elif self.role_assignment_class:
+            accessible_contexts.append(utils.contexts_accessible_from_database(
                 self.request.user, self.allowed_roles, self.role_assignment_class
-            )
+            ))
+
+        return self._combine_accessible_contexts(accessible_contexts)
+
+    async def aget_accessible_contexts(self):
+        """
+        Async counterpart of `accessible_contexts`, which memoizes them as `accessible_contexts`.
+
+        The contexts accessible via the JWT are resolved in a thread of their own (see
+        `utils.acontexts_accessible_from_request()`), while those via the database are queried with the async ORM.
+        """
+        if 'accessible_contexts' not in self.__dict__:
+            sources = [utils.acontexts_accessible_from_request(self.request, self.allowed_roles)]
+
+            if self.role_assignment_classes:
+                sources.append(utils.acontexts_accessible_from_databases(
+                    self.request.user, self.allowed_roles, self.role_assignment_classes
+                ))
+            elif self.role_assignment_class:
+                sources.append(utils.acontexts_accessible_from_database(
+                    self.request.user, self.allowed_roles, self.role_assignment_class
+                ))
+
+            self.__dict__['accessible_contexts'] = self._combine_accessible_contexts(await asyncio.gather(*sources))
+        return self.accessible_contexts
+
+    def _combine_accessible_contexts(self, accessible_contexts):
+        """
+        Return the union of the given collections of accessible contexts, plus the `ALL_ACCESS_CONTEXT`
+        for superusers who can access anything.
+        """
+        accessible_contexts = reduce(operator.or_, accessible_contexts)
 
         if self.request.user.is_superuser and self.superusers_can_access_anything:
-            contexts_via_db.add(utils.ALL_ACCESS_CONTEXT)
+            accessible_contexts = accessible_contexts | {utils.ALL_ACCESS_CONTEXT}
+
+        return accessible_contexts
+
+    @cached_property
+    def joins_role_assignments(self):
+        """
+        True if DB-defined access is checked by joining against the ``context`` column of the
+        `role_assignment_class`, rather than via `accessible_contexts`.
+
+        That's the case when `join_role_assignments` is set, unless hierarchical contexts are enabled,
+        `accessible_contexts` is overridden, or the `list_lookup_field` isn't a string field, which the
+        database can't compare with the ``context`` column without a cast.
+        """
+        return (
+            self.join_role_assignments
+            and not self.role_assignment_classes
+            and hasattr(self.role_assignment_class, 'user_has_contexts')
+            and not get_hierarchical_context_separator()
+            and type(self).accessible_contexts is PermissionRequiredForListingMixin.accessible_contexts
+            and self._list_lookup_field_is_string()
+        )
+
+    def _list_lookup_field_is_string(self):
+        """
+        Return True if the `list_lookup_field` of the `base_queryset` is a string field.
+        """
+        try:
+            field = _get_lookup_field(self.base_queryset.model, self.list_lookup_field)
+        except FieldDoesNotExist:
+            return False
+        return field.get_internal_type() in STRING_CONTEXT_FIELD_TYPES
 
-        return contexts_via_jwt | contexts_via_db
+    @cached_property
+    def has_accessible_contexts(self):
+        """
+        True if the requesting user has access to any context.
+        """
+        if not self.joins_role_assignments:
+            return bool(self.accessible_contexts)
+        return bool(utils.contexts_accessible_from_request(self.request, self.allowed_roles)) or (
+            not self.request.user.is_anonymous and self._role_assignments_of_user().exists()
+        )
+
+    async def ahas_accessible_contexts(self):
+        """
+        Async counterpart of `has_accessible_contexts`, which it memoizes.
+        """
+        if 'has_accessible_contexts' not in self.__dict__:
+            if not self.joins_role_assignments:
+                has_accessible_contexts = bool(await self.aget_accessible_contexts())
+            else:
+                has_accessible_contexts = bool(await utils.acontexts_accessible_from_request(
+                    self.request, self.allowed_roles
+                )) or (not self.request.user.is_anonymous and await self._role_assignments_of_user().aexists())
+            self.__dict__['has_accessible_contexts'] = has_accessible_contexts
+        return self.has_accessible_contexts
+
+    def _role_assignments_of_user(self):
+        """
+        Return the queryset of the requesting user's assignments of the `allowed_roles`.
+        """
+        return self.role_assignment_class.objects.filter(user=self.request.user, role__name__in=self.allowed_roles)
+
+    def _get_queryset_joined_to_role_assignments(self):
+        """
+        Return the listing of instances accessible via the JWT, or via a `ContextualUserRoleAssignment`
+        by way of a subquery on its ``context`` column.
+        """
+        user = self.request.user
+        contexts_from_request = utils.contexts_accessible_from_request(self.request, self.allowed_roles)
+        if (
+            (user.is_superuser and self.superusers_can_access_anything)
+            or utils.has_access_to_all(contexts_from_request)
+            or (not user.is_anonymous and self.role_assignment_class.get_all_contexts_role(user, self.allowed_roles))
+        ):
+            return self.base_queryset
+
+        query = Q(**{self.list_lookup_field + '__in': contexts_from_request})
+        if not user.is_anonymous:
+            assigned_contexts = self.role_assignment_class.objects.filter(
+                user=user, role__name__in=self.allowed_roles, context__isnull=False,
+            ).values('context')
+            query |= Q(**{self.list_lookup_field + '__in': Subquery(assigned_contexts)})
+        return self.base_queryset.filter(query)
 
     def check_permissions(self, request):
         """
@@ -149,23 +300,47 @@ class PermissionRequiredForListingMixin(PermissionRequiredMixin):
         method if the request action is not "list".
         """
         if self.request_action == 'list':
-            # Super-users and staff won't get Forbidden responses,
-            # but depending on their assigned roles, staff may
-            # get an empty result set.
-            if request.user.is_superuser:
+            set_current_request(request)
+            if self._is_never_forbidden(request):
                 return
-            if request.user.is_staff and self.staff_are_never_forbidden:
-                return
-            if not self.accessible_contexts:
+            with request_scope(request):
+                has_accessible_contexts = self.has_accessible_contexts
+            if not has_accessible_contexts:
                 self.permission_denied(request)
         else:
             super().check_permissions(request)
 
+    async def acheck_permissions(self, request):
+        """
+        Async counterpart of `check_permissions()`, for async views.
+        """
+        if self.request_action == 'list':
+            if self._is_never_forbidden(request):
+                return
+            with request_scope(request):
+                has_accessible_contexts = await self.ahas_accessible_contexts()
+            if not has_accessible_contexts:
+                self.permission_denied(request)
+        else:
+            await super().acheck_permissions(request)
+
+    def _is_never_forbidden(self, request):
+        """
+        Return True if the requesting user may list resources whatever their accessible contexts.
+        """
+        # Super-users and staff won't get Forbidden responses,
+        # but depending on their assigned roles, staff may
+        # get an empty result set.
+        return request.user.is_superuser or (request.user.is_staff and self.staff_are_never_forbidden)
+
     def get_queryset(self):
         """
         Expects `self.base_queryset` to be explicitly defined as the "base case"
         and `self.list_lookup_field` to be defined.
         You'll most likely want it to be `MyModel.objects.all().order_by('some_field')`.
+
+        When hierarchical contexts are enabled, the listing also includes every instance whose
+        `list_lookup_field` lies below one of the accessible contexts.
         """
         if getattr(self, 'base_queryset', None) is None:
             raise Exception(f'{self.__class__} must have a non-null "base_queryset" field.')
@@ -173,11 +348,22 @@ class PermissionRequiredForListingMixin(PermissionRequiredMixin):
             raise Exception(f'{self.__class__} must have a truthy "list_lookup_field" field.')
 
         if self.request_action == 'list':
+            if self.joins_role_assignments:
+                return self._get_queryset_joined_to_role_assignments()
             if not self.accessible_contexts:
                 return self.base_queryset.none()
             if utils.has_access_to_all(self.accessible_contexts):
                 return self.base_queryset
             kwargs = {self.list_lookup_field + '__in': self.accessible_contexts}
-            return self.base_queryset.filter(**kwargs)
+            separator = get_hierarchical_context_separator()
+            if not separator:
+                return self.base_queryset.filter(**kwargs)
+
+            # Each accessible context also grants access to every context below it.
+            query = Q(**kwargs)
+            for context in self.accessible_contexts:
+                if isinstance(context, str):
+                    query |= Q(**{self.list_lookup_field + '__startswith': context + separator})
+            return self.base_queryset.filter(query)
 
         return self.base_queryset
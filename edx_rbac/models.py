@@ -2,25 +2,44 @@
 Database models for edx_rbac.
 """
 
+from itertools import islice
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.exceptions import FieldDoesNotExist
 from django.db import models
 from django.db.models.base import ModelBase
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.signals import class_prepared, post_delete, post_save
 from django.utils.translation import gettext_lazy as _
 from model_utils.models import TimeStampedModel
 
+from edx_rbac.access_map import AccessMap, get_hierarchical_context_separator
+from edx_rbac.cache import handle_assignment_changed
+from edx_rbac.constants import ALL_ACCESS_CONTEXT
+from edx_rbac.role_catalog import aget_role_catalog, get_role_catalog, handle_role_changed
+from edx_rbac.utils import set_from_collection_or_single_item
+
+# Internal types of the fields whose values can be combined into a single column of contexts.
+STRING_CONTEXT_FIELD_TYPES = ('CharField', 'TextField')
+
 
 class UserRoleAssignmentCreator(ModelBase):
     """
     The model extending UserRoleAssignment should get a foreign key to a model that is a subclass of UserRole.
+
+    Saving or deleting an assignment of a concrete subclass invalidates the cached assignments and roles
+    claims of its user (see `edx_rbac.cache`), whether or not ``edx_rbac`` is in ``INSTALLED_APPS``.
     """
 
     def __new__(mcs, name, bases, attrs):
         """
         Override to dynamically create foreign key for objects begotten from abstract class.
+
+        Also connect the receivers of the cache invalidation signals to concrete subclasses.
         """
         model = super().__new__(mcs, name, bases, attrs)
-        if model.__name__ != 'UserRoleAssignment' and 'UserRoleAssignment' in [b.__name__ for b in bases]:
+        if any(isinstance(base, UserRoleAssignmentCreator) for base in bases):
             try:
                 model._meta.get_field('role')
             except FieldDoesNotExist as error:
@@ -29,8 +48,13 @@ class UserRoleAssignmentCreator(ModelBase):
                         'role',
                         models.ForeignKey(model.role_class, db_index=True, on_delete=models.CASCADE),
                     )
-                else:
+                elif not model._meta.abstract:
+                    # Abstract subclasses, like ContextualUserRoleAssignment, leave the role to their own subclasses.
                     raise Exception('role_class must be defined for any subclass of UserRole!') from error
+            if not model._meta.abstract:
+                dispatch_uid = f'edx_rbac.assignments.{model._meta.label_lower}'
+                post_save.connect(handle_assignment_changed, sender=model, dispatch_uid=dispatch_uid)
+                post_delete.connect(handle_assignment_changed, sender=model, dispatch_uid=dispatch_uid)
         return model
 
 
@@ -56,12 +80,45 @@ class UserRole(TimeStampedModel):
         return self.name
 
 
+def _connect_role_catalog_invalidation(sender, **kwargs):
+    """
+    Discard the role catalog of each concrete `UserRole` subclass when one of its roles is saved or deleted.
+    """
+    if issubclass(sender, UserRole) and not sender._meta.abstract:
+        dispatch_uid = f'edx_rbac.role_catalog.{sender._meta.label_lower}'
+        post_save.connect(handle_role_changed, sender=sender, dispatch_uid=dispatch_uid)
+        post_delete.connect(handle_role_changed, sender=sender, dispatch_uid=dispatch_uid)
+
+
+class_prepared.connect(_connect_role_catalog_invalidation, dispatch_uid='edx_rbac.role_catalog')
+
+
 class UserRoleAssignment(TimeStampedModel, metaclass=UserRoleAssignmentCreator):
     """
     Model for mapping users and their roles.
     """
     role_class = None
 
+    # Names of the fields (or lookups spanning relationships) the context of an assignment is derived from.
+    # When set, `get_assignments()` only reads these columns and passes their values to `context_from_values()`,
+    # instead of building a model instance for every assignment and calling `get_context()` on it.
+    context_fields = None
+
+    # Number of rows fetched from the database at a time by `get_assignments()`, and the size of the
+    # batches of assignments passed to `get_contexts()`.
+    assignment_chunk_size = 2000
+
+    # Whether an assignment that `applies_to_all_contexts` grants the `ALL_ACCESS_CONTEXT`, whatever its context.
+    # When True, `get_assignments()` yields the `ALL_ACCESS_CONTEXT` as the context of such assignments, and
+    # `get_all_contexts_role()` looks them up with a single-row query.
+    honors_applies_to_all_contexts = False
+
+    # Relationships `get_assignments()` should fetch along with the assignments, as passed to
+    # `QuerySet.select_related()` and `QuerySet.prefetch_related()`, so that `get_context()` or
+    # `get_contexts()` can follow them without issuing a query per assignment.
+    assignment_select_related = ()
+    assignment_prefetch_related = ()
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, db_index=True, on_delete=models.CASCADE)
 
     applies_to_all_contexts = models.BooleanField(
@@ -86,18 +143,368 @@ class UserRoleAssignment(TimeStampedModel, metaclass=UserRoleAssignmentCreator):
         """
         return None
 
+    @classmethod
+    def context_from_values(cls, *values):
+        """
+        Return the context of an assignment given the values of its `context_fields`, in order.
+
+        Defaults to returning the value of the first field, or None if there are no context fields.
+        Subclasses which declare several context fields should override this to combine them.
+        """
+        return values[0] if values else None
+
+    @classmethod
+    def get_contexts(cls, assignments):
+        """
+        Return the list of the contexts of a batch of assignments, in the same order.
+
+        Defaults to calling `get_context()` on each assignment.  Subclasses whose contexts
+        come from related objects can override this to look them up for the whole batch at once.
+        """
+        return [assignment.get_context() for assignment in assignments]
+
+    @classmethod
+    async def aget_contexts(cls, assignments):
+        """
+        Async counterpart of `get_contexts()`.
+
+        Defaults to calling `get_contexts()` in a thread, since `get_context()` may access related objects.
+        Subclasses which compute contexts without the database, or with the async ORM, can override this
+        to compute them on the event loop.
+        """
+        return await sync_to_async(cls.get_contexts)(assignments)
+
+    @classmethod
+    def _all_contexts_filter(cls):
+        """
+        Return the filter matching assignments that apply to all contexts, or None if they can't be told apart.
+        """
+        return models.Q(applies_to_all_contexts=True) if cls.honors_applies_to_all_contexts else None
+
+    @classmethod
+    def _get_role_catalog(cls):
+        """
+        Return the `RoleCatalog` of the role class of this assignment class, or None if the catalog is disabled.
+        """
+        return get_role_catalog(cls._meta.get_field('role').related_model)
+
+    @classmethod
+    async def _aget_role_catalog(cls, role_names=None):
+        """
+        Async counterpart of `_get_role_catalog()`.
+
+        The catalog is first made to hold any of the given `role_names` that exist, so that queries filtering
+        on those roles can be built without querying the database synchronously (see `RoleCatalog.pks_for()`).
+        """
+        role_catalog = await aget_role_catalog(cls._meta.get_field('role').related_model)
+        if role_catalog and role_names:
+            await role_catalog.apks_for(role_names)
+        return role_catalog
+
+    @staticmethod
+    def _role_column(role_catalog):
+        """
+        Return the column identifying the role of an assignment: its primary key if there's a catalog
+        to look its name up, or its name otherwise.
+        """
+        return 'role_id' if role_catalog else 'role__name'
+
+    @staticmethod
+    def _role_name(role_catalog, role):
+        """
+        Return the name of a role given the value of its `_role_column()`.
+        """
+        return role_catalog.name_for(role) if role_catalog else role
+
+    @staticmethod
+    async def _arole_name(role_catalog, role):
+        """
+        Async counterpart of `_role_name()`.
+        """
+        return await role_catalog.aname_for(role) if role_catalog else role
+
+    @staticmethod
+    def _role_filter(role_catalog, role_names):
+        """
+        Return the filter matching assignments of the given roles.
+        """
+        if role_catalog:
+            return models.Q(role_id__in=role_catalog.pks_for(role_names))
+        return models.Q(role__name__in=role_names)
+
+    @classmethod
+    def get_all_contexts_queryset(cls, user, role_names=None):
+        """
+        Return the ``LIMIT 1`` queryset of the role (see `_role_column()`) of one of the user's assignments
+        that apply to all contexts.
+
+        It's None when the assignments that apply to all contexts can't be told apart from the others by
+        the database: when `honors_applies_to_all_contexts` is False (and, for a `ContextualUserRoleAssignment`,
+        there's no ``context`` column to look at), or when `get_assignments()` is overridden.
+        """
+        return cls._all_contexts_queryset(cls._get_role_catalog(), user, role_names)
+
+    @classmethod
+    def _all_contexts_queryset(cls, role_catalog, user, role_names=None):
+        """
+        Return the queryset of `get_all_contexts_queryset` for the given role catalog.
+        """
+        all_contexts_filter = cls._all_contexts_filter()
+        if all_contexts_filter is None or cls._overrides_get_assignments():
+            return None
+        assignments = cls.objects.filter(all_contexts_filter, user=user)
+        if role_names:
+            assignments = assignments.filter(cls._role_filter(role_catalog, role_names))
+        return assignments.values_list(cls._role_column(role_catalog), flat=True)[:1]
+
+    @classmethod
+    def get_all_contexts_role(cls, user, role_names=None):
+        """
+        Return the name of one of the given roles (or of any role) which the user is assigned
+        for all contexts, or None if there's no such assignment.
+
+        This is a single, ``LIMIT 1`` query, which makes it a cheap way to avoid enumerating
+        every assignment of users who have access to everything.  It's None, without a query, when
+        there's no such query (see `get_all_contexts_queryset()`).
+        """
+        all_contexts_queryset = None if user.is_anonymous else cls.get_all_contexts_queryset(user, role_names)
+        if all_contexts_queryset is None:
+            return None
+        role = next(iter(all_contexts_queryset), None)
+        return None if role is None else cls._role_name(cls._get_role_catalog(), role)
+
+    @classmethod
+    async def aget_all_contexts_role(cls, user, role_names=None):
+        """
+        Async counterpart of `get_all_contexts_role()`.
+        """
+        if user.is_anonymous or cls._all_contexts_filter() is None or cls._overrides_get_assignments():
+            return None
+        role_catalog = await cls._aget_role_catalog(role_names)
+        async for role in cls._all_contexts_queryset(role_catalog, user, role_names):
+            return await cls._arole_name(role_catalog, role)
+        return None
+
+    @classmethod
+    def _assignments_queryset(cls, role_catalog, role_names=None, **filters):
+        """
+        Return the queryset of the assignments matching `filters` and of the given roles, in order of primary key.
+
+        When `context_fields` is set, it's a queryset of ``(user_id, role, applies_to_all_contexts, *context_values)``
+        rows, where the role is given by its `_role_column()`; otherwise, it's a queryset of assignments.
+        """
+        assignments = cls.objects.filter(**filters).order_by('pk')
+        if role_names:
+            assignments = assignments.filter(cls._role_filter(role_catalog, role_names))
+
+        if cls.context_fields is not None:
+            return assignments.values_list(
+                'user_id', cls._role_column(role_catalog), 'applies_to_all_contexts', *cls.context_fields
+            )
+
+        select_related = cls.assignment_select_related if role_catalog else ('role', *cls.assignment_select_related)
+        if select_related:
+            assignments = assignments.select_related(*select_related)
+        if cls.assignment_prefetch_related:
+            assignments = assignments.prefetch_related(*cls.assignment_prefetch_related)
+        return assignments
+
+    @classmethod
+    def get_assignments_queryset(cls, user, role_names=None):
+        """
+        Return the queryset `get_assignments()` iterates over.
+
+        When `context_fields` is set, it's a queryset of ``(user_id, role, applies_to_all_contexts, *context_values)``
+        rows, where the role is given by its `_role_column()`; otherwise, it's a queryset of assignments.
+
+        When the role catalog is enabled (see `edx_rbac.role_catalog`), the role table isn't joined.
+        """
+        return cls._assignments_queryset(cls._get_role_catalog(), role_names, user=user)
+
+    @classmethod
+    def _iter_assignments(cls, role_catalog, rows):
+        """
+        Yield the (user_id, rolename, context) triples of the rows of an `_assignments_queryset()`.
+        """
+        if cls.context_fields is not None:
+            for user_id, role, applies_to_all_contexts, *values in rows:
+                if applies_to_all_contexts and cls.honors_applies_to_all_contexts:
+                    yield user_id, cls._role_name(role_catalog, role), ALL_ACCESS_CONTEXT
+                else:
+                    yield user_id, cls._role_name(role_catalog, role), cls.context_from_values(*values)
+            return
+
+        batch = []
+        for assignment in rows:
+            batch.append(assignment)
+            if len(batch) == cls.assignment_chunk_size:
+                yield from cls._iter_batch_assignments(batch, role_catalog)
+                batch = []
+        yield from cls._iter_batch_assignments(batch, role_catalog)
+
+    @classmethod
+    async def _aiter_assignments(cls, role_catalog, rows):
+        """
+        Async counterpart of `_iter_assignments()`, over the rows of an async iterator.
+        """
+        if cls.context_fields is not None:
+            async for user_id, role, applies_to_all_contexts, *values in rows:
+                if applies_to_all_contexts and cls.honors_applies_to_all_contexts:
+                    yield user_id, await cls._arole_name(role_catalog, role), ALL_ACCESS_CONTEXT
+                else:
+                    yield user_id, await cls._arole_name(role_catalog, role), cls.context_from_values(*values)
+            return
+
+        batch = []
+        async for assignment in rows:
+            batch.append(assignment)
+            if len(batch) == cls.assignment_chunk_size:
+                async for assignment_triple in cls._aiter_batch_assignments(batch, role_catalog):
+                    yield assignment_triple
+                batch = []
+        async for assignment_triple in cls._aiter_batch_assignments(batch, role_catalog):
+            yield assignment_triple
+
     @classmethod
     def get_assignments(cls, user, role_names=None):
         """
         Return iterator of (rolename, context).
+
+        When `honors_applies_to_all_contexts` is True, the context of an assignment that
+        `applies_to_all_contexts` is the `ALL_ACCESS_CONTEXT`.
+        """
+        if user.is_anonymous:
+            return
+
+        role_catalog = cls._get_role_catalog()
+        rows = cls.get_assignments_queryset(user, role_names).iterator(chunk_size=cls.assignment_chunk_size)
+        for __, role_name, context in cls._iter_assignments(role_catalog, rows):
+            yield role_name, context
+
+    @classmethod
+    async def aget_assignments(cls, user, role_names=None):
+        """
+        Async counterpart of `get_assignments()`: return an async iterator of (rolename, context).
+
+        The assignments are fetched with the async ORM.  Unlike `get_assignments()`, this doesn't
+        call `get_assignments_queryset()`, so subclasses overriding it should override this too.
+        If `get_assignments()` is overridden, it's called in a thread instead.
+        """
+        if user.is_anonymous:
+            return
+        if cls._overrides_get_assignments():
+            for role_name, context in await sync_to_async(lambda: list(cls.get_assignments(user, role_names)))():
+                yield role_name, context
+            return
+
+        role_catalog = await cls._aget_role_catalog(role_names)
+        rows = _aiterate(cls._assignments_queryset(role_catalog, role_names, user=user), cls.assignment_chunk_size)
+        async for __, role_name, context in cls._aiter_assignments(role_catalog, rows):
+            yield role_name, context
+
+    @classmethod
+    def _overrides_get_assignments(cls):
+        """
+        Return True if this class overrides `get_assignments()`, which must then be called for each user.
+        """
+        return cls.get_assignments.__func__ is not UserRoleAssignment.get_assignments.__func__
+
+    @classmethod
+    def get_assignments_for_users(cls, users, role_names=None):
+        """
+        Return a dict of the primary key of each of the given users to the list of their (rolename, context)
+        assignments, in the same order as `get_assignments()` returns them, fetched with a single query.
+
+        If `get_assignments()` is overridden, it's called for each user instead.
+        """
+        if cls._overrides_get_assignments():
+            return {
+                user.pk: list(cls.get_assignments(user, role_names)) for user in users if not user.is_anonymous
+            }
+
+        user_ids = [user.pk for user in users if not user.is_anonymous]
+        assignments = {user_id: [] for user_id in user_ids}
+        if user_ids:
+            role_catalog = cls._get_role_catalog()
+            rows = cls._assignments_queryset(role_catalog, role_names, user_id__in=user_ids)
+            for user_id, role_name, context in cls._iter_assignments(
+                role_catalog, rows.iterator(chunk_size=cls.assignment_chunk_size)
+            ):
+                assignments[user_id].append((role_name, context))
+        return assignments
+
+    @classmethod
+    def get_assignment_rows(cls, user_ids, role_names=None, source=0):
+        """
+        Return a queryset of the ``(source, user_id, rolename, context, pk)`` assignment rows of the given users,
+        with the context computed by the database, or None if the database can't compute it.
+
+        That's possible when the context is derived from at most one string field of `context_fields`, as is
+        (i.e. without overriding `context_from_values()`), and `get_assignments()` isn't overridden.  `source`
+        is returned as-is in every row, to tell the rows of several classes apart when their querysets are
+        combined with ``UNION ALL``.
+        """
+        return cls._assignment_rows(cls._get_role_catalog() if role_names else None, user_ids, role_names, source)
+
+    @classmethod
+    def _assignment_rows(cls, role_catalog, user_ids, role_names=None, source=0):
         """
-        if not user.is_anonymous:
-            kwargs = {'user': user}
-            if role_names:
-                kwargs['role__name__in'] = role_names
+        Return the queryset of `get_assignment_rows` for the given role catalog.
+        """
+        if cls.context_fields is None or len(cls.context_fields) > 1 or cls._overrides_get_assignments():
+            return None
+        if cls.context_from_values.__func__ is not UserRoleAssignment.context_from_values.__func__:
+            return None
+        if cls.context_fields:
+            if _get_lookup_field(cls, cls.context_fields[0]).get_internal_type() not in STRING_CONTEXT_FIELD_TYPES:
+                return None
+            context = models.F(cls.context_fields[0])
+        else:
+            context = models.Value(None, output_field=models.CharField())
+
+        if cls.honors_applies_to_all_contexts:
+            context = models.Case(
+                models.When(applies_to_all_contexts=True, then=models.Value(ALL_ACCESS_CONTEXT)),
+                default=context,
+                output_field=models.CharField(),
+            )
 
-            for assignment in cls.objects.filter(**kwargs).select_related('role'):
-                yield assignment.role.name, assignment.get_context()
+        assignments = cls.objects.filter(user_id__in=user_ids)
+        if role_names:
+            assignments = assignments.filter(cls._role_filter(role_catalog, role_names))
+        return assignments.annotate(
+            rbac_source=models.Value(source),
+            rbac_context=context,
+        ).values_list('rbac_source', 'user_id', 'role__name', 'rbac_context', 'pk')
+
+    @classmethod
+    def _iter_batch_assignments(cls, assignments, role_catalog=None):
+        """
+        Yield the (user_id, rolename, context) triples of a batch of assignments.
+        """
+        if assignments:
+            contexts = cls.get_contexts(assignments)
+            for assignment, context in zip(assignments, contexts):
+                role_name = role_catalog.name_for(assignment.role_id) if role_catalog else assignment.role.name
+                if assignment.applies_to_all_contexts and cls.honors_applies_to_all_contexts:
+                    context = ALL_ACCESS_CONTEXT
+                yield assignment.user_id, role_name, context
+
+    @classmethod
+    async def _aiter_batch_assignments(cls, assignments, role_catalog=None):
+        """
+        Async counterpart of `_iter_batch_assignments()`.
+        """
+        if assignments:
+            contexts = await cls.aget_contexts(assignments)
+            for assignment, context in zip(assignments, contexts):
+                if role_catalog:
+                    role_name = await role_catalog.aname_for(assignment.role_id)
+                else:
+                    role_name = assignment.role.name
+                if assignment.applies_to_all_contexts and cls.honors_applies_to_all_contexts:
+                    context = ALL_ACCESS_CONTEXT
+                yield assignment.user_id, role_name, context
 
     def __str__(self):
         """
@@ -111,3 +518,183 @@ class UserRoleAssignment(TimeStampedModel, metaclass=UserRoleAssignmentCreator):
         Return uniquely identifying string representation.
         """
         return self.__str__()
+
+
+def recommended_assignment_indexes(prefix):
+    """
+    Return the indexes recommended for a concrete `UserRoleAssignment` subclass, to add to its ``Meta.indexes``.
+
+    * A composite index on ``(user, role)``, which serves every lookup of a user's assignments of some roles.
+      (The unique constraint of `ContextualUserRoleAssignment` already provides one.)
+    * A partial index on ``(user, role)`` of the assignments that `applies_to_all_contexts`, which serves
+      `get_all_contexts_role()` when `honors_applies_to_all_contexts` is True.  Databases without partial
+      indexes, like MySQL, ignore it.
+
+    Index names are limited to 30 characters, so the names of the indexes are made from the given short
+    `prefix` rather than from the name of the model, e.g.::
+
+        class Meta:
+            indexes = recommended_assignment_indexes('ent_ura')
+    """
+    indexes = [
+        models.Index(fields=['user', 'role'], name=f'{prefix}_user_role_idx'),
+        models.Index(
+            fields=['user', 'role'],
+            condition=models.Q(applies_to_all_contexts=True),
+            name=f'{prefix}_all_ctx_idx',
+        ),
+    ]
+    for index in indexes:
+        if len(index.name) > index.max_name_length:
+            raise ValueError(
+                f'The index name {index.name!r} is longer than {index.max_name_length} characters; '
+                'use a shorter prefix.'
+            )
+    return indexes
+
+
+async def _aiterate(queryset, chunk_size):
+    """
+    Yield the results of a queryset, fetched in a thread `chunk_size` rows at a time.
+
+    This is what ``QuerySet.aiterator()`` does, except that it runs the query of a ``values_list()``
+    queryset of several fields on the event loop, where the ORM refuses to run it.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+
+    def next_chunk():
+        return list(islice(rows, chunk_size))
+
+    while chunk := await sync_to_async(next_chunk)():
+        for row in chunk:
+            yield row
+        if len(chunk) < chunk_size:
+            break
+
+
+def _get_lookup_field(model, lookup):
+    """
+    Return the field a lookup (which may span relationships) of the given model resolves to.
+    """
+    field = None
+    for field_name in lookup.split(LOOKUP_SEP):
+        field = model._meta.get_field(field_name)
+        model = field.related_model
+    return field.target_field if field.is_relation else field
+
+
+class ContextualUserRoleAssignment(UserRoleAssignment):
+    """
+    Model for mapping users and their roles in a single context, held in an indexed ``context`` column.
+
+    Because contexts are stored in the database, checks for specific contexts are answered by
+    an indexed query (see `user_has_contexts()`), rather than by loading every context of the user.
+    An assignment without a context has a null ``context``.
+    """
+
+    context = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text=_('The context in which the user is assigned their role.'),
+    )
+
+    context_fields = ('context',)
+
+    class Meta:
+        """
+        Meta class for ContextualUserRoleAssignment.
+        """
+
+        abstract = True
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'role', 'context'],
+                name='%(app_label)s_%(class)s_uniq',
+            ),
+        ]
+
+    def get_context(self):
+        """
+        Return the context of this role assignment.
+        """
+        return self.context
+
+    @classmethod
+    def _all_contexts_filter(cls):
+        """
+        Return the filter matching assignments that apply to all contexts, by context (or by flag).
+        """
+        all_contexts_filter = models.Q(context=ALL_ACCESS_CONTEXT)
+        if cls.honors_applies_to_all_contexts:
+            all_contexts_filter |= models.Q(applies_to_all_contexts=True)
+        return all_contexts_filter
+
+    @classmethod
+    def user_has_contexts(cls, user, role_names, contexts):
+        """
+        Return True if the user is assigned any of the given roles in every one of the given contexts.
+
+        `contexts` may be a single context or a collection of contexts.  This is a single query, filtered
+        on ``(user, role, context)``, which returns at most one row per requested context (and, when
+        hierarchical contexts are enabled, per ancestor of a requested context).
+        """
+        if user.is_anonymous:
+            return False
+
+        # Contexts are compared with the values of the ``context`` column, as strings.
+        contexts = {str(context) for context in set_from_collection_or_single_item(contexts)}
+        role_catalog = cls._get_role_catalog()
+        rows = cls._contexts_queryset(role_catalog, user, role_names, contexts)
+        access_map = AccessMap.from_pairs(
+            (cls._role_name(role_catalog, role), cls._context_of_row(applies_to_all_contexts, context))
+            for role, applies_to_all_contexts, context in rows
+        )
+        return access_map.grants(contexts)
+
+    @classmethod
+    async def auser_has_contexts(cls, user, role_names, contexts):
+        """
+        Async counterpart of `user_has_contexts()`.
+        """
+        if user.is_anonymous:
+            return False
+
+        # Contexts are compared with the values of the ``context`` column, as strings.
+        contexts = {str(context) for context in set_from_collection_or_single_item(contexts)}
+        role_catalog = await cls._aget_role_catalog(role_names)
+        rows = cls._contexts_queryset(role_catalog, user, role_names, contexts)
+        access_map = AccessMap.from_pairs([
+            (await cls._arole_name(role_catalog, role), cls._context_of_row(applies_to_all_contexts, context))
+            async for role, applies_to_all_contexts, context in rows
+        ])
+        return access_map.grants(contexts)
+
+    @classmethod
+    def _context_of_row(cls, applies_to_all_contexts, context):
+        """
+        Return the context granted by an assignment, given its ``applies_to_all_contexts`` and ``context`` columns.
+        """
+        return ALL_ACCESS_CONTEXT if applies_to_all_contexts and cls.honors_applies_to_all_contexts else context
+
+    @classmethod
+    def _contexts_queryset(cls, role_catalog, user, role_names, contexts):
+        """
+        Return the queryset of the ``(role, applies_to_all_contexts, context)`` rows of the user's assignments
+        of the given roles which may grant one of the given contexts.
+        """
+        candidate_contexts = set(contexts)
+        separator = get_hierarchical_context_separator()
+        if separator:
+            for context in contexts:
+                if not isinstance(context, str):
+                    continue
+                segments = context.split(separator)
+                candidate_contexts.update(separator.join(segments[:i]) for i in range(1, len(segments)))
+
+        return cls.objects.filter(
+            cls._all_contexts_filter() | models.Q(context__in=candidate_contexts),
+            cls._role_filter(role_catalog, role_names),
+            user=user,
+        ).values_list(cls._role_column(role_catalog), 'applies_to_all_contexts', 'context')
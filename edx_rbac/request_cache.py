@@ -0,0 +1,75 @@
+"""
+Request-scoped state for the 'edx-rbac' module.
+
+Values stored here are tied to the lifetime of the request object they were computed for,
+so nothing computed for one request can leak into the next one.
+
+Within `request_scope()`, the current request is held in a `contextvars.ContextVar`, so that it's
+scoped to the thread, greenlet or asyncio task serving the request, and follows the request across
+``asgiref.sync.sync_to_async`` and ``async_to_sync`` boundaries.  Outside of any scope, it's crum's.
+"""
+
+import contextvars
+import weakref
+from contextlib import contextmanager
+
+import crum
+
+# Maps each live request object to the dictionary of values memoized for it.
+# Entries disappear on their own once the request is garbage collected.
+_REQUEST_CACHES = weakref.WeakKeyDictionary()
+
+_current_request = contextvars.ContextVar('edx_rbac.current_request', default=None)
+
+
+def get_current_request():
+    """
+    Return the request being served in the current context.
+
+    Falls back to ``crum.get_current_request()``, for requests that were only set by crum's middleware.
+    """
+    return _current_request.get() or crum.get_current_request()
+
+
+def set_current_request(request):
+    """
+    Make `request` crum's current request, until it's set again (e.g. by crum's middleware for the next request).
+
+    Unlike `request_scope()`, it leaves the context alone: a value set there outside of any scope would outlive
+    the request, and hide the request crum's middleware sets for the next one served by the same thread.
+    """
+    crum.set_current_request(request)
+
+
+@contextmanager
+def request_scope(request):
+    """
+    Make `request` the request being served in the current context, within the ``with`` block.
+    """
+    token = _current_request.set(request)
+    previous_crum_request = crum.get_current_request()
+    crum.set_current_request(request)
+    try:
+        yield request
+    finally:
+        crum.set_current_request(previous_crum_request)
+        _current_request.reset(token)
+
+
+def get_request_cache(request):
+    """
+    Return the dictionary of values memoized for the given `request`.
+
+    A DRF ``Request`` shares the cache of the Django ``HttpRequest`` it wraps, so
+    callers holding either object see the same memoized values.  When there is no
+    request, or the request can't be weakly referenced, a throwaway dictionary is
+    returned and nothing is memoized.
+    """
+    if request is None:
+        return {}
+
+    request = getattr(request, '_request', request)
+    try:
+        return _REQUEST_CACHES.setdefault(request, {})
+    except TypeError:
+        return {}
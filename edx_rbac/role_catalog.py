@@ -0,0 +1,171 @@
+"""
+Per-process catalog of the names and primary keys of the roles of each `UserRole` subclass.
+
+Roles almost never change, so when the catalog is enabled, assignment queries filter on the primary
+keys of roles, instead of joining the role table to filter on role names, and role names are looked up
+in the catalog rather than fetched along with every assignment.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+
+from edx_rbac.constants import ROLE_CATALOG_TIMEOUT_SETTING
+
+_role_catalogs = {}
+_lock = threading.Lock()
+
+
+class RoleCatalog:
+    """
+    The names and primary keys of every role of a `UserRole` subclass, as loaded from the database.
+    """
+
+    def __init__(self, role_class, names_by_pk=None):
+        """
+        Load the roles of `role_class`, unless their names by primary key were already loaded as `names_by_pk`.
+        """
+        self.role_class = role_class
+        self.loaded_at = time.monotonic()
+        if names_by_pk is None:
+            names_by_pk = dict(role_class.objects.values_list('pk', 'name'))
+        self.names_by_pk = names_by_pk
+        self.pks_by_name = {name: pk for pk, name in self.names_by_pk.items()}
+        # The names of roles which were still missing when the catalog was reloaded to find them.
+        self.missing_names = frozenset()
+
+    def pks_for(self, role_names):
+        """
+        Return the list of the primary keys of the given roles; roles that don't exist are left out.
+
+        The first time one of the roles isn't found, the catalog is reloaded, in case it was created since.
+        """
+        if self._unknown_names(role_names):
+            self._reload(self.role_class.objects.values_list('pk', 'name'), role_names)
+        return self._known_pks_for(role_names)
+
+    async def apks_for(self, role_names):
+        """
+        Async counterpart of `pks_for()`.
+        """
+        if self._unknown_names(role_names):
+            self._reload([row async for row in self.role_class.objects.values_list('pk', 'name')], role_names)
+        return self._known_pks_for(role_names)
+
+    def _unknown_names(self, role_names):
+        """
+        Return the set of the given role names which are neither in the catalog nor known to be missing.
+        """
+        return set(role_names).difference(self.pks_by_name, self.missing_names)
+
+    def _known_pks_for(self, role_names):
+        """
+        Return the list of the primary keys of the given roles that are in the catalog.
+        """
+        return [self.pks_by_name[role_name] for role_name in role_names if role_name in self.pks_by_name]
+
+    def _reload(self, rows, role_names):
+        """
+        Replace the roles of the catalog with the given ``(pk, name)`` rows, and remember which of the given
+        role names are still missing.
+        """
+        names_by_pk = dict(rows)
+        pks_by_name = {name: pk for pk, name in names_by_pk.items()}
+        # Replace the dicts rather than updating them, for the sake of concurrent readers.
+        self.names_by_pk, self.pks_by_name = names_by_pk, pks_by_name
+        self.missing_names = self.missing_names.union(set(role_names).difference(pks_by_name))
+
+    def name_for(self, pk):
+        """
+        Return the name of the role with the given primary key.
+
+        A role created since the catalog was loaded is fetched from the database.
+        """
+        try:
+            return self.names_by_pk[pk]
+        except KeyError:
+            return self._add(pk, self.role_class.objects.values_list('name', flat=True).get(pk=pk))
+
+    async def aname_for(self, pk):
+        """
+        Async counterpart of `name_for()`.
+        """
+        try:
+            return self.names_by_pk[pk]
+        except KeyError:
+            return self._add(pk, await self.role_class.objects.values_list('name', flat=True).aget(pk=pk))
+
+    def _add(self, pk, name):
+        """
+        Add a role that was fetched from the database, and return its name.
+        """
+        # Replace the dicts rather than updating them, for the sake of concurrent readers.
+        self.names_by_pk = {**self.names_by_pk, pk: name}
+        self.pks_by_name = {**self.pks_by_name, name: pk}
+        return name
+
+
+def _get_timeout():
+    """
+    Return the timeout of the role catalog in seconds, or None if it is disabled.
+    """
+    return getattr(settings, ROLE_CATALOG_TIMEOUT_SETTING, None)
+
+
+def _get_current_catalog(role_class, timeout):
+    """
+    Return the catalog of the given `UserRole` subclass, or None if it wasn't loaded or has expired.
+    """
+    catalog = _role_catalogs.get(role_class)
+    if catalog is None or time.monotonic() - catalog.loaded_at > timeout:
+        return None
+    return catalog
+
+
+def _set_catalog(catalog):
+    """
+    Make the given catalog the current one of its `UserRole` subclass, and return it.
+    """
+    with _lock:
+        _role_catalogs[catalog.role_class] = catalog
+    return catalog
+
+
+def get_role_catalog(role_class):
+    """
+    Return the `RoleCatalog` of the given `UserRole` subclass, or None if the role catalog is disabled.
+    """
+    timeout = _get_timeout()
+    if not timeout:
+        return None
+    return _get_current_catalog(role_class, timeout) or _set_catalog(RoleCatalog(role_class))
+
+
+async def aget_role_catalog(role_class):
+    """
+    Async counterpart of `get_role_catalog()`.
+    """
+    timeout = _get_timeout()
+    if not timeout:
+        return None
+    if catalog := _get_current_catalog(role_class, timeout):
+        return catalog
+    names_by_pk = {pk: name async for pk, name in role_class.objects.values_list('pk', 'name')}
+    return _set_catalog(RoleCatalog(role_class, names_by_pk))
+
+
+def clear_role_catalogs():
+    """
+    Discard the catalogs of every `UserRole` subclass.
+    """
+    with _lock:
+        _role_catalogs.clear()
+
+
+def handle_role_changed(sender, **kwargs):
+    """
+    Discard the catalog of a `UserRole` subclass one of whose roles was saved or deleted.
+    """
+    with _lock:
+        _role_catalogs.pop(sender, None)
@@ -0,0 +1,78 @@
+"""
+Compiled form of the ``SYSTEM_TO_FEATURE_ROLE_MAPPING`` setting.
+
+The setting maps each system-wide role to the feature roles it implies.  Permission checks
+ask the opposite question (which system roles grant this feature role?), so the mapping is
+compiled once, when the app is ready, into indexes that answer both questions directly.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+
+SYSTEM_TO_FEATURE_ROLE_MAPPING_SETTING = 'SYSTEM_TO_FEATURE_ROLE_MAPPING'
+
+_compiled_role_mapping = None
+
+
+class CompiledRoleMapping:
+    """
+    Forward and reverse indexes over a mapping of system-wide roles to feature roles.
+    """
+
+    def __init__(self, system_to_feature_roles):
+        """
+        Build the indexes from a dict of system role name to a list of feature role names.
+        """
+        self.feature_roles_by_system_role = {
+            system_role: tuple(feature_roles)
+            for system_role, feature_roles in system_to_feature_roles.items()
+        }
+
+        system_roles_by_feature_role = defaultdict(set)
+        for system_role, feature_roles in self.feature_roles_by_system_role.items():
+            for feature_role in feature_roles:
+                system_roles_by_feature_role[feature_role].add(system_role)
+        self.system_roles_by_feature_role = {
+            feature_role: frozenset(system_roles)
+            for feature_role, system_roles in system_roles_by_feature_role.items()
+        }
+
+    def feature_roles_for(self, system_role):
+        """
+        Return the tuple of feature roles implied by the given system role.
+        """
+        return self.feature_roles_by_system_role.get(system_role, ())
+
+    def system_roles_for(self, feature_roles):
+        """
+        Return the frozenset of system roles that imply any of the given feature roles.
+        """
+        system_roles = frozenset()
+        for feature_role in feature_roles:
+            system_roles = system_roles.union(self.system_roles_by_feature_role.get(feature_role, ()))
+        return system_roles
+
+
+def compile_role_mapping():
+    """
+    Compile the ``SYSTEM_TO_FEATURE_ROLE_MAPPING`` setting and make it the active mapping.
+    """
+    global _compiled_role_mapping  # pylint: disable=global-statement
+    _compiled_role_mapping = CompiledRoleMapping(getattr(settings, SYSTEM_TO_FEATURE_ROLE_MAPPING_SETTING, {}))
+    return _compiled_role_mapping
+
+
+def get_role_mapping():
+    """
+    Return the active `CompiledRoleMapping`, compiling it first if necessary.
+    """
+    return _compiled_role_mapping or compile_role_mapping()
+
+
+def handle_setting_changed(setting, **kwargs):
+    """
+    Recompile the mapping when ``SYSTEM_TO_FEATURE_ROLE_MAPPING`` is changed, e.g. by ``override_settings``.
+    """
+    if setting == SYSTEM_TO_FEATURE_ROLE_MAPPING_SETTING:
+        compile_role_mapping()
@@ -2,29 +2,63 @@
 Utils for 'edx-rbac' module.
 """
 
-import importlib
-from collections import OrderedDict, defaultdict
+import operator
+from collections import defaultdict
 from collections.abc import Iterable
+from functools import reduce
 from logging import getLogger
 
-from django.apps import apps
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.utils.functional import LazyObject, empty
 from edx_rest_framework_extensions.auth.jwt.authentication import get_decoded_jwt_from_auth
 from edx_rest_framework_extensions.auth.jwt.cookies import get_decoded_jwt as get_decoded_jwt_from_cookie
 from jwt.exceptions import InvalidTokenError
 
-from edx_rbac.constants import ALL_ACCESS_CONTEXT, IGNORE_INVALID_JWT_COOKIE_SETTING
+from edx_rbac.access_map import AccessMap
+from edx_rbac.cache import (
+    aget_or_build_roles_claim,
+    aget_user_assignments,
+    get_assignment_cache_timeout,
+    get_or_build_roles_claim,
+    get_parsed_role_claim_cache,
+    get_user_assignments
+)
+from edx_rbac.claims import (
+    ClaimDeadline,
+    aget_assignments_of_classes,
+    get_assignments_of_classes,
+    get_claim_builder,
+    get_roles_claim_overflow_source,
+    iter_claim_pairs,
+    iter_role_source,
+    iter_roles_claim
+)
+from edx_rbac.constants import ALL_ACCESS_CONTEXT, IGNORE_INVALID_JWT_COOKIE_SETTING, ROLES_CLAIM_OVERFLOW_CONTEXT
+from edx_rbac.request_cache import get_current_request, get_request_cache
+from edx_rbac.role_mapping import get_role_mapping
 
 logger = getLogger(__name__)
 
+# Key under which the outcome of decoding a request's JWT is memoized in the request cache.
+DECODED_JWT_CACHE_KEY = 'edx_rbac.decoded_jwt'
 
-def request_user_has_implicit_access_via_jwt(decoded_jwt, role_name, context=None):
+# Key under which each user's DB-persisted role assignments are memoized in the request cache.
+ASSIGNMENTS_CACHE_KEY = 'edx_rbac.assignments'
+
+# Key under which the contexts of roles that overflowed the JWT roles claim are memoized in the request cache.
+OVERFLOW_CONTEXTS_CACHE_KEY = 'edx_rbac.overflow_contexts'
+
+
+def request_user_has_implicit_access_via_jwt(decoded_jwt, role_name, context=None, user=None):
     """
     Check the request's user access by mapping user's roles found in jwt to local feature roles.
 
     decoded_jwt is a dict
     role_name is a string
     context is anything
+    user is the user the jwt was issued to, defaulting to the current request's user.  It's only
+    needed if the role overflowed the jwt's roles claim, to look the role up from the overflow source.
 
     Returns a boolean.
 
@@ -40,6 +74,11 @@ def request_user_has_implicit_access_via_jwt(decoded_jwt, role_name, context=Non
         return False
 
     assigned_contexts = contexts_accessible_from_jwt(decoded_jwt, [role_name])
+    if assigned_contexts.overflow_roles:
+        request = get_current_request()
+        assigned_contexts = _resolve_overflowed_roles(
+            assigned_contexts, user or getattr(request, 'user', None), request
+        )
     return _user_has_access(assigned_contexts, context)
 
 
@@ -50,27 +89,125 @@ def contexts_accessible_from_request(request, role_names):
 
     This answers the question: What are all of the contexts accessible to the
     requesting user under the given role via the request's JWT?
+
+    Roles that overflowed the JWT's roles claim are looked up from the overflow source.
     """
-    return contexts_accessible_from_jwt(
+    accessible_contexts = contexts_accessible_from_jwt(
         get_decoded_jwt(request),
         role_names
     )
+    return _resolve_overflowed_roles(accessible_contexts, getattr(request, 'user', None), request)
+
+
+async def acontexts_accessible_from_request(request, role_names):
+    """
+    Async counterpart of `contexts_accessible_from_request()`.
+
+    The JWT is decoded and its roles claim parsed in a thread of their own (see ``thread_sensitive`` in
+    ``asgiref.sync.sync_to_async``), rather than in the single thread that runs the ORM, so that they can
+    run while database queries are served.  Only the roles that overflowed the claim are then looked up
+    in that thread.
+    """
+    accessible_contexts = await sync_to_async(
+        lambda: contexts_accessible_from_jwt(get_decoded_jwt(request), role_names), thread_sensitive=False,
+    )()
+    if not accessible_contexts.overflow_roles:
+        return accessible_contexts
+    return await sync_to_async(
+        lambda: _resolve_overflowed_roles(accessible_contexts, getattr(request, 'user', None), request)
+    )()
+
+
+def _resolve_overflowed_roles(access_map, user, request=None):
+    """
+    Resolve the roles of `access_map` that overflowed the JWT roles claim from the roles claim overflow source.
+
+    The contexts found for the overflowed roles are memoized on the request, per user.  If no overflow source
+    is configured, or there is no user, overflowed roles grant no contexts.
+    """
+    if not access_map.overflow_roles:
+        return access_map
+
+    request_cache = get_request_cache(request)
+    cache_key = (OVERFLOW_CONTEXTS_CACHE_KEY, getattr(user, 'pk', None), access_map.overflow_roles)
+    if cache_key not in request_cache:
+        request_cache[cache_key] = _access_map_from_overflow_source(user, access_map.overflow_roles)
+    return access_map.resolve_overflow(request_cache[cache_key])
+
+
+def _access_map_from_overflow_source(user, feature_roles):
+    """
+    Return an `AccessMap` of the contexts the roles claim overflow source grants the user under the feature roles.
+    """
+    overflow_source = get_roles_claim_overflow_source()
+    if overflow_source is None or user is None or getattr(user, 'is_anonymous', False):
+        logger.warning(
+            '[edx_rbac] The JWT roles claim overflowed for roles %s, but they cannot be looked up.',
+            sorted(feature_roles),
+        )
+        return AccessMap()
+
+    role_mapping = get_role_mapping()
+    system_roles = role_mapping.system_roles_for(feature_roles)
+    contexts_by_role = defaultdict(set)
+    system_role_pairs = iter_claim_pairs(iter_role_source(overflow_source, user, system_roles))
+    for system_role, context in system_role_pairs:
+        for feature_role in role_mapping.feature_roles_for(system_role):
+            if feature_role in feature_roles:
+                contexts_by_role[feature_role].add(context)
+    return AccessMap(contexts_by_role)
 
 
 def contexts_accessible_from_jwt(decoded_jwt, role_names):
     """
     Given a `decoded_jwt` dictionary and a list of role names,
-    returns a set of contexts (identifiers) to which the JWT
+    returns an `AccessMap` (a frozenset-like collection) of contexts (identifiers) to which the JWT
     grants access for the given roles.  May contain the "wildcard" `ALL_ACCESS_CONTEXT`,
     which grants access within these roles to any context.
+
+    If the parsed roles claim cache is enabled, the whole claim is parsed once per token and
+    answered from the cache.  Otherwise only the claims relevant to `role_names` are parsed.
     """
-    assigned_contexts_by_feature_role = feature_roles_from_jwt(decoded_jwt)
-    accessible_contexts = set()
-    for role_name in role_names:
-        accessible_contexts.update(
-            assigned_contexts_by_feature_role.get(role_name, [])
-        )
-    return accessible_contexts
+    if parsed_role_claim_cache := get_parsed_role_claim_cache():
+        return parsed_role_claim_cache.get_or_parse(decoded_jwt, access_map_from_jwt).for_roles(role_names)
+    return access_map_from_jwt(decoded_jwt, role_names)
+
+
+def access_map_from_jwt(decoded_jwt, role_names=None):
+    """
+    Parse the roles claim of the given `decoded_jwt` into an `AccessMap` of feature roles to contexts.
+
+    If `role_names` is given, only the claims for system roles that map onto one of those
+    feature roles are inspected.  Once a feature role is found to grant the wildcard
+    `ALL_ACCESS_CONTEXT`, which subsumes every other context, its remaining claims are skipped,
+    and the scan stops once that is true of every requested role.
+
+    Feature roles granted by a system role whose contexts overflowed the claim are listed in the
+    map's `overflow_roles`.
+    """
+    role_mapping = get_role_mapping()
+    if role_names is None:
+        pending_roles = set(role_mapping.system_roles_by_feature_role)
+    else:
+        pending_roles = set(role_names).intersection(role_mapping.system_roles_by_feature_role)
+
+    contexts_by_role = defaultdict(set)
+    overflow_roles = set()
+    for role_in_jwt, context_in_jwt in iter_roles_claim(decoded_jwt.get('roles', [])):
+        if not pending_roles:
+            break
+        for feature_role in role_mapping.feature_roles_for(role_in_jwt):
+            if feature_role not in pending_roles:
+                continue
+            if context_in_jwt == ROLES_CLAIM_OVERFLOW_CONTEXT:
+                overflow_roles.add(feature_role)
+            elif context_in_jwt == ALL_ACCESS_CONTEXT:
+                contexts_by_role[feature_role] = {ALL_ACCESS_CONTEXT}
+                pending_roles.discard(feature_role)
+            else:
+                contexts_by_role[feature_role].add(context_in_jwt)
+
+    return AccessMap(contexts_by_role, overflow_roles)
 
 
 def feature_roles_from_jwt(decoded_jwt):
@@ -82,14 +219,12 @@ def feature_roles_from_jwt(decoded_jwt):
     means the primary identifier of some resource.
     """
     jwt_roles_claim = decoded_jwt.get('roles', [])
+    role_mapping = get_role_mapping()
 
     feature_roles = defaultdict(list)
 
-    for role_data in jwt_roles_claim:
-        # split should be more robust because of our cousekeys having colons
-        role_in_jwt, __, context_in_jwt = role_data.partition(':')
-        mapped_roles = settings.SYSTEM_TO_FEATURE_ROLE_MAPPING.get(role_in_jwt, [])
-        for role in mapped_roles:
+    for role_in_jwt, context_in_jwt in iter_roles_claim(jwt_roles_claim):
+        for role in role_mapping.feature_roles_for(role_in_jwt):
             feature_roles[role].append(context_in_jwt)
 
     return feature_roles
@@ -103,42 +238,232 @@ def user_has_access_via_database(user, role_name, role_assignment_class, context
     single context string which could be an ALL_ACCESS_CONTEXT or, incase of multiple user contexts, a list of strings.
     The context argument is evaluated against the context(s) received from the role_assignment_class while accounting
     for the ALL_ACCESS_CONTEXT to grant access.
+
+    If the role_assignment_class is a `ContextualUserRoleAssignment`, checks for specific contexts are
+    answered by a single indexed query, unless the user's assignments are already cached.
     """
     if getattr(user, 'is_anonymous', False):
         return False
 
+    if (
+        # Only `ContextualUserRoleAssignment` subclasses know how to check contexts in the database.
+        context and hasattr(role_assignment_class, 'user_has_contexts')
+        and not get_assignment_cache_timeout()
+        and (ASSIGNMENTS_CACHE_KEY, role_assignment_class, user.pk) not in _request_cache_for_user(user)
+    ):
+        return role_assignment_class.user_has_contexts(user, [role_name], context)
+
     assigned_contexts = contexts_accessible_from_database(user, [role_name], role_assignment_class)
     return _user_has_access(assigned_contexts, context)
 
 
+async def auser_has_access_via_database(user, role_name, role_assignment_class, context=None):
+    """
+    Async counterpart of `user_has_access_via_database()`, which queries the database with the async ORM.
+    """
+    if getattr(user, 'is_anonymous', False):
+        return False
+
+    if (
+        context and hasattr(role_assignment_class, 'auser_has_contexts')
+        and not get_assignment_cache_timeout()
+        and (ASSIGNMENTS_CACHE_KEY, role_assignment_class, user.pk) not in _request_cache_for_user(user)
+    ):
+        return await role_assignment_class.auser_has_contexts(user, [role_name], context)
+
+    assigned_contexts = await acontexts_accessible_from_database(user, [role_name], role_assignment_class)
+    return _user_has_access(assigned_contexts, context)
+
+
+def _is_request_user(request, user):
+    """
+    Return True if `user` is the user of `request`.
+
+    The user of a request is usually a ``SimpleLazyObject``, while rules predicates are handed the user it
+    wraps, so users are compared by primary key.  A lazy user that was never evaluated can't have been handed
+    to anyone, and isn't evaluated here, since that could query the database on the event loop.
+    """
+    request_user = getattr(request, 'user', None)
+    if request_user is None or user is None:
+        return False
+    if request_user is user:
+        return True
+    if isinstance(request_user, LazyObject) and request_user._wrapped is empty:  # pylint: disable=protected-access
+        return False
+    return bool(request_user.is_authenticated and user.is_authenticated and request_user.pk == user.pk)
+
+
+def _request_cache_for_user(user):
+    """
+    Return the cache of the current request if `user` is its user, or an empty dict otherwise.
+    """
+    request = get_current_request()
+    if _is_request_user(request, user):
+        return get_request_cache(request)
+    return {}
+
+
 def contexts_accessible_from_database(user, role_names, role_assignment_class):
     """
-    Given a user and role, returns a set of contexts (identifiers) to
+    Given a user and role, returns an `AccessMap` (a frozenset-like collection) of contexts (identifiers) to
     which the user has access for the role.  May contain the "wildcard" `ALL_ACCESS_CONTEXT`,
     which grants access in this role to any context.
 
     This answers the question: What are all of the contexts accessible to the
     requesting user under the given role via DB-persisted role assignments?
-    """
-    assigned_contexts = set()
 
-    for _, context in role_assignment_class.get_assignments(user, role_names):
-        assigned_contexts.update(
-            set_from_collection_or_single_item(context)
+    When `user` is the user of the current request (see `edx_rbac.request_cache.get_current_request()`),
+    all of the user's assignments of the `role_assignment_class` are fetched once, with a single query,
+    and memoized on the request; later calls for any roles are answered from memory.
+
+    When the ``RBAC_ASSIGNMENT_CACHE_TIMEOUT`` setting is configured, all of the user's assignments
+    are also cached across requests (see `edx_rbac.cache.get_user_assignments()`).
+
+    Otherwise (for users other than the request's), before enumerating any assignment from the database,
+    a single-row query looks for an assignment of one of the roles that applies to all contexts (see
+    `UserRoleAssignment.get_all_contexts_role()`); if there is one, only the `ALL_ACCESS_CONTEXT` is returned.
+    """
+    request = get_current_request()
+    in_request = _is_request_user(request, user)
+    request_cache = get_request_cache(request) if in_request else {}
+    cache_key = (ASSIGNMENTS_CACHE_KEY, role_assignment_class, user.pk)
+
+    access_map = request_cache.get(cache_key)
+    if access_map is None:
+        # Within a request, the single query fetching every assignment also finds any all-contexts one.
+        if role_names and not in_request and not get_assignment_cache_timeout():
+            all_contexts_role = role_assignment_class.get_all_contexts_role(user, role_names)
+            if all_contexts_role:
+                return AccessMap({all_contexts_role: [ALL_ACCESS_CONTEXT]})
+            return AccessMap.from_pairs(role_assignment_class.get_assignments(user, role_names))
+        access_map = request_cache[cache_key] = AccessMap.from_pairs(get_user_assignments(role_assignment_class, user))
+    # As with get_assignments(), no role names means all roles.
+    return access_map.for_roles(role_names) if role_names else access_map
+
+
+async def acontexts_accessible_from_database(user, role_names, role_assignment_class):
+    """
+    Async counterpart of `contexts_accessible_from_database()`, which queries the database with the async ORM
+    and shares the assignments memoized on the current request with it.
+    """
+    request = get_current_request()
+    in_request = _is_request_user(request, user)
+    request_cache = get_request_cache(request) if in_request else {}
+    cache_key = (ASSIGNMENTS_CACHE_KEY, role_assignment_class, user.pk)
+
+    access_map = request_cache.get(cache_key)
+    if access_map is None:
+        if role_names and not in_request and not get_assignment_cache_timeout():
+            all_contexts_role = await role_assignment_class.aget_all_contexts_role(user, role_names)
+            if all_contexts_role:
+                return AccessMap({all_contexts_role: [ALL_ACCESS_CONTEXT]})
+            return AccessMap.from_pairs(
+                [pair async for pair in role_assignment_class.aget_assignments(user, role_names)]
+            )
+        access_map = request_cache[cache_key] = AccessMap.from_pairs(
+            await aget_user_assignments(role_assignment_class, user)
         )
-    return assigned_contexts
+    return access_map.for_roles(role_names) if role_names else access_map
+
+
+def contexts_accessible_from_databases(user, role_names, role_assignment_classes):
+    """
+    Like `contexts_accessible_from_database()`, but for the assignments of several `UserRoleAssignment`
+    subclasses, returning the `AccessMap` of the contexts accessible through any of them.
+
+    The assignments of every class which aren't already memoized on the request (or cached across requests)
+    are fetched with as few queries as possible: a single ``UNION ALL`` query for the classes which
+    support it (see `UserRoleAssignment.get_assignment_rows()`), and one query per other class.
+    """
+    role_assignment_classes = list(role_assignment_classes)
+    if len(role_assignment_classes) == 1 or get_assignment_cache_timeout():
+        return reduce(operator.or_, (
+            contexts_accessible_from_database(user, role_names, role_assignment_class)
+            for role_assignment_class in role_assignment_classes
+        ), AccessMap())
+
+    request = get_current_request()
+    in_request = _is_request_user(request, user)
+    request_cache = get_request_cache(request) if in_request else {}
+
+    access_maps = []
+    missing_classes = []
+    for role_assignment_class in role_assignment_classes:
+        access_map = request_cache.get((ASSIGNMENTS_CACHE_KEY, role_assignment_class, user.pk))
+        if access_map is None:
+            missing_classes.append(role_assignment_class)
+        else:
+            access_maps.append(access_map.for_roles(role_names) if role_names else access_map)
+
+    if missing_classes:
+        # Memoizing the assignments on the request requires all of them, not just those of the given roles.
+        assignments = get_assignments_of_classes(user, missing_classes, None if in_request else role_names)
+        for role_assignment_class, pairs in assignments.items():
+            access_map = AccessMap.from_pairs(pairs)
+            if in_request:
+                request_cache[(ASSIGNMENTS_CACHE_KEY, role_assignment_class, user.pk)] = access_map
+                access_map = access_map.for_roles(role_names) if role_names else access_map
+            access_maps.append(access_map)
 
+    return reduce(operator.or_, access_maps, AccessMap())
 
-def create_role_auth_claim_for_user(user):
+
+async def acontexts_accessible_from_databases(user, role_names, role_assignment_classes):
+    """
+    Async counterpart of `contexts_accessible_from_databases()`, which queries the database with the async ORM
+    and shares the assignments memoized on the current request with it.
+    """
+    role_assignment_classes = list(role_assignment_classes)
+    if len(role_assignment_classes) == 1 or get_assignment_cache_timeout():
+        access_maps = [
+            await acontexts_accessible_from_database(user, role_names, role_assignment_class)
+            for role_assignment_class in role_assignment_classes
+        ]
+        return reduce(operator.or_, access_maps, AccessMap())
+
+    request = get_current_request()
+    in_request = _is_request_user(request, user)
+    request_cache = get_request_cache(request) if in_request else {}
+
+    access_maps = []
+    missing_classes = []
+    for role_assignment_class in role_assignment_classes:
+        access_map = request_cache.get((ASSIGNMENTS_CACHE_KEY, role_assignment_class, user.pk))
+        if access_map is None:
+            missing_classes.append(role_assignment_class)
+        else:
+            access_maps.append(access_map.for_roles(role_names) if role_names else access_map)
+
+    if missing_classes:
+        assignments = await aget_assignments_of_classes(user, missing_classes, None if in_request else role_names)
+        for role_assignment_class, pairs in assignments.items():
+            access_map = AccessMap.from_pairs(pairs)
+            if in_request:
+                request_cache[(ASSIGNMENTS_CACHE_KEY, role_assignment_class, user.pk)] = access_map
+                access_map = access_map.for_roles(role_names) if role_names else access_map
+            access_maps.append(access_map)
+
+    return reduce(operator.or_, access_maps, AccessMap())
+
+
+def create_role_auth_claim_for_user(user, claim_version=None, max_claim_bytes=None, timeout=None, source_budgets=None):
     """
     Create role auth claim for a given user.
 
     Takes a user, and for each RoleAssignment class specified in config as a
     system wide jwt role associated with that user, creates and returns
-    a list of unique strings denoting the role and context.
+    a claim of the unique (role, context) pairs found.
     The (role, context) pairs returned preserve the order in which
     the `get_assignment()` function returns them.
 
+    By default, the claim is a list of strings denoting the role and context.  Pass
+    `claim_version` (or configure the ``RBAC_ROLES_CLAIM_VERSION`` setting) to create
+    another version of the claim; see `edx_rbac.claims` for the available encodings.
+
+    Pass `max_claim_bytes` (or configure the ``RBAC_ROLES_CLAIM_MAX_BYTES`` setting) to bound
+    the size of the claim.  The contexts of each role that doesn't fit are replaced by an overflow
+    marker, and readers of the claim look those roles up from their ``RBAC_ROLES_CLAIM_OVERFLOW_SOURCE``.
+
     The SYSTEM_WIDE_ROLE_CLASSES setting is a list of classes whose roles (and associated contexts)
     should be added to the JWT.
 
@@ -147,42 +472,39 @@ def create_role_auth_claim_for_user(user):
         SYSTEM_WIDE_ROLE_CLASSES = [
             SystemWideConcreteUserRoleAssignment
         ]
+
+    The setting is resolved once, into a `edx_rbac.claims.ClaimBuilder`, which fetches the assignments
+    of every model it names with as few queries as possible.  When the ``RBAC_ROLES_CLAIM_CACHE_TIMEOUT``
+    setting is configured, the claim is cached until one of the user's assignments changes.
+
+    Pass `timeout` (or configure the ``RBAC_ROLES_CLAIM_TIMEOUT`` setting) to bound the number of seconds
+    function sources are waited for, and `source_budgets` (or ``RBAC_ROLE_SOURCE_BUDGETS``) to bound it per
+    source location.  Sources which overrun are reported to monitoring, and left out of the claim if they
+    can be; see `edx_rbac.claims.ClaimDeadline`.
     """
-    def append_role_auth_claim(role_string, context=None):
-        """
-        Append the formatted auth claim for a role and context.
-        """
-        if context:
-            contextual_role = f'{role_string}:{context}'
-            role_auth_claim[contextual_role] = None
-        else:
-            role_auth_claim[role_string] = None
-
-    # We want an ordered set of roles.
-    role_auth_claim = OrderedDict()
-    for system_role_loc in settings.SYSTEM_WIDE_ROLE_CLASSES:
-        # location can either be a module or a django model
-        module_name, func_name = system_role_loc.rsplit('.', 1)
-        try:
-            # first, assume that this is a plain function
-            module = importlib.import_module(module_name)
-            role_func = getattr(module, func_name)
-        except (ImportError, AttributeError):
-            # otherwise, assume that it's a django model
-            module = apps.get_model(module_name, func_name)
-            role_func = module.get_assignments
-
-        for role_string, context in role_func(user):
-            if context:
-                if isinstance(context, str):
-                    append_role_auth_claim(role_string, context)
-                else:
-                    for item in context:
-                        append_role_auth_claim(role_string, item)
-            else:
-                append_role_auth_claim(role_string)
+    deadline = ClaimDeadline.from_settings(timeout, source_budgets)
+    return get_or_build_roles_claim(get_claim_builder(), user, claim_version, max_claim_bytes, deadline)
 
-    return list(role_auth_claim)
+
+async def acreate_role_auth_claim_for_user(
+    user, claim_version=None, max_claim_bytes=None, timeout=None, source_budgets=None
+):
+    """
+    Async counterpart of `create_role_auth_claim_for_user()`, which queries the database with the async ORM.
+    """
+    deadline = ClaimDeadline.from_settings(timeout, source_budgets)
+    return await aget_or_build_roles_claim(get_claim_builder(), user, claim_version, max_claim_bytes, deadline)
+
+
+def create_role_auth_claims_for_users(users, claim_version=None, max_claim_bytes=None):
+    """
+    Create the role auth claims of many users at once.
+
+    Returns a dict of each of the given users to the same claim `create_role_auth_claim_for_user()`
+    would create for them, in the order of the users.  The assignments of the users are fetched
+    in chunks, with a constant number of queries per chunk.
+    """
+    return get_claim_builder().build_for_users(users, claim_version, max_claim_bytes)
 
 
 def is_iterable(obj):
@@ -206,12 +528,26 @@ def get_decoded_jwt(request):
     """
     Decodes the request's JWT from either cookies or auth payload and returns it.
     Defaults to an empty dictionary.
+
+    The outcome is memoized on the request, including a failure to decode the cookie,
+    so a JWT's signature is verified at most once per request no matter how many
+    permission checks consult it.  An empty outcome is not memoized, because the
+    request may not have been authenticated yet.
     """
+    request_cache = get_request_cache(request)
+    if DECODED_JWT_CACHE_KEY in request_cache:
+        decoded_jwt, error = request_cache[DECODED_JWT_CACHE_KEY]
+        if error:
+            raise error
+        return decoded_jwt
+
     if decoded_jwt_from_auth := get_decoded_jwt_from_auth(request):
+        request_cache[DECODED_JWT_CACHE_KEY] = (decoded_jwt_from_auth, None)
         return decoded_jwt_from_auth
 
     try:
         if decoded_jwt_from_cookie := get_decoded_jwt_from_cookie(request):
+            request_cache[DECODED_JWT_CACHE_KEY] = (decoded_jwt_from_cookie, None)
             return decoded_jwt_from_cookie
     except InvalidTokenError as exc:
         logger.info(
@@ -220,7 +556,9 @@ def get_decoded_jwt(request):
         )
         # Django settings toggle: see toggle annotation in `constants.py`.
         if not getattr(settings, IGNORE_INVALID_JWT_COOKIE_SETTING, False):
+            request_cache[DECODED_JWT_CACHE_KEY] = (None, exc)
             raise
+        request_cache[DECODED_JWT_CACHE_KEY] = ({}, None)
 
     return {}
 
@@ -229,14 +567,19 @@ def has_access_to_all(assigned_contexts):
     """
     Determines whether the `ALL_ACCESS_CONTEXT` token is in the set of assigned contexts.
     """
+    if isinstance(assigned_contexts, AccessMap):
+        return assigned_contexts.has_access_to_all()
     return ALL_ACCESS_CONTEXT in assigned_contexts
 
 
 def _user_has_access(assigned_contexts, requested_context):
     """
-    `assigned_contexts` - A set of contexts/identifiers which have been assigned access to some user.
+    `assigned_contexts` - A set (or `AccessMap`) of contexts/identifiers which have been assigned access to some user.
     `requested_context` - 0 or many contexts of which to check access.
     """
+    if isinstance(assigned_contexts, AccessMap):
+        return assigned_contexts.grants(requested_context)
+
     # If there are no contexts assigned, return False.
     if not assigned_contexts:
         return False
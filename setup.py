@@ -111,6 +111,8 @@ setup(
     url='https://github.com/openedx/edx-rbac',
     packages=[
         'edx_rbac',
+        'edx_rbac.management',
+        'edx_rbac.management.commands',
     ],
     include_package_data=True,
     install_requires=load_requirements('requirements/base.in'),
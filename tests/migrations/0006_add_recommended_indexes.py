@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0005_add_concrete_contextual_role_assignment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='concretecontextualuserroleassignment',
+            index=models.Index(fields=['user', 'role'], name='tests_cura_user_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='concretecontextualuserroleassignment',
+            index=models.Index(condition=models.Q(('applies_to_all_contexts', True)), fields=['user', 'role'], name='tests_cura_all_ctx_idx'),
+        ),
+    ]
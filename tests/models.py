@@ -5,7 +5,7 @@ These models exist solely for testing.
 They are not something that gets created when you install this application.
 """
 
-from edx_rbac.models import UserRole, UserRoleAssignment
+from edx_rbac.models import ContextualUserRoleAssignment, UserRole, UserRoleAssignment, recommended_assignment_indexes
 
 
 class ConcreteUserRole(UserRole):
@@ -62,3 +62,34 @@ class ConcreteUserRoleAssignmentNoContext(UserRoleAssignment):
     """
 
     role_class = ConcreteUserRole
+
+
+class ConcreteUserRoleAssignmentContextFields(UserRoleAssignment):
+    """
+    Used for testing the UserRoleAssignment model when contexts are derived from `context_fields`.
+    """
+
+    role_class = ConcreteUserRole
+    context_fields = ('user__username',)
+    honors_applies_to_all_contexts = True
+
+    def get_context(self):
+        """
+        Return the same context as `context_from_values()`, which should be used instead.
+        """
+        return self.user.username
+
+
+class ConcreteContextualUserRoleAssignment(ContextualUserRoleAssignment):
+    """
+    Used for testing the ContextualUserRoleAssignment model.
+    """
+
+    role_class = ConcreteUserRole
+
+    class Meta(ContextualUserRoleAssignment.Meta):
+        """
+        Meta class for ConcreteContextualUserRoleAssignment.
+        """
+
+        indexes = recommended_assignment_indexes('tests_cura')
@@ -0,0 +1,146 @@
+"""
+Tests for the `edx-rbac` access_map module.
+"""
+
+import ddt
+from django.test import TestCase, override_settings
+
+from edx_rbac.access_map import AccessMap, ContextTrie
+from edx_rbac.constants import ALL_ACCESS_CONTEXT
+from edx_rbac.utils import _user_has_access, has_access_to_all
+
+
+@ddt.ddt
+class TestAccessMap(TestCase):
+    """
+    Tests for `AccessMap`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.access_map = AccessMap({
+            'role_1': ['context-a', 'context-b', 'context-a'],
+            'role_2': ['context-b', 'context-c'],
+            'role_3': [ALL_ACCESS_CONTEXT],
+        })
+
+    def test_behaves_like_a_set_of_contexts(self):
+        role_1_and_2 = self.access_map.for_roles(['role_1', 'role_2'])
+
+        assert role_1_and_2 == {'context-a', 'context-b', 'context-c'}
+        assert {'context-a', 'context-b', 'context-c'} == role_1_and_2
+        assert len(role_1_and_2) == 3
+        assert 'context-a' in role_1_and_2
+        assert 'context-d' not in role_1_and_2
+        assert sorted(role_1_and_2) == ['context-a', 'context-b', 'context-c']
+        assert not AccessMap()
+
+    def test_from_pairs(self):
+        access_map = AccessMap.from_pairs([
+            ('role_1', 'context-a'),
+            ('role_1', ['context-b', 'context-a']),
+            ('role_2', None),
+        ])
+
+        assert access_map.roles == {'role_1', 'role_2'}
+        assert access_map.contexts_for_role('role_1') == {'context-a', 'context-b'}
+        assert access_map.contexts_for_role('role_2') == {None}
+        assert access_map.contexts_for_role('role_3') == frozenset()
+
+    def test_for_roles_shares_contexts(self):
+        role_1 = self.access_map.for_roles(['role_1'])
+
+        assert role_1 is self.access_map.for_roles(['role_1'])
+        assert self.access_map.for_roles(['role_1', 'role_2', 'role_3', 'role_4']) is self.access_map
+        assert set(role_1) == {'context-a', 'context-b'}
+        assert role_1.contexts_for_role('role_1') is self.access_map.contexts_for_role('role_1')
+        assert not self.access_map.for_roles(['role_4'])
+
+    def test_has_access_to_all(self):
+        assert self.access_map.has_access_to_all()
+        assert self.access_map.has_access_to_all(['role_1', 'role_3'])
+        assert not self.access_map.has_access_to_all(['role_1', 'role_2'])
+        assert not self.access_map.for_roles(['role_1']).has_access_to_all()
+        assert has_access_to_all(self.access_map)
+        assert not has_access_to_all(self.access_map.for_roles(['role_2']))
+
+    @ddt.data(
+        (['role_1'], None, True),
+        (['role_1'], 'context-a', True),
+        (['role_1'], ['context-a', 'context-b'], True),
+        (['role_1'], ['context-a', 'context-c'], False),
+        (['role_1', 'role_2'], ['context-a', 'context-c'], True),
+        (['role_3'], 'anything', True),
+        (['role_4'], None, False),
+        (['role_4'], 'context-a', False),
+    )
+    @ddt.unpack
+    def test_grants(self, role_names, requested_context, expected_result):
+        access_map = self.access_map.for_roles(role_names)
+
+        assert access_map.grants(requested_context) == expected_result
+        assert _user_has_access(access_map, requested_context) == expected_result
+        assert _user_has_access(set(access_map), requested_context) == expected_result
+
+    def test_union(self):
+        union = self.access_map.for_roles(['role_1']) | AccessMap({'role_1': ['context-d'], 'role_4': ['context-e']})
+
+        assert isinstance(union, AccessMap)
+        assert union.contexts_for_role('role_1') == {'context-a', 'context-b', 'context-d'}
+        assert union.contexts_for_role('role_4') == {'context-e'}
+
+        assert self.access_map.for_roles(['role_1']) | {'context-e'} == {'context-a', 'context-b', 'context-e'}
+        assert {'context-e'} | self.access_map.for_roles(['role_1']) == {'context-a', 'context-b', 'context-e'}
+
+    def test_contexts_are_interned(self):
+        first = AccessMap({'role_1': [''.join(['context', '-', 'a'])]})
+        second = AccessMap({'role_2': [''.join(['context-', 'a'])]})
+
+        assert next(iter(first)) is next(iter(second))
+
+
+@ddt.ddt
+class TestContextTrie(TestCase):
+    """
+    Tests for `ContextTrie` and hierarchical contexts.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.trie = ContextTrie(['org-a', 'org-b+course-1', 'org-b+course-1+run-1', 'org-c+course-2+run-2', 3], '+')
+
+    @ddt.data(
+        ('org-a', True),
+        ('org-a+course-1', True),
+        ('org-a+course-1+run-1', True),
+        ('org-b', False),
+        ('org-b+course-1', True),
+        ('org-b+course-1+run-2', True),
+        ('org-b+course-2', False),
+        ('org-c+course-2', False),
+        ('org-c+course-2+run-2', True),
+        ('org-c+course-2+run-3', False),
+        ('org-a-suffix', False),
+        ('org', False),
+        (3, False),
+    )
+    @ddt.unpack
+    def test_covers(self, context, expected_result):
+        assert self.trie.covers(context) == expected_result
+
+    @ddt.data(
+        ('org-a', True),
+        ('org-a+course-1', True),
+        (['org-a+course-1', 'org-b+course-1+run-1'], True),
+        (['org-a+course-1', 'org-b+course-2'], False),
+    )
+    @ddt.unpack
+    def test_access_map_grants_hierarchical_contexts(self, requested_context, expected_result):
+        access_map = AccessMap({'role_1': ['org-a'], 'role_2': ['org-b+course-1']})
+
+        with override_settings(RBAC_HIERARCHICAL_CONTEXT_SEPARATOR='+'):
+            assert access_map.grants(requested_context) == expected_result
+            assert _user_has_access(access_map, requested_context) == expected_result
+
+        # Without a separator, only exact matches are granted.
+        assert access_map.grants(requested_context) == (requested_context == 'org-a')
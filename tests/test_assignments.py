@@ -9,3 +9,11 @@ def get_assigments(user):
     """
     yield 'test-role', None
     yield 'test-role2', str(user.id)
+
+
+async def aget_assigments(user):
+    """
+    Return async iterator of (role_name, context)
+    """
+    yield 'test-role', None
+    yield 'test-role2', str(user.id)
@@ -0,0 +1,337 @@
+"""
+Tests for the `edx-rbac` cache module.
+"""
+
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib import auth
+from django.core.cache import cache as django_cache
+from django.db.models.signals import post_delete, post_save
+from django.test import TestCase, override_settings
+from django.test.utils import isolate_apps
+
+from edx_rbac.cache import (
+    ParsedRoleClaimCache,
+    aget_user_assignments,
+    get_assignments_version,
+    get_assignments_versions,
+    get_parsed_role_claim_cache,
+    get_user_assignments
+)
+from edx_rbac.constants import (
+    ASSIGNMENT_CACHE_TIMEOUT_SETTING,
+    PARSED_ROLE_CLAIM_CACHE_SIZE_SETTING,
+    ROLES_CLAIM_CACHE_TIMEOUT_SETTING
+)
+from edx_rbac.models import UserRole, UserRoleAssignment
+from edx_rbac.utils import (
+    acreate_role_auth_claim_for_user,
+    contexts_accessible_from_database,
+    contexts_accessible_from_jwt,
+    create_role_auth_claim_for_user
+)
+from tests.models import ConcreteUserRole, ConcreteUserRoleAssignment, ConcreteUserRoleAssignmentMultipleContexts
+
+User = auth.get_user_model()
+
+
+def _decoded_jwt(roles, **claims):
+    """
+    Return a toy decoded JWT granting the given roles and expiring in an hour.
+    """
+    return {'roles': roles, 'exp': time.time() + 3600, **claims}
+
+
+class TestParsedRoleClaimCache(TestCase):
+    """
+    Tests for `ParsedRoleClaimCache`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.cache = ParsedRoleClaimCache(maxsize=2)
+        self.parse = mock.Mock(side_effect=lambda decoded_jwt: list(decoded_jwt['roles']))
+
+    def test_hit_and_miss_counters(self):
+        decoded_jwt = _decoded_jwt(['coupon-manager:some_context'])
+
+        assert self.cache.get_or_parse(decoded_jwt, self.parse) == ['coupon-manager:some_context']
+        assert self.cache.get_or_parse(dict(decoded_jwt), self.parse) == ['coupon-manager:some_context']
+
+        assert self.parse.call_count == 1
+        assert self.cache.cache_info() == (1, 1, 2, 1)
+
+        self.cache.clear()
+        assert self.cache.cache_info() == (0, 0, 2, 0)
+
+    def test_keyed_by_jti(self):
+        self.cache.get_or_parse(_decoded_jwt(['coupon-manager:a'], jti='token-1'), self.parse)
+        self.cache.get_or_parse(_decoded_jwt(['coupon-manager:a'], jti='token-2'), self.parse)
+        self.cache.get_or_parse(_decoded_jwt(['coupon-manager:a'], jti='token-1'), self.parse)
+
+        assert self.parse.call_count == 2
+
+    def test_keyed_by_roles_claim_without_jti(self):
+        self.cache.get_or_parse(_decoded_jwt(['coupon-manager:a']), self.parse)
+        self.cache.get_or_parse(_decoded_jwt(['coupon-manager:b']), self.parse)
+
+        assert self.parse.call_count == 2
+
+    def test_least_recently_used_entry_is_evicted(self):
+        first, second, third = (_decoded_jwt([f'coupon-manager:{i}']) for i in range(3))
+        self.cache.get_or_parse(first, self.parse)
+        self.cache.get_or_parse(second, self.parse)
+        self.cache.get_or_parse(first, self.parse)
+        self.cache.get_or_parse(third, self.parse)
+
+        assert self.cache.cache_info().currsize == 2
+        self.cache.get_or_parse(first, self.parse)
+        assert self.parse.call_count == 3
+        self.cache.get_or_parse(second, self.parse)
+        assert self.parse.call_count == 4
+
+    def test_entry_is_not_served_after_exp(self):
+        decoded_jwt = _decoded_jwt(['coupon-manager:a'])
+        self.cache.get_or_parse(decoded_jwt, self.parse)
+
+        with mock.patch('edx_rbac.cache.time.time', return_value=decoded_jwt['exp'] + 1):
+            self.cache.get_or_parse(decoded_jwt, self.parse)
+
+        assert self.parse.call_count == 2
+        assert self.cache.cache_info().currsize == 0
+
+    def test_token_without_exp_is_not_cached(self):
+        decoded_jwt = {'roles': ['coupon-manager:a']}
+        self.cache.get_or_parse(decoded_jwt, self.parse)
+        self.cache.get_or_parse(decoded_jwt, self.parse)
+
+        assert self.parse.call_count == 2
+        assert self.cache.cache_info() == (0, 0, 2, 0)
+
+    def test_entry_is_discarded_when_role_mapping_changes(self):
+        decoded_jwt = _decoded_jwt(['coupon-manager:a'])
+        self.cache.get_or_parse(decoded_jwt, self.parse)
+
+        with override_settings(SYSTEM_TO_FEATURE_ROLE_MAPPING={}):
+            self.cache.get_or_parse(decoded_jwt, self.parse)
+
+        assert self.parse.call_count == 2
+
+
+class TestGetParsedRoleClaimCache(TestCase):
+    """
+    Tests for `get_parsed_role_claim_cache()` and its use by the JWT utilities.
+    """
+
+    def test_disabled_by_default(self):
+        assert get_parsed_role_claim_cache() is None
+
+    @override_settings(**{PARSED_ROLE_CLAIM_CACHE_SIZE_SETTING: 10})
+    def test_contexts_accessible_from_jwt_uses_cache(self):
+        cache = get_parsed_role_claim_cache()
+        cache.clear()
+        decoded_jwt = _decoded_jwt(['coupon-manager:some_context', 'enterprise_admin:some_other_context'])
+
+        assert contexts_accessible_from_jwt(decoded_jwt, ['coupon-management']) == {
+            'some_context', 'some_other_context',
+        }
+        assert contexts_accessible_from_jwt(decoded_jwt, ['data_api_access']) == {'some_other_context'}
+        assert contexts_accessible_from_jwt(decoded_jwt, ['not-a-feature-role']) == set()
+
+        assert cache.cache_info() == (2, 1, 10, 1)
+        assert get_parsed_role_claim_cache() is cache
+
+
+@override_settings(**{ASSIGNMENT_CACHE_TIMEOUT_SETTING: 300})
+class TestAssignmentCache(TestCase):
+    """
+    Tests for the cross-request assignment cache.
+    """
+
+    def setUp(self):
+        super().setUp()
+        django_cache.clear()
+        self.addCleanup(django_cache.clear)
+        self.user = User.objects.create(username='test_user')
+        self.role = ConcreteUserRole.objects.create(name='coupon-manager')
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role)
+
+    def test_assignments_are_cached_across_calls(self):
+        assert get_user_assignments(ConcreteUserRoleAssignment, self.user) == [('coupon-manager', 'a-test-context')]
+
+        with self.assertNumQueries(0):
+            assert get_user_assignments(ConcreteUserRoleAssignment, self.user) == [
+                ('coupon-manager', 'a-test-context'),
+            ]
+            assert contexts_accessible_from_database(
+                self.user, ['coupon-manager'], ConcreteUserRoleAssignment,
+            ) == {'a-test-context'}
+
+    @isolate_apps('tests')
+    def test_receivers_are_connected_to_every_concrete_subclass(self):
+        # Models created outside of any app config, as when edx_rbac isn't in INSTALLED_APPS.
+        class IsolatedUserRole(UserRole):
+            """
+            A role class created after the apps are ready.
+            """
+
+        class IsolatedUserRoleAssignment(UserRoleAssignment):
+            """
+            An assignment class created after the apps are ready.
+            """
+
+            role_class = IsolatedUserRole
+
+        for signal in (post_save, post_delete):
+            assert signal.has_listeners(IsolatedUserRole)
+            assert signal.has_listeners(IsolatedUserRoleAssignment)
+
+    def test_saving_an_assignment_invalidates_the_cache(self):
+        get_user_assignments(ConcreteUserRoleAssignment, self.user)
+        version = get_assignments_version(ConcreteUserRoleAssignment, self.user.pk)
+        other_role = ConcreteUserRole.objects.create(name='enterprise_admin')
+
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=other_role)
+
+        assert get_assignments_version(ConcreteUserRoleAssignment, self.user.pk) != version
+        assert get_user_assignments(ConcreteUserRoleAssignment, self.user) == [
+            ('coupon-manager', 'a-test-context'), ('enterprise_admin', 'a-test-context'),
+        ]
+
+    def test_deleting_an_assignment_invalidates_the_cache(self):
+        get_user_assignments(ConcreteUserRoleAssignment, self.user)
+
+        ConcreteUserRoleAssignment.objects.filter(user=self.user).get().delete()
+
+        assert not get_user_assignments(ConcreteUserRoleAssignment, self.user)
+
+    def test_cache_is_per_class_and_per_user(self):
+        other_user = User.objects.create(username='other_user')
+        get_user_assignments(ConcreteUserRoleAssignment, self.user)
+        get_user_assignments(ConcreteUserRoleAssignmentMultipleContexts, self.user)
+        version = get_assignments_version(ConcreteUserRoleAssignment, self.user.pk)
+
+        ConcreteUserRoleAssignmentMultipleContexts.objects.create(user=self.user, role=self.role)
+        ConcreteUserRoleAssignment.objects.create(user=other_user, role=self.role)
+
+        assert get_assignments_version(ConcreteUserRoleAssignment, self.user.pk) == version
+        assert get_user_assignments(ConcreteUserRoleAssignmentMultipleContexts, self.user) == [
+            ('coupon-manager', ['a-test-context', 'a-second-test-context']),
+        ]
+
+    def test_async_assignments_share_the_cache(self):
+        assert async_to_sync(aget_user_assignments)(ConcreteUserRoleAssignment, self.user) == [
+            ('coupon-manager', 'a-test-context'),
+        ]
+
+        with self.assertNumQueries(0):
+            assert get_user_assignments(ConcreteUserRoleAssignment, self.user) == [
+                ('coupon-manager', 'a-test-context'),
+            ]
+            assert async_to_sync(aget_user_assignments)(ConcreteUserRoleAssignment, self.user) == [
+                ('coupon-manager', 'a-test-context'),
+            ]
+
+        ConcreteUserRoleAssignment.objects.filter(user=self.user).delete()
+        ConcreteUserRoleAssignment.objects.create(
+            user=self.user, role=ConcreteUserRole.objects.create(name='enterprise_admin'),
+        )
+        assert async_to_sync(aget_user_assignments)(ConcreteUserRoleAssignment, self.user) == [
+            ('enterprise_admin', 'a-test-context'),
+        ]
+
+    def test_evicted_version_key_is_not_reused(self):
+        get_user_assignments(ConcreteUserRoleAssignment, self.user)
+        version = get_assignments_version(ConcreteUserRoleAssignment, self.user.pk)
+
+        django_cache.delete(f'edx_rbac.assignments.version.tests.concreteuserroleassignment.{self.user.pk}')
+
+        assert get_assignments_version(ConcreteUserRoleAssignment, self.user.pk) != version
+
+    @override_settings(**{ASSIGNMENT_CACHE_TIMEOUT_SETTING: None})
+    def test_disabled(self):
+        get_user_assignments(ConcreteUserRoleAssignment, self.user)
+
+        with self.assertNumQueries(1):
+            get_user_assignments(ConcreteUserRoleAssignment, self.user)
+
+
+@override_settings(**{ROLES_CLAIM_CACHE_TIMEOUT_SETTING: 300})
+class TestRolesClaimCache(TestCase):
+    """
+    Tests for the cache of the roles claims created by `create_role_auth_claim_for_user`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        django_cache.clear()
+        self.addCleanup(django_cache.clear)
+        self.user = User.objects.create(username='test_user')
+        self.role = ConcreteUserRole.objects.create(name='coupon-manager')
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role)
+        self.claim = create_role_auth_claim_for_user(self.user)
+
+    def test_claim_is_cached_across_calls(self):
+        with self.assertNumQueries(0):
+            assert create_role_auth_claim_for_user(self.user) == self.claim
+
+    def test_claim_is_cached_per_claim_version(self):
+        with self.assertNumQueries(3):
+            assert create_role_auth_claim_for_user(self.user, claim_version=2) != self.claim
+
+    def test_saving_an_assignment_invalidates_the_claim(self):
+        other_role = ConcreteUserRole.objects.create(name='enterprise_admin')
+
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=other_role)
+
+        assert 'enterprise_admin:a-test-context' in create_role_auth_claim_for_user(self.user)
+
+    def test_deleting_an_assignment_invalidates_the_claim(self):
+        ConcreteUserRoleAssignment.objects.filter(user=self.user).get().delete()
+
+        assert 'coupon-manager:a-test-context' not in create_role_auth_claim_for_user(self.user)
+
+    def test_changes_of_another_user_keep_the_claim(self):
+        other_user = User.objects.create(username='other_user')
+
+        ConcreteUserRoleAssignment.objects.create(user=other_user, role=self.role)
+
+        with self.assertNumQueries(0):
+            assert create_role_auth_claim_for_user(self.user) == self.claim
+
+    def test_async_claim_shares_the_cache(self):
+        with self.assertNumQueries(0):
+            assert async_to_sync(acreate_role_auth_claim_for_user)(self.user) == self.claim
+
+        ConcreteUserRoleAssignment.objects.filter(user=self.user).get().delete()
+
+        claim = async_to_sync(acreate_role_auth_claim_for_user)(self.user)
+        assert 'coupon-manager:a-test-context' not in claim
+        with self.assertNumQueries(0):
+            assert create_role_auth_claim_for_user(self.user) == claim
+
+    def test_claim_missing_overrun_sources_is_not_cached(self):
+        django_cache.clear()
+
+        with mock.patch('edx_rbac.claims.ClaimDeadline.expired', return_value=True):
+            partial_claim = create_role_auth_claim_for_user(self.user, timeout=1)
+
+        assert partial_claim == ['coupon-manager:a-test-context']
+        assert create_role_auth_claim_for_user(self.user) == self.claim
+
+    def test_get_assignments_versions(self):
+        versions = get_assignments_versions(
+            [ConcreteUserRoleAssignment, ConcreteUserRoleAssignmentMultipleContexts], self.user.pk,
+        )
+
+        assert versions == (
+            get_assignments_version(ConcreteUserRoleAssignment, self.user.pk),
+            get_assignments_version(ConcreteUserRoleAssignmentMultipleContexts, self.user.pk),
+        )
+
+    @override_settings(**{ROLES_CLAIM_CACHE_TIMEOUT_SETTING: None})
+    def test_disabled(self):
+        with self.assertNumQueries(3):
+            assert create_role_auth_claim_for_user(self.user) == self.claim
@@ -0,0 +1,372 @@
+"""
+Tests for the `edx-rbac` claims module.
+"""
+
+import asyncio
+import threading
+from unittest import mock
+
+import ddt
+from asgiref.sync import async_to_sync
+from django.contrib import auth
+from django.test import TestCase, override_settings
+
+from edx_rbac.claims import (
+    ClaimDeadline,
+    _json_size,
+    encode_roles_claim,
+    get_claim_builder,
+    iter_claim_pairs,
+    iter_roles_claim
+)
+from edx_rbac.constants import ROLES_CLAIM_OVERFLOW_CONTEXT, ROLES_CLAIM_VERSION_COMPACT, ROLES_CLAIM_VERSION_LEGACY
+from tests.models import (
+    ConcreteContextualUserRoleAssignment,
+    ConcreteUserRole,
+    ConcreteUserRoleAssignment,
+    ConcreteUserRoleAssignmentContextFields
+)
+from tests.test_assignments import get_assigments
+from tests.test_models import get_custom_assignments
+
+User = auth.get_user_model()
+
+SLOW_SOURCES_BARRIER = threading.Barrier(2, timeout=5)
+
+
+def get_slow_assignments_a(user):
+    """
+    A function source which can only return once `get_slow_assignments_b` is called concurrently.
+    """
+    SLOW_SOURCES_BARRIER.wait()
+    return [('slow-role-a', str(user.id))]
+
+
+def get_slow_assignments_b(user):
+    """
+    A function source which can only return once `get_slow_assignments_a` is called concurrently.
+    """
+    SLOW_SOURCES_BARRIER.wait()
+    return [('slow-role-b', str(user.id))]
+
+
+def get_failing_assignments(user):
+    """
+    A function source which fails.
+    """
+    raise ValueError('source failed')
+
+
+STALLED_SOURCE_RELEASED = threading.Event()
+
+
+def get_stalled_assignments(user):  # pylint: disable=unused-argument
+    """
+    A function source which only returns once `STALLED_SOURCE_RELEASED` is set.
+    """
+    STALLED_SOURCE_RELEASED.wait(timeout=5)
+    return [('stalled-role', '')]
+
+
+async def aget_stalled_assignments(user):  # pylint: disable=unused-argument
+    """
+    An async function source which takes far too long.
+    """
+    await asyncio.sleep(5)
+    yield 'stalled-role', ''
+
+
+PAIRS = [
+    ('enterprise_admin', 'uuid-1'),
+    ('enterprise_learner', ''),
+    ('enterprise_admin', 'uuid-2'),
+    ('course_staff', 'course-v1:edX+DemoX+Demo_2014'),
+    ('enterprise_admin', 'uuid-1'),
+]
+
+UNIQUE_PAIRS = [
+    ('enterprise_admin', 'uuid-1'),
+    ('enterprise_learner', ''),
+    ('enterprise_admin', 'uuid-2'),
+    ('course_staff', 'course-v1:edX+DemoX+Demo_2014'),
+]
+
+
+@ddt.ddt
+class TestRolesClaim(TestCase):
+    """
+    Tests for encoding and decoding the roles claim.
+    """
+
+    def test_encode_legacy(self):
+        assert encode_roles_claim(PAIRS, ROLES_CLAIM_VERSION_LEGACY) == [
+            'enterprise_admin:uuid-1',
+            'enterprise_learner',
+            'enterprise_admin:uuid-2',
+            'course_staff:course-v1:edX+DemoX+Demo_2014',
+        ]
+
+    def test_encode_compact(self):
+        assert encode_roles_claim(PAIRS, ROLES_CLAIM_VERSION_COMPACT) == {
+            'v': 2,
+            'r': {
+                'enterprise_admin': ['uuid-1', 'uuid-2'],
+                'enterprise_learner': [''],
+                'course_staff': ['course-v1:edX+DemoX+Demo_2014'],
+            },
+        }
+
+    def test_encode_defaults_to_configured_version(self):
+        assert isinstance(encode_roles_claim(PAIRS), list)
+        with override_settings(RBAC_ROLES_CLAIM_VERSION=ROLES_CLAIM_VERSION_COMPACT):
+            assert isinstance(encode_roles_claim(PAIRS), dict)
+
+    def test_encode_unknown_version(self):
+        with self.assertRaises(ValueError):
+            encode_roles_claim(PAIRS, 99)
+
+    def test_compact_claim_is_smaller(self):
+        many_pairs = [('enterprise_admin', f'context-{i}') for i in range(100)]
+        legacy_claim = encode_roles_claim(many_pairs, ROLES_CLAIM_VERSION_LEGACY)
+        compact_claim = encode_roles_claim(many_pairs, ROLES_CLAIM_VERSION_COMPACT)
+
+        assert len(str(compact_claim)) < len(str(legacy_claim)) * 0.75
+
+    @ddt.data(ROLES_CLAIM_VERSION_LEGACY, ROLES_CLAIM_VERSION_COMPACT)
+    def test_round_trip(self, version):
+        assert sorted(iter_roles_claim(encode_roles_claim(PAIRS, version))) == sorted(UNIQUE_PAIRS)
+
+    def test_decode_unknown_version_grants_nothing(self):
+        assert not list(iter_roles_claim({'v': 99, 'r': {'enterprise_admin': ['uuid-1']}}))
+
+    @ddt.data(ROLES_CLAIM_VERSION_LEGACY, ROLES_CLAIM_VERSION_COMPACT)
+    def test_encode_within_budget(self, version):
+        many_pairs = [('enterprise_admin', f'context-{i}') for i in range(100)] + [('enterprise_learner', 'uuid-1')]
+        max_bytes = 200
+
+        claim = encode_roles_claim(many_pairs, version, max_bytes)
+
+        assert _json_size(claim) <= max_bytes
+        assert sorted(iter_roles_claim(claim)) == [
+            ('enterprise_admin', ROLES_CLAIM_OVERFLOW_CONTEXT),
+            ('enterprise_learner', 'uuid-1'),
+        ]
+
+    @ddt.data(ROLES_CLAIM_VERSION_LEGACY, ROLES_CLAIM_VERSION_COMPACT)
+    def test_encode_exactly_at_budget(self, version):
+        claim = encode_roles_claim(PAIRS, version)
+
+        assert encode_roles_claim(PAIRS, version, _json_size(claim) + 1) == claim
+
+    def test_encode_budget_from_settings(self):
+        with override_settings(RBAC_ROLES_CLAIM_MAX_BYTES=10):
+            claim = encode_roles_claim(PAIRS, ROLES_CLAIM_VERSION_LEGACY)
+
+        assert claim == [
+            f'enterprise_admin:{ROLES_CLAIM_OVERFLOW_CONTEXT}',
+            f'enterprise_learner:{ROLES_CLAIM_OVERFLOW_CONTEXT}',
+            f'course_staff:{ROLES_CLAIM_OVERFLOW_CONTEXT}',
+        ]
+
+    def test_iter_claim_pairs(self):
+        pairs = [('role_1', 'context-a'), ('role_2', None), ('role_3', ['context-b', 3, None])]
+
+        assert list(iter_claim_pairs(pairs)) == [
+            ('role_1', 'context-a'),
+            ('role_2', ''),
+            ('role_3', 'context-b'),
+            ('role_3', '3'),
+            ('role_3', ''),
+        ]
+
+
+@override_settings(SYSTEM_WIDE_ROLE_CLASSES=[
+    'tests.ConcreteContextualUserRoleAssignment',
+    'tests.test_assignments.get_assigments',
+    'tests.ConcreteUserRoleAssignment',
+    'tests.ConcreteUserRoleAssignmentContextFields',
+])
+class TestClaimBuilder(TestCase):
+    """
+    Tests for `ClaimBuilder`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='test_user')
+        role = ConcreteUserRole.objects.create(name='coupon-manager')
+        other_role = ConcreteUserRole.objects.create(name='enterprise_admin')
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=other_role, context='context-b')
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=role, context='context-a')
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=role)
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=other_role)
+
+    def test_sources_are_resolved_once(self):
+        builder = get_claim_builder()
+
+        assert builder.sources == (
+            ConcreteContextualUserRoleAssignment,
+            get_assigments,
+            ConcreteUserRoleAssignment,
+            ConcreteUserRoleAssignmentContextFields,
+        )
+        with mock.patch('edx_rbac.claims.load_role_source') as mock_load_role_source:
+            builder.build(self.user)
+            assert get_claim_builder() is builder
+        mock_load_role_source.assert_not_called()
+
+    def test_build(self):
+        # A single UNION ALL query for the models with a context column, and one for ConcreteUserRoleAssignment.
+        with self.assertNumQueries(2):
+            claim = get_claim_builder().build(self.user)
+
+        assert claim == [
+            'enterprise_admin:context-b',
+            'coupon-manager:context-a',
+            'test-role',
+            f'test-role2:{self.user.id}',
+            'coupon-manager:a-test-context',
+            'enterprise_admin:test_user',
+        ]
+
+    def test_abuild(self):
+        claim = get_claim_builder().build(self.user)
+
+        with self.assertNumQueries(2):
+            assert async_to_sync(get_claim_builder().abuild)(self.user) == claim
+        assert async_to_sync(get_claim_builder().abuild)(self.user, ROLES_CLAIM_VERSION_COMPACT) == (
+            get_claim_builder().build(self.user, ROLES_CLAIM_VERSION_COMPACT)
+        )
+
+    @override_settings(SYSTEM_WIDE_ROLE_CLASSES=[
+        'tests.test_assignments.aget_assigments',
+        'tests.ConcreteUserRoleAssignment',
+    ])
+    def test_abuild_with_async_function_source(self):
+        assert async_to_sync(get_claim_builder().abuild)(self.user) == [
+            'test-role', f'test-role2:{self.user.id}', 'coupon-manager:a-test-context',
+        ]
+
+    @override_settings(RBAC_ROLE_SOURCE_THREADS=2, SYSTEM_WIDE_ROLE_CLASSES=[
+        'tests.test_claims.get_slow_assignments_a',
+        'tests.ConcreteUserRoleAssignment',
+        'tests.test_claims.get_slow_assignments_b',
+    ])
+    def test_function_sources_are_called_concurrently(self):
+        # Each source waits for the other one at the barrier, which only lets them through together.
+        with mock.patch.object(SLOW_SOURCES_BARRIER, 'wait', wraps=SLOW_SOURCES_BARRIER.wait) as mock_wait:
+            claim = get_claim_builder().build(self.user)
+
+        assert mock_wait.call_count == 2
+        assert claim == [
+            f'slow-role-a:{self.user.id}',
+            'coupon-manager:a-test-context',
+            f'slow-role-b:{self.user.id}',
+        ]
+
+    @override_settings(RBAC_ROLE_SOURCE_THREADS=2, SYSTEM_WIDE_ROLE_CLASSES=[
+        'tests.test_claims.get_failing_assignments',
+        'tests.ConcreteUserRoleAssignment',
+    ])
+    def test_errors_of_concurrent_function_sources_are_raised(self):
+        with self.assertRaisesMessage(ValueError, 'source failed'):
+            get_claim_builder().build(self.user)
+
+    @override_settings(RBAC_ROLE_SOURCE_THREADS=2, SYSTEM_WIDE_ROLE_CLASSES=[
+        'tests.test_claims.get_stalled_assignments',
+        'tests.ConcreteUserRoleAssignment',
+        'tests.test_assignments.get_assigments',
+    ])
+    def test_function_sources_overrunning_their_budget_are_skipped(self):
+        STALLED_SOURCE_RELEASED.clear()
+        self.addCleanup(STALLED_SOURCE_RELEASED.set)
+        deadline = ClaimDeadline(source_budgets={'tests.test_claims.get_stalled_assignments': 0.05})
+
+        with mock.patch('edx_rbac.claims.increment') as mock_increment, \
+                mock.patch('edx_rbac.claims.set_custom_attribute') as mock_set_custom_attribute:
+            claim = get_claim_builder().build(self.user, deadline=deadline)
+
+        assert claim == ['coupon-manager:a-test-context', 'test-role', f'test-role2:{self.user.id}']
+        assert deadline.skipped_locations == ['tests.test_claims.get_stalled_assignments']
+        mock_increment.assert_called_once_with('edx_rbac.role_source_overruns')
+        mock_set_custom_attribute.assert_called_once_with(
+            'edx_rbac.overrun_role_sources', 'tests.test_claims.get_stalled_assignments'
+        )
+
+    @override_settings(SYSTEM_WIDE_ROLE_CLASSES=[
+        'tests.test_assignments.get_assigments',
+        'tests.ConcreteUserRoleAssignment',
+    ])
+    def test_inline_function_sources_are_skipped_past_the_deadline(self):
+        deadline = ClaimDeadline(timeout=60)
+        deadline.deadline = deadline.started_at
+
+        assert get_claim_builder().build(self.user, deadline=deadline) == ['coupon-manager:a-test-context']
+        assert deadline.skipped_locations == ['tests.test_assignments.get_assigments']
+
+    @override_settings(SYSTEM_WIDE_ROLE_CLASSES=[
+        'tests.test_assignments.get_assigments',
+        'tests.ConcreteUserRoleAssignment',
+    ])
+    def test_inline_function_sources_overrunning_their_budget_are_kept(self):
+        deadline = ClaimDeadline(source_budgets={'tests.test_assignments.get_assigments': 0})
+
+        with mock.patch('edx_rbac.claims.increment') as mock_increment:
+            claim = get_claim_builder().build(self.user, deadline=deadline)
+
+        assert claim == get_claim_builder().build(self.user)
+        assert deadline.overrun_locations == ['tests.test_assignments.get_assigments']
+        assert not deadline.skipped_locations
+        mock_increment.assert_called_once_with('edx_rbac.role_source_overruns')
+
+    @override_settings(SYSTEM_WIDE_ROLE_CLASSES=[
+        'tests.test_claims.aget_stalled_assignments',
+        'tests.ConcreteUserRoleAssignment',
+    ])
+    def test_abuild_skips_function_sources_overrunning_their_budget(self):
+        deadline = ClaimDeadline(source_budgets={'tests.test_claims.aget_stalled_assignments': 0.05})
+
+        assert async_to_sync(get_claim_builder().abuild)(self.user, deadline=deadline) == [
+            'coupon-manager:a-test-context',
+        ]
+        assert deadline.skipped_locations == ['tests.test_claims.aget_stalled_assignments']
+
+    def test_deadline_from_settings(self):
+        assert ClaimDeadline.from_settings() is None
+
+        with override_settings(RBAC_ROLES_CLAIM_TIMEOUT=2, RBAC_ROLE_SOURCE_BUDGETS={'a.source': 1}):
+            deadline = ClaimDeadline.from_settings()
+            assert deadline.deadline == deadline.started_at + 2
+            assert deadline.source_budgets == {'a.source': 1}
+
+            deadline = ClaimDeadline.from_settings(timeout=5, source_budgets={'b.source': 3})
+            assert deadline.deadline == deadline.started_at + 5
+            assert deadline.source_budgets == {'b.source': 3}
+
+    @override_settings(SYSTEM_WIDE_ROLE_CLASSES=[
+        'tests.ConcreteContextualUserRoleAssignment',
+        'tests.ConcreteUserRoleAssignmentContextFields',
+    ])
+    def test_overridden_get_assignments_is_called(self):
+        with mock.patch.object(
+            ConcreteUserRoleAssignmentContextFields, 'get_assignments', classmethod(get_custom_assignments),
+        ):
+            claim = get_claim_builder().build(self.user)
+            assert get_claim_builder().build_for_users([self.user]) == {self.user: claim}
+            assert async_to_sync(get_claim_builder().abuild)(self.user) == claim
+
+        assert claim == [
+            'enterprise_admin:context-b',
+            'coupon-manager:context-a',
+            f'custom-role:custom-context-{self.user.pk}',
+        ]
+
+    def test_recompiled_when_setting_changes(self):
+        builder = get_claim_builder()
+
+        with override_settings(SYSTEM_WIDE_ROLE_CLASSES=['tests.test_assignments.get_assigments']):
+            assert get_claim_builder().sources == (get_assigments,)
+            assert get_claim_builder().build(self.user) == ['test-role', f'test-role2:{self.user.id}']
+
+        assert get_claim_builder() is not builder
+        assert len(get_claim_builder().sources) == 4
@@ -0,0 +1,78 @@
+"""
+Tests for the `edx-rbac` decorators module.
+"""
+
+from unittest import mock
+
+import crum
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.exceptions import PermissionDenied
+from django.test import RequestFactory, TestCase
+
+from edx_rbac.decorators import permission_required
+from edx_rbac.request_cache import get_current_request
+
+
+class ToyView:
+    """
+    Toy class for testing the `permission_required` decorator on sync and async views.
+    """
+
+    def permission_denied(self, request, message=None):
+        raise PermissionDenied(message)
+
+    @permission_required('perm_1', 'perm_2', fn=lambda request, pk: f'obj-{pk}')
+    def get(self, request, pk):
+        assert get_current_request() is request
+        return f'get-{pk}'
+
+    @permission_required('perm_1', 'perm_2', fn=lambda request, pk: f'obj-{pk}')
+    async def aget(self, request, pk):
+        assert get_current_request() is request
+        return f'aget-{pk}'
+
+
+class TestPermissionRequired(TestCase):
+    """
+    Tests for the `permission_required` decorator.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.request = RequestFactory().get('/')
+        self.request.user = mock.Mock()
+        self.request.user.has_perm.return_value = True
+
+    def test_sync_view(self):
+        assert not iscoroutinefunction(ToyView.get)
+        assert ToyView().get(self.request, 1) == 'get-1'
+        self.request.user.has_perm.assert_has_calls([mock.call('perm_1', 'obj-1'), mock.call('perm_2', 'obj-1')])
+        assert get_current_request() is None
+
+    def test_async_view(self):
+        assert iscoroutinefunction(ToyView.aget)
+        assert async_to_sync(ToyView().aget)(self.request, 1) == 'aget-1'
+        self.request.user.has_perm.assert_has_calls([mock.call('perm_1', 'obj-1'), mock.call('perm_2', 'obj-1')])
+
+    def test_missing_permissions(self):
+        self.request.user.has_perm.side_effect = lambda perm, obj: perm == 'perm_1'
+
+        with self.assertRaisesMessage(PermissionDenied, 'Missing: perm_2'):
+            ToyView().get(self.request, 1)
+        with self.assertRaisesMessage(PermissionDenied, 'Missing: perm_2'):
+            async_to_sync(ToyView().aget)(self.request, 1)
+
+    def test_async_view_sets_crum_request_for_permission_checks(self):
+        crum_requests = []
+
+        def has_perm(perm, obj):  # pylint: disable=unused-argument
+            crum_requests.append(crum.get_current_request())
+            return True
+        self.request.user.has_perm.side_effect = has_perm
+        other_request = RequestFactory().get('/other/')
+        other_request.user = self.request.user
+
+        async_to_sync(ToyView().aget)(self.request, 1)
+        async_to_sync(ToyView().aget)(other_request, 2)
+
+        assert crum_requests == [self.request, self.request, other_request, other_request]
@@ -0,0 +1,42 @@
+"""
+Tests for the `edx-rbac` middleware module.
+"""
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from edx_rbac.middleware import RequestScopeMiddleware
+from edx_rbac.request_cache import get_current_request
+
+
+class TestRequestScopeMiddleware(TestCase):
+    """
+    Tests for `RequestScopeMiddleware`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.request = RequestFactory().get('/')
+
+    def get_response(self, request):
+        assert get_current_request() is request
+        return HttpResponse()
+
+    async def aget_response(self, request):
+        assert get_current_request() is request
+        return HttpResponse()
+
+    def test_sync(self):
+        middleware = RequestScopeMiddleware(self.get_response)
+
+        assert not iscoroutinefunction(middleware)
+        assert middleware(self.request).status_code == 200
+        assert get_current_request() is None
+
+    def test_async(self):
+        middleware = RequestScopeMiddleware(self.aget_response)
+
+        assert iscoroutinefunction(middleware)
+        assert async_to_sync(middleware)(self.request).status_code == 200
+        assert get_current_request() is None
@@ -4,12 +4,21 @@ Tests for the `edx-rbac` mixins module.
 
 from unittest import mock
 
+import crum
 import ddt
+from asgiref.sync import async_to_sync
+from django.contrib import auth
 from django.core.exceptions import PermissionDenied
-from django.test import RequestFactory, TestCase
+from django.db.models import Q
+from django.test import RequestFactory, TestCase, override_settings
 
-from edx_rbac.mixins import PermissionRequiredForListingMixin
+from edx_rbac import utils
+from edx_rbac.mixins import PermissionRequiredForListingMixin, PermissionRequiredMixin
+from edx_rbac.request_cache import get_current_request, set_current_request
 from edx_rbac.utils import ALL_ACCESS_CONTEXT
+from tests.models import ConcreteContextualUserRoleAssignment, ConcreteUserRole, ConcreteUserRoleAssignment
+
+User = auth.get_user_model()
 
 
 class ToyRoleAssignmentClass:
@@ -73,6 +82,77 @@ class ToyViewSetEmptyListLookupField(PermissionRequiredForListingMixin):
         raise PermissionDenied
 
 
+class ToyContextualViewSet(PermissionRequiredForListingMixin):
+    """
+    Toy class for testing listings joined against a `ContextualUserRoleAssignment`; it lists roles by name.
+    """
+    list_lookup_field = 'name'
+    allowed_roles = ['coupon-manager']
+    role_assignment_class = ConcreteContextualUserRoleAssignment
+    join_role_assignments = True
+
+    action = 'list'
+
+    base_queryset = ConcreteUserRole.objects.order_by('name')
+
+    def __init__(self, user):
+        self.request = RequestFactory().get('/')
+        self.request.user = user
+
+    def permission_denied(self, request):
+        raise PermissionDenied
+
+
+class ToyPermissionRequiredView(PermissionRequiredMixin):
+    """
+    Toy class for testing the `PermissionRequiredMixin` mixin.
+    """
+    permission_required = 'perm_1'
+
+    def permission_denied(self, request, message=None):
+        raise PermissionDenied(message)
+
+
+class TestPermissionRequiredMixin(TestCase):
+    """
+    Tests for the `PermissionRequiredMixin` mixin.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(crum.set_current_request, None)
+        self.user = User.objects.create(username='test_user')
+
+    def make_request(self, path):
+        """
+        Return a request of the test user to the given path.
+        """
+        request = RequestFactory().get(path)
+        request.user = self.user
+        return request
+
+    def test_current_request_doesnt_outlive_its_request(self):
+        first_request, second_request = self.make_request('/one'), self.make_request('/two')
+        seen_requests = []
+
+        def has_perm(perm, obj):  # pylint: disable=unused-argument
+            seen_requests.append(get_current_request())
+            return True
+
+        with mock.patch.object(User, 'has_perm', side_effect=has_perm):
+            ToyPermissionRequiredView().check_permissions(first_request)
+            # crum's middleware sets the next request served by the same thread.
+            crum.set_current_request(second_request)
+            assert get_current_request() is second_request
+            with self.assertRaises(PermissionDenied):
+                ToyContextualViewSet(self.user).check_permissions(first_request)
+            crum.set_current_request(second_request)
+            assert get_current_request() is second_request
+            ToyPermissionRequiredView().check_permissions(second_request)
+
+        assert seen_requests == [first_request, second_request]
+
+
 @ddt.ddt
 class TestPermissionRequiredForListingMixin(TestCase):
     """
@@ -150,6 +230,26 @@ class TestPermissionRequiredForListingMixin(TestCase):
                 viewset.request.user, viewset.allowed_roles, viewset.role_assignment_class
             )
 
+    def test_accessible_contexts_several_role_assignment_classes(self):
+        """
+        With several `role_assignment_classes`, DB-defined access is checked against all of them at once.
+        """
+        viewset = ToyViewSet()
+        viewset.role_assignment_classes = [ToyRoleAssignmentClass, ConcreteContextualUserRoleAssignment]
+        viewset.request.user.is_superuser = False
+
+        with mock.patch(
+            'edx_rbac.mixins.utils.contexts_accessible_from_request', return_value=frozenset({'a'})
+        ), mock.patch(
+            'edx_rbac.mixins.utils.contexts_accessible_from_databases', return_value=frozenset({'b'})
+        ) as mock_contexts_accessible_from_databases:
+            assert viewset.accessible_contexts == {'a', 'b'}
+
+        mock_contexts_accessible_from_databases.assert_called_once_with(
+            viewset.request.user, viewset.allowed_roles, viewset.role_assignment_classes
+        )
+        assert not viewset.joins_role_assignments
+
     @ddt.data(
         (True, False),
         (False, True)
@@ -222,6 +322,20 @@ class TestPermissionRequiredForListingMixin(TestCase):
 
         assert expected_queryset == actual_queryset
 
+    @override_settings(RBAC_HIERARCHICAL_CONTEXT_SEPARATOR='+')
+    def test_get_queryset_list_hierarchical_contexts(self):
+        """
+        With hierarchical contexts, the filtered queryset includes everything below the accessible contexts.
+        """
+        viewset = ToyViewSet()
+        viewset.accessible_contexts = {'course-v1:edX'}
+
+        viewset.get_queryset()
+
+        viewset.base_queryset.filter.assert_called_with(
+            Q(some_field__in={'course-v1:edX'}) | Q(some_field__startswith='course-v1:edX+')
+        )
+
     def test_get_queryset_detail_returns_base_queryset(self):
         """
         The base queryset is returned when requesting an action other than 'list'.
@@ -252,3 +366,132 @@ class TestPermissionRequiredForListingMixin(TestCase):
         viewset = ToyViewSetEmptyListLookupField()
         with self.assertRaises(Exception):
             viewset.get_queryset()
+
+
+async def acontexts_accessible_from_request(request, role_names):
+    """
+    Return the contexts of `utils.contexts_accessible_from_request()`, which the tests mock, from a coroutine.
+    """
+    return utils.contexts_accessible_from_request(request, role_names)
+
+
+@mock.patch('edx_rbac.mixins.utils.contexts_accessible_from_request', return_value=frozenset({'from-jwt'}))
+class TestPermissionRequiredForListingMixinWithContextualAssignments(TestCase):
+    """
+    Tests for the `PermissionRequiredForListingMixin` mixin with a `ContextualUserRoleAssignment`.
+    """
+    # pylint: disable=unused-argument
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch(
+            'edx_rbac.mixins.utils.acontexts_accessible_from_request', acontexts_accessible_from_request,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(set_current_request, None)
+        self.user = User.objects.create(username='test_user')
+        self.role = ConcreteUserRole.objects.create(name='coupon-manager')
+        for name in ('from-db', 'from-jwt', 'inaccessible'):
+            ConcreteUserRole.objects.create(name=name)
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context='from-db')
+
+    def test_get_queryset_joins_role_assignments(self, mock_contexts_from_request):
+        viewset = ToyContextualViewSet(self.user)
+
+        with self.assertNumQueries(2):
+            viewset.check_permissions(viewset.request)
+            # The assignment's contexts are never loaded: a single query lists the accessible instances.
+            assert [role.name for role in viewset.get_queryset()] == ['from-db', 'from-jwt']
+        mock_contexts_from_request.assert_called_with(viewset.request, ['coupon-manager'])
+
+    def test_get_queryset_with_all_contexts_assignment(self, mock_contexts_from_request):
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context=ALL_ACCESS_CONTEXT)
+        viewset = ToyContextualViewSet(self.user)
+
+        assert viewset.get_queryset() is viewset.base_queryset
+
+    def test_check_permissions_without_accessible_contexts(self, mock_contexts_from_request):
+        mock_contexts_from_request.return_value = frozenset()
+        viewset = ToyContextualViewSet(User.objects.create(username='other_user'))
+
+        with self.assertRaises(PermissionDenied):
+            viewset.check_permissions(viewset.request)
+        assert not viewset.get_queryset().exists()
+
+    def test_acheck_permissions_joins_role_assignments(self, mock_contexts_from_request):
+        viewset = ToyContextualViewSet(self.user)
+
+        with self.assertNumQueries(2):
+            async_to_sync(viewset.acheck_permissions)(viewset.request)
+            assert [role.name for role in viewset.get_queryset()] == ['from-db', 'from-jwt']
+
+    def test_acheck_permissions_without_accessible_contexts(self, mock_contexts_from_request):
+        mock_contexts_from_request.return_value = frozenset()
+        viewset = ToyContextualViewSet(User.objects.create(username='other_user'))
+
+        with self.assertRaises(PermissionDenied):
+            async_to_sync(viewset.acheck_permissions)(viewset.request)
+
+    def test_aget_accessible_contexts(self, mock_contexts_from_request):
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role)
+        viewset = ToyContextualViewSet(self.user)
+        viewset.role_assignment_class = ConcreteUserRoleAssignment
+
+        assert async_to_sync(viewset.aget_accessible_contexts)() == {'from-jwt', 'a-test-context'}
+        async_to_sync(viewset.acheck_permissions)(viewset.request)
+        with self.assertNumQueries(0):
+            assert viewset.accessible_contexts == {'from-jwt', 'a-test-context'}
+            assert viewset.get_queryset() is not None
+
+        viewset = ToyContextualViewSet(self.user)
+        viewset.role_assignment_classes = [ConcreteUserRoleAssignment, ConcreteContextualUserRoleAssignment]
+        assert async_to_sync(viewset.aget_accessible_contexts)() == {'from-jwt', 'from-db', 'a-test-context'}
+
+    def test_acheck_permissions_of_other_actions(self, mock_contexts_from_request):
+        viewset = ToyContextualViewSet(self.user)
+        viewset.action = 'retrieve'
+        viewset.permission_required = 'some-permission'
+
+        with mock.patch.object(User, 'has_perm', return_value=True) as mock_has_perm:
+            async_to_sync(viewset.acheck_permissions)(viewset.request)
+        mock_has_perm.assert_called_once_with('some-permission', None)
+
+        with mock.patch.object(User, 'has_perm', return_value=False):
+            with mock.patch.object(viewset, 'permission_denied') as mock_permission_denied:
+                async_to_sync(viewset.acheck_permissions)(viewset.request)
+        mock_permission_denied.assert_called_once_with(viewset.request, message='MISSING: some-permission')
+
+    def test_join_is_opt_in(self, mock_contexts_from_request):
+        viewset = ToyContextualViewSet(self.user)
+        viewset.join_role_assignments = False
+
+        assert not viewset.joins_role_assignments
+        assert [role.name for role in viewset.get_queryset()] == ['from-db', 'from-jwt']
+
+    def test_non_string_lookup_field_uses_accessible_contexts(self, mock_contexts_from_request):
+        from_db_pk = ConcreteUserRole.objects.get(name='from-db').pk
+        ConcreteContextualUserRoleAssignment.objects.filter(user=self.user).update(context=str(from_db_pk))
+        mock_contexts_from_request.return_value = frozenset()
+        for list_lookup_field in ('id', 'pk'):
+            viewset = ToyContextualViewSet(self.user)
+            viewset.list_lookup_field = list_lookup_field
+
+            assert not viewset.joins_role_assignments
+            assert [role.name for role in viewset.get_queryset()] == ['from-db']
+
+    def test_overridden_accessible_contexts_are_used(self, mock_contexts_from_request):
+        class ToyOverridingViewSet(ToyContextualViewSet):
+            accessible_contexts = frozenset({'inaccessible'})
+
+        viewset = ToyOverridingViewSet(self.user)
+
+        assert not viewset.joins_role_assignments
+        assert [role.name for role in viewset.get_queryset()] == ['inaccessible']
+
+    @override_settings(RBAC_HIERARCHICAL_CONTEXT_SEPARATOR='+')
+    def test_hierarchical_contexts_use_accessible_contexts(self, mock_contexts_from_request):
+        viewset = ToyContextualViewSet(self.user)
+
+        assert not viewset.joins_role_assignments
+        assert [role.name for role in viewset.get_queryset()] == ['from-db', 'from-jwt']
@@ -3,6 +3,41 @@
 Tests for the `edx-rbac` models module.
 """
 
+from unittest import mock
+from uuid import uuid4
+
+from asgiref.sync import async_to_sync
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+
+from edx_rbac.constants import ALL_ACCESS_CONTEXT
+from edx_rbac.models import recommended_assignment_indexes
+from tests.models import (
+    ConcreteContextualUserRoleAssignment,
+    ConcreteUserRole,
+    ConcreteUserRoleAssignment,
+    ConcreteUserRoleAssignmentContextFields
+)
+
+User = auth.get_user_model()
+
+
+def get_custom_assignments(cls, user, role_names=None):  # pylint: disable=unused-argument
+    """
+    An override of `UserRoleAssignment.get_assignments()` which doesn't read the assignments of the class.
+    """
+    yield 'custom-role', f'custom-context-{user.pk}'
+
+
+@async_to_sync
+async def _collect(pairs):
+    """
+    Return the list of the items of an async iterator.
+    """
+    return [pair async for pair in pairs]
+
 
 class TestUserRole:
     """
@@ -20,3 +55,255 @@ class TestRole:
 
     def test_something(self):
         """TODO: Write real test cases."""
+
+
+class TestUserRoleAssignmentGetAssignments(TestCase):
+    """
+    Tests of `UserRoleAssignment.get_assignments()`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='test_user')
+        self.role = ConcreteUserRole.objects.create(name='coupon-manager')
+        self.other_role = ConcreteUserRole.objects.create(name='enterprise_admin')
+
+    def test_get_assignments_from_model_instances(self):
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role)
+
+        assert list(ConcreteUserRoleAssignment.get_assignments(self.user)) == [('coupon-manager', 'a-test-context')]
+
+    def test_get_assignments_from_context_fields(self):
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=self.role)
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=self.other_role)
+
+        with self.assertNumQueries(1):
+            assert list(ConcreteUserRoleAssignmentContextFields.get_assignments(self.user)) == [
+                ('coupon-manager', 'test_user'), ('enterprise_admin', 'test_user'),
+            ]
+        assert list(ConcreteUserRoleAssignmentContextFields.get_assignments(self.user, ['enterprise_admin'])) == [
+            ('enterprise_admin', 'test_user'),
+        ]
+
+    def test_get_assignments_from_context_fields_of_all_contexts_assignment(self):
+        ConcreteUserRoleAssignmentContextFields.objects.create(
+            user=self.user, role=self.role, applies_to_all_contexts=True,
+        )
+
+        assert list(ConcreteUserRoleAssignmentContextFields.get_assignments(self.user)) == [
+            ('coupon-manager', ALL_ACCESS_CONTEXT),
+        ]
+
+    def test_get_assignments_from_context_fields_does_not_build_instances(self):
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=self.role)
+
+        with mock.patch.object(ConcreteUserRoleAssignmentContextFields, 'get_context') as get_context:
+            assert list(ConcreteUserRoleAssignmentContextFields.get_assignments(self.user)) == [
+                ('coupon-manager', 'test_user'),
+            ]
+        get_context.assert_not_called()
+
+    def test_get_assignments_without_context_fields(self):
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=self.role)
+
+        with mock.patch.object(ConcreteUserRoleAssignmentContextFields, 'context_fields', ()):
+            assert list(ConcreteUserRoleAssignmentContextFields.get_assignments(self.user)) == [
+                ('coupon-manager', None),
+            ]
+
+    def test_get_assignments_for_anonymous_user(self):
+        assert not list(ConcreteUserRoleAssignmentContextFields.get_assignments(AnonymousUser()))
+
+    def test_get_assignments_applies_select_related(self):
+        for role in (self.role, self.other_role):
+            ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=role)
+
+        with mock.patch.object(ConcreteUserRoleAssignmentContextFields, 'context_fields', None):
+            with self.assertNumQueries(3):
+                list(ConcreteUserRoleAssignmentContextFields.get_assignments(self.user))
+
+            with mock.patch.object(ConcreteUserRoleAssignmentContextFields, 'assignment_select_related', ('user',)):
+                with self.assertNumQueries(1):
+                    assert list(ConcreteUserRoleAssignmentContextFields.get_assignments(self.user)) == [
+                        ('coupon-manager', 'test_user'), ('enterprise_admin', 'test_user'),
+                    ]
+
+    def test_get_assignments_applies_prefetch_related(self):
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=self.role)
+
+        with mock.patch.multiple(
+            ConcreteUserRoleAssignmentContextFields, context_fields=None, assignment_prefetch_related=('user',),
+        ):
+            with self.assertNumQueries(2):
+                assert list(ConcreteUserRoleAssignmentContextFields.get_assignments(self.user)) == [
+                    ('coupon-manager', 'test_user'),
+                ]
+
+    def test_get_assignments_resolves_contexts_in_batches(self):
+        for role in (self.role, self.other_role):
+            ConcreteUserRoleAssignment.objects.create(user=self.user, role=role)
+        batch_sizes = []
+
+        def get_contexts(assignments):
+            batch_sizes.append(len(assignments))
+            return [f'context-{assignment.pk}' for assignment in assignments]
+
+        with mock.patch.multiple(ConcreteUserRoleAssignment, get_contexts=get_contexts, assignment_chunk_size=1):
+            assignments = list(ConcreteUserRoleAssignment.get_assignments(self.user))
+
+        assert assignments == [
+            (assignment.role.name, f'context-{assignment.pk}')
+            for assignment in ConcreteUserRoleAssignment.objects.order_by('pk')
+        ]
+        assert batch_sizes == [1, 1]
+
+    def test_get_assignments_for_users_calls_overridden_get_assignments(self):
+        other_user = User.objects.create(username='other_user')
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=self.role)
+
+        with mock.patch.object(
+            ConcreteUserRoleAssignmentContextFields, 'get_assignments', classmethod(get_custom_assignments),
+        ):
+            assert ConcreteUserRoleAssignmentContextFields.get_assignment_rows([self.user.pk]) is None
+            assert ConcreteUserRoleAssignmentContextFields.get_assignments_for_users(
+                [self.user, other_user, AnonymousUser()],
+            ) == {
+                self.user.pk: [('custom-role', f'custom-context-{self.user.pk}')],
+                other_user.pk: [('custom-role', f'custom-context-{other_user.pk}')],
+            }
+
+    def test_aget_assignments_calls_overridden_get_assignments(self):
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=self.role)
+
+        with mock.patch.object(
+            ConcreteUserRoleAssignmentContextFields, 'get_assignments', classmethod(get_custom_assignments),
+        ):
+            assert _collect(ConcreteUserRoleAssignmentContextFields.aget_assignments(self.user)) == [
+                ('custom-role', f'custom-context-{self.user.pk}'),
+            ]
+
+    def test_aget_assignments(self):
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role)
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=self.role)
+        ConcreteUserRoleAssignmentContextFields.objects.create(
+            user=self.user, role=self.other_role, applies_to_all_contexts=True,
+        )
+
+        assert _collect(ConcreteUserRoleAssignment.aget_assignments(self.user)) == [
+            ('coupon-manager', 'a-test-context'),
+        ]
+        with self.assertNumQueries(1):
+            assert _collect(ConcreteUserRoleAssignmentContextFields.aget_assignments(self.user)) == [
+                ('coupon-manager', 'test_user'), ('enterprise_admin', ALL_ACCESS_CONTEXT),
+            ]
+        assert _collect(ConcreteUserRoleAssignmentContextFields.aget_assignments(self.user, ['coupon-manager'])) == [
+            ('coupon-manager', 'test_user'),
+        ]
+        assert not _collect(ConcreteUserRoleAssignment.aget_assignments(AnonymousUser()))
+
+    def test_aget_all_contexts_role(self):
+        role_assignment_class = ConcreteUserRoleAssignmentContextFields
+        role_assignment_class.objects.create(user=self.user, role=self.role)
+        role_assignment_class.objects.create(user=self.user, role=self.other_role, applies_to_all_contexts=True)
+
+        with self.assertNumQueries(1):
+            assert async_to_sync(role_assignment_class.aget_all_contexts_role)(self.user) == 'enterprise_admin'
+        assert async_to_sync(role_assignment_class.aget_all_contexts_role)(self.user, ['coupon-manager']) is None
+        assert async_to_sync(role_assignment_class.aget_all_contexts_role)(AnonymousUser()) is None
+        with self.assertNumQueries(0):
+            assert async_to_sync(ConcreteUserRoleAssignment.aget_all_contexts_role)(self.user) is None
+
+
+class TestContextualUserRoleAssignment(TestCase):
+    """
+    Tests of the `ContextualUserRoleAssignment` model.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='test_user')
+        self.role = ConcreteUserRole.objects.create(name='coupon-manager')
+        for context in ('context-a', 'context-b', 'course-v1:edX', None):
+            ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context=context)
+
+    def test_get_assignments(self):
+        self.assertCountEqual(ConcreteContextualUserRoleAssignment.get_assignments(self.user), [
+            ('coupon-manager', 'context-a'),
+            ('coupon-manager', 'context-b'),
+            ('coupon-manager', 'course-v1:edX'),
+            ('coupon-manager', None),
+        ])
+
+    def test_user_has_contexts(self):
+        with self.assertNumQueries(1):
+            assert ConcreteContextualUserRoleAssignment.user_has_contexts(self.user, ['coupon-manager'], 'context-a')
+        with self.assertNumQueries(1):
+            assert ConcreteContextualUserRoleAssignment.user_has_contexts(
+                self.user, ['coupon-manager'], ['context-a', 'context-b'],
+            )
+        assert not ConcreteContextualUserRoleAssignment.user_has_contexts(
+            self.user, ['coupon-manager'], ['context-a', 'context-c'],
+        )
+        assert not ConcreteContextualUserRoleAssignment.user_has_contexts(self.user, ['other-role'], 'context-a')
+        assert not ConcreteContextualUserRoleAssignment.user_has_contexts(
+            self.user, ['coupon-manager'], 'course-v1:edX+DemoX',
+        )
+        assert not ConcreteContextualUserRoleAssignment.user_has_contexts(
+            AnonymousUser(), ['coupon-manager'], 'context-a',
+        )
+
+    @override_settings(RBAC_HIERARCHICAL_CONTEXT_SEPARATOR='+')
+    def test_user_has_contexts_hierarchical(self):
+        assert ConcreteContextualUserRoleAssignment.user_has_contexts(
+            self.user, ['coupon-manager'], ['course-v1:edX+DemoX+Demo_2014', 'context-a'],
+        )
+        assert not ConcreteContextualUserRoleAssignment.user_has_contexts(
+            self.user, ['coupon-manager'], 'course-v1:edXx+DemoX',
+        )
+
+    @override_settings(RBAC_HIERARCHICAL_CONTEXT_SEPARATOR='+')
+    def test_user_has_contexts_which_are_not_strings(self):
+        uuid_context = uuid4()
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context=str(uuid_context))
+        auser_has_contexts = async_to_sync(ConcreteContextualUserRoleAssignment.auser_has_contexts)
+
+        assert ConcreteContextualUserRoleAssignment.user_has_contexts(self.user, ['coupon-manager'], uuid_context)
+        assert auser_has_contexts(self.user, ['coupon-manager'], uuid_context)
+        assert not ConcreteContextualUserRoleAssignment.user_has_contexts(self.user, ['coupon-manager'], 5)
+        assert not auser_has_contexts(self.user, ['coupon-manager'], [5, uuid_context])
+
+    def test_auser_has_contexts(self):
+        auser_has_contexts = async_to_sync(ConcreteContextualUserRoleAssignment.auser_has_contexts)
+
+        with self.assertNumQueries(1):
+            assert auser_has_contexts(self.user, ['coupon-manager'], ['context-a', 'context-b'])
+        assert not auser_has_contexts(self.user, ['coupon-manager'], ['context-a', 'context-c'])
+        assert not auser_has_contexts(AnonymousUser(), ['coupon-manager'], 'context-a')
+
+    def test_user_has_contexts_all_contexts(self):
+        other_role = ConcreteUserRole.objects.create(name='enterprise_admin')
+        ConcreteContextualUserRoleAssignment.objects.create(
+            user=self.user, role=other_role, context=ALL_ACCESS_CONTEXT,
+        )
+
+        assert ConcreteContextualUserRoleAssignment.user_has_contexts(self.user, ['enterprise_admin'], 'anything')
+        assert ConcreteContextualUserRoleAssignment.get_all_contexts_role(self.user) == 'enterprise_admin'
+
+    def test_context_is_unique_per_user_and_role(self):
+        with self.assertRaises(IntegrityError):
+            ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context='context-a')
+
+
+class TestRecommendedAssignmentIndexes(TestCase):
+    """
+    Tests for `recommended_assignment_indexes()`.
+    """
+
+    def test_index_names(self):
+        assert [index.name for index in recommended_assignment_indexes('ent_ura')] == [
+            'ent_ura_user_role_idx', 'ent_ura_all_ctx_idx',
+        ]
+
+    def test_prefix_too_long(self):
+        with self.assertRaisesRegex(ValueError, 'use a shorter prefix'):
+            recommended_assignment_indexes('a_much_too_long_prefix')
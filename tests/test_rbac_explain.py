@@ -0,0 +1,81 @@
+"""
+Tests for the `rbac_explain` management command.
+"""
+
+from io import StringIO
+
+from django.contrib import auth
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from edx_rbac.mixins import PermissionRequiredForListingMixin
+from tests.models import ConcreteContextualUserRoleAssignment, ConcreteUserRole
+
+User = auth.get_user_model()
+
+
+class ToyListingView(PermissionRequiredForListingMixin):
+    """
+    Toy listing view of roles by name, whose queryset is explained.
+    """
+    list_lookup_field = 'name'
+    allowed_roles = ['coupon-manager']
+    role_assignment_class = ConcreteContextualUserRoleAssignment
+    join_role_assignments = True
+    base_queryset = ConcreteUserRole.objects.all()
+
+
+class TestRbacExplain(TestCase):
+    """
+    Tests for the `rbac_explain` management command.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='test_user')
+        role = ConcreteUserRole.objects.create(name='coupon-manager')
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=role, context='context-a')
+
+    def call_command(self, *args):
+        """
+        Call the command with the given arguments and return its output.
+        """
+        out = StringIO()
+        call_command('rbac_explain', *args, stdout=out)
+        return out.getvalue()
+
+    def test_explain(self):
+        output = self.call_command(
+            'test_user',
+            '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment',
+            '--role', 'coupon-manager',
+            '--view', 'tests.test_rbac_explain.ToyListingView',
+        )
+
+        assert '== get_assignments ==' in output
+        assert '== all contexts check ==' in output
+        assert '== listing ==' in output
+        assert 'tests_concretecontextualuserroleassignment' in output
+        assert 'tests_concreteuserrole' in output
+
+    def test_explain_without_all_contexts_check(self):
+        output = self.call_command('test_user', '--role-assignment-class', 'tests.ConcreteUserRoleAssignment')
+
+        assert '== get_assignments ==' in output
+        assert '== all contexts check ==' not in output
+
+    def test_unknown_user(self):
+        with self.assertRaisesRegex(CommandError, 'No user named'):
+            self.call_command('not_a_user', '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment')
+
+    def test_unknown_role_assignment_class(self):
+        with self.assertRaisesRegex(CommandError, 'Unknown role assignment class'):
+            self.call_command('test_user', '--role-assignment-class', 'tests.NotAModel')
+
+    def test_unknown_view(self):
+        with self.assertRaisesRegex(CommandError, 'Unknown view'):
+            self.call_command(
+                'test_user',
+                '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment',
+                '--view', 'tests.not_a_module.View',
+            )
@@ -0,0 +1,251 @@
+"""
+Tests for the `rbac_reconcile` management command.
+"""
+
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib import auth
+from django.core.cache import cache as django_cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from edx_rbac.utils import create_role_auth_claim_for_user
+from tests.models import ConcreteContextualUserRoleAssignment, ConcreteUserRole
+
+User = auth.get_user_model()
+
+
+class TestRbacReconcile(TestCase):
+    """
+    Tests for the `rbac_reconcile` management command.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='test_user', email='test_user@example.com')
+        self.other_user = User.objects.create(username='other_user', email='other_user@example.com')
+        self.unlisted_user = User.objects.create(username='unlisted_user', email='unlisted_user@example.com')
+        self.role = ConcreteUserRole.objects.create(name='coupon-manager')
+        self.other_role = ConcreteUserRole.objects.create(name='enterprise_admin')
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context='context-a')
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context='context-old')
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.unlisted_user, role=self.role, context='kept')
+
+    def write_input(self, content, suffix='.csv'):
+        """
+        Write the given content to a temporary file and return its path.
+        """
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8') as input_file:
+            input_file.write(content)
+        self.addCleanup(os.remove, input_file.name)
+        return input_file.name
+
+    def call_command(self, *args):
+        """
+        Call the command with the given arguments and return its output and its error output.
+        """
+        out, err = StringIO(), StringIO()
+        call_command('rbac_reconcile', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def contextual_assignments(self):
+        """
+        Return the set of ``(username, role name, context)`` of every `ConcreteContextualUserRoleAssignment`.
+        """
+        return set(ConcreteContextualUserRoleAssignment.objects.values_list('user__username', 'role__name', 'context'))
+
+    def test_reconcile_csv(self):
+        path = self.write_input(
+            'user_id,email,role,context\n'
+            f'{self.user.id},,coupon-manager,context-a\n'
+            f'{self.user.id},,enterprise_admin,context-b\n'
+            ',nobody@example.com,coupon-manager,context-a\n'
+            ',other_user@example.com,coupon-manager,context-a\n'
+        )
+
+        out, err = self.call_command(path, '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment')
+
+        assert self.contextual_assignments() == {
+            ('test_user', 'coupon-manager', 'context-a'),
+            ('test_user', 'enterprise_admin', 'context-b'),
+            ('other_user', 'coupon-manager', 'context-a'),
+            ('unlisted_user', 'coupon-manager', 'kept'),
+        }
+        assert 'Reconciled assignments: 2 created, 1 deleted, 1 unchanged, 1 skipped.' in out
+        assert "unknown user 'nobody@example.com'" in err
+
+    def test_reconcile_jsonl(self):
+        path = self.write_input(
+            f'{{"user_id": {self.user.id}, "role": "coupon-manager", "context": "context-a"}}\n'
+            '\n'
+            f'{{"user_id": {self.other_user.id}, "role": "enterprise_admin", "applies_to_all_contexts": true}}\n',
+            suffix='.jsonl',
+        )
+
+        out, __ = self.call_command(path, '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment')
+
+        assert set(
+            ConcreteContextualUserRoleAssignment.objects.values_list(
+                'user__username', 'role__name', 'context', 'applies_to_all_contexts',
+            )
+        ) == {
+            ('test_user', 'coupon-manager', 'context-a', False),
+            ('other_user', 'enterprise_admin', None, True),
+            ('unlisted_user', 'coupon-manager', 'kept', False),
+        }
+        assert ConcreteContextualUserRoleAssignment.objects.count() == 3
+        assert 'Reconciled assignments: 1 created, 1 deleted, 1 unchanged, 0 skipped.' in out
+
+    def test_user_with_unknown_role_is_left_alone(self):
+        assignments = self.contextual_assignments()
+        path = self.write_input(
+            'user_id,role,context\n'
+            f'{self.user.id},coupon-manager,context-a\n'
+            f'{self.user.id},not-a-role,context-c\n'
+        )
+
+        out, err = self.call_command(path, '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment')
+
+        assert self.contextual_assignments() == assignments
+        assert 'Reconciled assignments: 0 created, 0 deleted, 0 unchanged, 2 skipped.' in out
+        assert "unknown role(s) 'not-a-role'" in err
+
+    def test_unsorted_input(self):
+        path = self.write_input(
+            'user_id,role,context\n'
+            f'{self.other_user.id},coupon-manager,context-a\n'
+            f'{self.user.id},coupon-manager,context-a\n'
+            f'{self.other_user.id},enterprise_admin,context-b\n'
+        )
+
+        with self.assertRaisesRegex(CommandError, 'not sorted by user'):
+            self.call_command(
+                path, '--chunk-size', '1', '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment',
+            )
+
+        # The chunks reconciled before the first row out of order are kept.
+        assert ('other_user', 'coupon-manager', 'context-a') in self.contextual_assignments()
+        assert ('test_user', 'coupon-manager', 'context-old') in self.contextual_assignments()
+
+    def test_user_identified_by_id_and_email(self):
+        path = self.write_input(
+            'user_id,email,role,context\n'
+            f'{self.user.id},,coupon-manager,context-a\n'
+            ',test_user@example.com,coupon-manager,context-b\n'
+        )
+
+        with self.assertRaisesRegex(CommandError, 'identified both by id and by email'):
+            self.call_command(path, '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment')
+
+    def test_contexts_are_compared_as_strings(self):
+        for context in ('123', '0'):
+            ConcreteContextualUserRoleAssignment.objects.create(user=self.other_user, role=self.role, context=context)
+        path = self.write_input(
+            f'{{"user_id": {self.other_user.id}, "role": "coupon-manager", "context": 123}}\n'
+            f'{{"user_id": {self.other_user.id}, "role": "coupon-manager", "context": 0}}\n',
+            suffix='.jsonl',
+        )
+
+        out, __ = self.call_command(path, '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment')
+
+        assert 'Reconciled assignments: 0 created, 0 deleted, 2 unchanged, 0 skipped.' in out
+
+    def test_reconcile_from_stdin_in_chunks(self):
+        stdin = StringIO(
+            f'{{"user_id": {self.user.id}, "role": "coupon-manager", "context": "context-a"}}\n'
+            f'{{"user_id": {self.other_user.id}, "role": "coupon-manager", "context": "context-a"}}\n'
+            f'{{"user_id": {self.other_user.id}, "role": "enterprise_admin", "context": "context-b"}}\n'
+        )
+
+        # Per chunk of users: one query for the users and one for their assignments, then a delete of
+        # the stale assignments (of the first user), without fetching them, or a bulk insert (for the second),
+        # in a transaction.
+        with mock.patch('sys.stdin', stdin), self.assertNumQueries(11):
+            self.call_command(
+                '-', '--format', 'jsonl', '--chunk-size', '1',
+                '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment',
+            )
+
+        assert self.contextual_assignments() == {
+            ('test_user', 'coupon-manager', 'context-a'),
+            ('other_user', 'coupon-manager', 'context-a'),
+            ('other_user', 'enterprise_admin', 'context-b'),
+            ('unlisted_user', 'coupon-manager', 'kept'),
+        }
+
+    def test_dry_run(self):
+        assignments = self.contextual_assignments()
+        path = self.write_input(f'user_id,role,context\n{self.other_user.id},coupon-manager,context-a\n')
+
+        out, __ = self.call_command(
+            path, '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment', '--dry-run',
+        )
+
+        assert self.contextual_assignments() == assignments
+        assert 'Would have assignments: 1 created, 0 deleted, 0 unchanged, 0 skipped.' in out
+
+    @override_settings(
+        RBAC_ROLES_CLAIM_CACHE_TIMEOUT=60,
+        SYSTEM_WIDE_ROLE_CLASSES=['tests.ConcreteContextualUserRoleAssignment'],
+    )
+    def test_created_assignments_invalidate_cached_claims(self):
+        django_cache.clear()
+        self.addCleanup(django_cache.clear)
+        assert create_role_auth_claim_for_user(self.other_user) == []
+        path = self.write_input(f'user_id,role,context\n{self.other_user.id},coupon-manager,context-a\n')
+
+        self.call_command(path, '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment')
+
+        assert create_role_auth_claim_for_user(self.other_user) == ['coupon-manager:context-a']
+
+    @override_settings(
+        RBAC_ROLES_CLAIM_CACHE_TIMEOUT=60,
+        SYSTEM_WIDE_ROLE_CLASSES=['tests.ConcreteContextualUserRoleAssignment'],
+    )
+    def test_deleted_assignments_invalidate_cached_claims(self):
+        django_cache.clear()
+        self.addCleanup(django_cache.clear)
+        assert sorted(create_role_auth_claim_for_user(self.user)) == [
+            'coupon-manager:context-a', 'coupon-manager:context-old',
+        ]
+        path = self.write_input(f'user_id,role,context\n{self.user.id},coupon-manager,context-a\n')
+
+        self.call_command(path, '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment')
+
+        assert create_role_auth_claim_for_user(self.user) == ['coupon-manager:context-a']
+
+    def test_unknown_role_assignment_class(self):
+        with self.assertRaisesRegex(CommandError, 'Unknown role assignment class'):
+            self.call_command('-', '--role-assignment-class', 'tests.NotAModel')
+
+    def test_not_a_role_assignment_class(self):
+        with self.assertRaisesRegex(CommandError, 'is not a UserRoleAssignment subclass'):
+            self.call_command('-', '--role-assignment-class', 'tests.ConcreteUserRole')
+
+    def test_class_without_context_field(self):
+        for role_assignment_class in (
+            'tests.ConcreteUserRoleAssignment', 'tests.ConcreteUserRoleAssignmentContextFields',
+        ):
+            with self.assertRaisesRegex(CommandError, "doesn't store its context in a single field of its own"):
+                self.call_command('-', '--role-assignment-class', role_assignment_class)
+
+    def test_missing_file(self):
+        with self.assertRaisesRegex(CommandError, 'Cannot read'):
+            self.call_command(
+                '/not/a/file.csv', '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment',
+            )
+
+    def test_row_without_user(self):
+        path = self.write_input('user_id,email,role\n,,coupon-manager\n')
+
+        with self.assertRaisesRegex(CommandError, 'neither a user_id nor an email'):
+            self.call_command(path, '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment')
+
+    def test_invalid_jsonl(self):
+        path = self.write_input('{"user_id": 1,\n', suffix='.jsonl')
+
+        with self.assertRaisesRegex(CommandError, 'Line 1 is not valid JSON'):
+            self.call_command(path, '--role-assignment-class', 'tests.ConcreteContextualUserRoleAssignment')
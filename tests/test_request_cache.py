@@ -0,0 +1,90 @@
+"""
+Tests for the `edx-rbac` request_cache module.
+"""
+
+import asyncio
+
+import crum
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import RequestFactory, TestCase
+from rest_framework.request import Request
+
+from edx_rbac.request_cache import get_current_request, get_request_cache, request_scope, set_current_request
+
+
+class TestRequestCache(TestCase):
+    """
+    Tests for `get_request_cache()`.
+    """
+
+    def test_cache_is_tied_to_the_request(self):
+        request = RequestFactory().get('/')
+        get_request_cache(request)['key'] = 'value'
+
+        assert get_request_cache(request) == {'key': 'value'}
+        assert get_request_cache(RequestFactory().get('/')) == {}
+
+    def test_drf_request_shares_cache_with_wrapped_request(self):
+        http_request = RequestFactory().get('/')
+        get_request_cache(Request(http_request))['key'] = 'value'
+
+        assert get_request_cache(http_request) == {'key': 'value'}
+
+    def test_no_request_is_never_cached(self):
+        get_request_cache(None)['key'] = 'value'
+
+        assert get_request_cache(None) == {}
+
+
+class TestCurrentRequest(TestCase):
+    """
+    Tests for `get_current_request()`, `set_current_request()` and `request_scope()`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(set_current_request, None)
+        self.request = RequestFactory().get('/')
+
+    def test_set_current_request(self):
+        set_current_request(self.request)
+
+        assert get_current_request() is self.request
+        assert crum.get_current_request() is self.request
+
+        # It doesn't outlive the request, which crum's middleware replaces with the next one.
+        other_request = RequestFactory().get('/other/')
+        crum.set_current_request(other_request)
+        assert get_current_request() is other_request
+
+    def test_falls_back_to_crum(self):
+        crum.set_current_request(self.request)
+
+        assert get_current_request() is self.request
+
+    def test_request_scope(self):
+        other_request = RequestFactory().get('/')
+        set_current_request(other_request)
+
+        with request_scope(self.request):
+            assert get_current_request() is self.request
+            assert crum.get_current_request() is self.request
+
+        assert get_current_request() is other_request
+        assert crum.get_current_request() is other_request
+
+    def test_concurrent_tasks_have_their_own_request(self):
+        requests = [RequestFactory().get(f'/{i}') for i in range(3)]
+
+        async def serve(request):
+            with request_scope(request):
+                await asyncio.sleep(0)
+                # The current request follows the task into the thread of sync code.
+                return get_current_request(), await sync_to_async(get_current_request)()
+
+        @async_to_sync
+        async def serve_concurrently():
+            return await asyncio.gather(*(serve(request) for request in requests))
+
+        assert serve_concurrently() == [(request, request) for request in requests]
+        assert get_current_request() is None
@@ -0,0 +1,167 @@
+"""
+Tests for the `edx-rbac` role_catalog module.
+"""
+
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib import auth
+from django.test import TestCase, override_settings
+
+from edx_rbac.constants import ROLE_CATALOG_TIMEOUT_SETTING
+from edx_rbac.role_catalog import aget_role_catalog, clear_role_catalogs, get_role_catalog
+from tests.models import (
+    ConcreteContextualUserRoleAssignment,
+    ConcreteUserRole,
+    ConcreteUserRoleAssignment,
+    ConcreteUserRoleAssignmentContextFields
+)
+
+User = auth.get_user_model()
+
+
+@override_settings(**{ROLE_CATALOG_TIMEOUT_SETTING: 300})
+class TestRoleCatalog(TestCase):
+    """
+    Tests for `RoleCatalog` and `get_role_catalog()`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        clear_role_catalogs()
+        self.addCleanup(clear_role_catalogs)
+        self.role = ConcreteUserRole.objects.create(name='coupon-manager')
+        self.other_role = ConcreteUserRole.objects.create(name='enterprise_admin')
+
+    @override_settings(**{ROLE_CATALOG_TIMEOUT_SETTING: None})
+    def test_disabled(self):
+        assert get_role_catalog(ConcreteUserRole) is None
+
+    def test_catalog(self):
+        catalog = get_role_catalog(ConcreteUserRole)
+
+        assert catalog.pks_for(['enterprise_admin', 'not-a-role', 'coupon-manager']) == [
+            self.other_role.pk, self.role.pk,
+        ]
+        assert catalog.name_for(self.role.pk) == 'coupon-manager'
+        with self.assertNumQueries(0):
+            assert get_role_catalog(ConcreteUserRole) is catalog
+
+    def test_pks_for_reloads_the_catalog_once(self):
+        catalog = get_role_catalog(ConcreteUserRole)
+        # As if created by another process, which doesn't discard this process' catalog.
+        ConcreteUserRole.objects.bulk_create([ConcreteUserRole(name='new-role')])
+        new_role_pk = ConcreteUserRole.objects.get(name='new-role').pk
+
+        with self.assertNumQueries(1):
+            assert catalog.pks_for(['new-role', 'not-a-role']) == [new_role_pk]
+        with self.assertNumQueries(0):
+            assert catalog.pks_for(['new-role', 'not-a-role']) == [new_role_pk]
+            assert catalog.name_for(new_role_pk) == 'new-role'
+
+    def test_apks_for_reloads_the_catalog_once(self):
+        catalog = get_role_catalog(ConcreteUserRole)
+        ConcreteUserRole.objects.bulk_create([ConcreteUserRole(name='new-role')])
+        new_role_pk = ConcreteUserRole.objects.get(name='new-role').pk
+
+        with self.assertNumQueries(1):
+            assert async_to_sync(catalog.apks_for)(['new-role', 'not-a-role']) == [new_role_pk]
+        with self.assertNumQueries(0):
+            assert catalog.pks_for(['new-role', 'not-a-role']) == [new_role_pk]
+
+    def test_saving_a_role_discards_the_catalog(self):
+        catalog = get_role_catalog(ConcreteUserRole)
+
+        self.role.name = 'coupon-admin'
+        self.role.save()
+
+        assert get_role_catalog(ConcreteUserRole) is not catalog
+        assert get_role_catalog(ConcreteUserRole).pks_for(['coupon-admin']) == [self.role.pk]
+
+    def test_deleting_a_role_discards_the_catalog(self):
+        catalog = get_role_catalog(ConcreteUserRole)
+
+        self.other_role.delete()
+
+        assert not get_role_catalog(ConcreteUserRole).pks_for(['enterprise_admin'])
+        assert catalog.pks_for(['enterprise_admin'])
+
+    def test_aget_role_catalog(self):
+        catalog = async_to_sync(aget_role_catalog)(ConcreteUserRole)
+
+        assert catalog.pks_for(['coupon-manager']) == [self.role.pk]
+        with self.assertNumQueries(0):
+            assert async_to_sync(aget_role_catalog)(ConcreteUserRole) is catalog
+            assert get_role_catalog(ConcreteUserRole) is catalog
+
+        ConcreteUserRole.objects.bulk_create([ConcreteUserRole(name='new-role')])
+        new_role_pk = ConcreteUserRole.objects.get(name='new-role').pk
+        with self.assertNumQueries(1):
+            assert async_to_sync(catalog.aname_for)(new_role_pk) == 'new-role'
+
+    def test_catalog_expires(self):
+        catalog = get_role_catalog(ConcreteUserRole)
+
+        with mock.patch('edx_rbac.role_catalog.time.monotonic', return_value=catalog.loaded_at + 301):
+            assert get_role_catalog(ConcreteUserRole) is not catalog
+
+    def test_name_of_role_created_elsewhere(self):
+        catalog = get_role_catalog(ConcreteUserRole)
+        # bulk_create() sends no signal, like a role created by another process.
+        ConcreteUserRole.objects.bulk_create([ConcreteUserRole(name='new-role')])
+        new_role_pk = ConcreteUserRole.objects.get(name='new-role').pk
+
+        with self.assertNumQueries(1):
+            assert catalog.name_for(new_role_pk) == 'new-role'
+        assert catalog.pks_for(['new-role']) == [new_role_pk]
+
+    def test_assignment_queries_do_not_join_the_role_table(self):
+        user = User.objects.create(username='test_user')
+        ConcreteUserRoleAssignment.objects.create(user=user, role=self.role)
+        ConcreteContextualUserRoleAssignment.objects.create(user=user, role=self.other_role, context='context-a')
+        get_role_catalog(ConcreteUserRole)
+
+        for role_assignment_class in (ConcreteUserRoleAssignment, ConcreteContextualUserRoleAssignment):
+            assert 'JOIN' not in str(role_assignment_class.get_assignments_queryset(user, ['coupon-manager']).query)
+        for role_assignment_class in (ConcreteUserRoleAssignmentContextFields, ConcreteContextualUserRoleAssignment):
+            assert 'JOIN' not in str(role_assignment_class.get_all_contexts_queryset(user, ['coupon-manager']).query)
+
+        with self.assertNumQueries(1):
+            assert list(ConcreteUserRoleAssignment.get_assignments(user, ['coupon-manager'])) == [
+                ('coupon-manager', 'a-test-context'),
+            ]
+        with self.assertNumQueries(1):
+            assert list(ConcreteContextualUserRoleAssignment.get_assignments(user)) == [
+                ('enterprise_admin', 'context-a'),
+            ]
+        with self.assertNumQueries(1):
+            assert ConcreteContextualUserRoleAssignment.user_has_contexts(user, ['enterprise_admin'], 'context-a')
+
+    def test_async_assignment_queries_use_the_catalog(self):
+        user = User.objects.create(username='test_user')
+        ConcreteUserRoleAssignment.objects.create(user=user, role=self.role)
+        ConcreteContextualUserRoleAssignment.objects.create(user=user, role=self.other_role, context='context-a')
+        get_role_catalog(ConcreteUserRole)
+
+        @async_to_sync
+        async def get_assignments():
+            return [pair async for pair in ConcreteUserRoleAssignment.aget_assignments(user, ['coupon-manager'])]
+
+        with self.assertNumQueries(1):
+            assert get_assignments() == [('coupon-manager', 'a-test-context')]
+        with self.assertNumQueries(1):
+            assert async_to_sync(ConcreteContextualUserRoleAssignment.auser_has_contexts)(
+                user, ['enterprise_admin'], 'context-a',
+            )
+
+    def test_assignments_of_role_created_elsewhere(self):
+        user = User.objects.create(username='test_user')
+        get_role_catalog(ConcreteUserRole)
+        ConcreteUserRole.objects.bulk_create([ConcreteUserRole(name='new-role')])
+        new_role = ConcreteUserRole.objects.get(name='new-role')
+        ConcreteContextualUserRoleAssignment.objects.create(user=user, role=new_role, context='context-a')
+
+        assert ConcreteContextualUserRoleAssignment.user_has_contexts(user, ['new-role'], 'context-a')
+        assert async_to_sync(ConcreteContextualUserRoleAssignment.auser_has_contexts)(
+            user, ['new-role'], 'context-a',
+        )
@@ -0,0 +1,47 @@
+"""
+Tests for the `edx-rbac` role_mapping module.
+"""
+
+from django.test import TestCase, override_settings
+
+from edx_rbac.role_mapping import CompiledRoleMapping, get_role_mapping
+
+
+class TestCompiledRoleMapping(TestCase):
+    """
+    Tests for `CompiledRoleMapping`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.role_mapping = CompiledRoleMapping({
+            'enterprise_admin': ['coupon-management', 'data_api_access'],
+            'enterprise_leaner': [],
+            'coupon-manager': ['coupon-management'],
+        })
+
+    def test_feature_roles_for(self):
+        assert self.role_mapping.feature_roles_for('enterprise_admin') == ('coupon-management', 'data_api_access')
+        assert self.role_mapping.feature_roles_for('enterprise_leaner') == ()
+        assert self.role_mapping.feature_roles_for('not-a-system-role') == ()
+
+    def test_system_roles_for(self):
+        assert self.role_mapping.system_roles_for(['coupon-management']) == {'enterprise_admin', 'coupon-manager'}
+        assert self.role_mapping.system_roles_for(['data_api_access']) == {'enterprise_admin'}
+        assert self.role_mapping.system_roles_for(['data_api_access', 'not-a-feature-role']) == {'enterprise_admin'}
+        assert self.role_mapping.system_roles_for([]) == frozenset()
+
+
+class TestGetRoleMapping(TestCase):
+    """
+    Tests for `get_role_mapping()`.
+    """
+
+    def test_compiled_from_settings(self):
+        assert get_role_mapping().system_roles_for(['enterprise_data_admin']) == {'enterprise_openedx_operator'}
+
+    def test_recompiled_when_setting_changes(self):
+        with override_settings(SYSTEM_TO_FEATURE_ROLE_MAPPING={'some-system-role': ['enterprise_data_admin']}):
+            assert get_role_mapping().system_roles_for(['enterprise_data_admin']) == {'some-system-role'}
+
+        assert get_role_mapping().system_roles_for(['enterprise_data_admin']) == {'enterprise_openedx_operator'}
@@ -2,20 +2,41 @@
 Tests for the `edx-rbac` utilities module.
 """
 
+import threading
 from contextlib import contextmanager
 from unittest import mock
 
+import crum
 import ddt
+from asgiref.sync import async_to_sync
 from django.contrib import auth
 from django.contrib.auth.models import AnonymousUser
 from django.test import RequestFactory, TestCase, override_settings
+from django.utils.functional import SimpleLazyObject
 from jwt.exceptions import InvalidTokenError
 
-from edx_rbac.constants import ALL_ACCESS_CONTEXT, IGNORE_INVALID_JWT_COOKIE_SETTING
+from edx_rbac.claims import get_claim_builder
+from edx_rbac.constants import (
+    ALL_ACCESS_CONTEXT,
+    IGNORE_INVALID_JWT_COOKIE_SETTING,
+    ROLES_CLAIM_OVERFLOW_CONTEXT,
+    ROLES_CLAIM_VERSION_COMPACT
+)
+from edx_rbac.request_cache import request_scope
 from edx_rbac.utils import (
     _user_has_access,
+    acontexts_accessible_from_database,
+    acontexts_accessible_from_databases,
+    acontexts_accessible_from_request,
+    acreate_role_auth_claim_for_user,
+    auser_has_access_via_database,
+    contexts_accessible_from_database,
+    contexts_accessible_from_databases,
+    contexts_accessible_from_jwt,
     contexts_accessible_from_request,
     create_role_auth_claim_for_user,
+    create_role_auth_claims_for_users,
+    get_assignments_of_classes,
     get_decoded_jwt,
     has_access_to_all,
     is_iterable,
@@ -24,12 +45,15 @@ from edx_rbac.utils import (
     user_has_access_via_database
 )
 from tests.models import (
+    ConcreteContextualUserRoleAssignment,
     ConcreteUserRole,
     ConcreteUserRoleAssignment,
+    ConcreteUserRoleAssignmentContextFields,
     ConcreteUserRoleAssignmentDuplicateContexts,
     ConcreteUserRoleAssignmentMultipleContexts,
     ConcreteUserRoleAssignmentNoContext
 )
+from tests.test_models import get_custom_assignments
 
 COUPON_MANAGEMENT_FEATURE_ROLE = 'coupon-management'
 DATA_API_ACCESS_FEATURE_ROLE = 'data_api_access'
@@ -112,6 +136,35 @@ class TestUtils(TestCase):
             'superuser-access',
         )
 
+    def test_request_user_has_implicit_access_via_compact_jwt(self):
+        """
+        Compact roles claims grant the same access as the legacy ones.
+        """
+        toy_decoded_jwt = {
+            "roles": {
+                "v": 2,
+                "r": {
+                    "coupon-manager": ["some_context", "some_other_context"],
+                    "enterprise_openedx_operator": ["*"],
+                },
+            }
+        }
+        assert request_user_has_implicit_access_via_jwt(
+            toy_decoded_jwt,
+            COUPON_MANAGEMENT_FEATURE_ROLE,
+            'some_other_context'
+        )
+        assert not request_user_has_implicit_access_via_jwt(
+            toy_decoded_jwt,
+            COUPON_MANAGEMENT_FEATURE_ROLE,
+            'not_the_right_context'
+        )
+        assert request_user_has_implicit_access_via_jwt(
+            toy_decoded_jwt,
+            'enterprise_data_admin',
+            'any_context'
+        )
+
     def test_request_user_has_no_implicit_access_when_jwt_absent(self):
         """
         Helper function should return False when JWT is absent
@@ -287,6 +340,20 @@ class TestUtils(TestCase):
             request = mock.Mock()
             assert expected_contexts == contexts_accessible_from_request(request, role_names)
 
+    def test_contexts_accessible_from_jwt_stops_at_wildcard(self):
+        """
+        The wildcard subsumes every other context the JWT grants under the requested roles.
+        """
+        toy_decoded_jwt = {
+            "roles": [
+                "coupon-manager:some_context",
+                "enterprise_admin:*",
+                "coupon-manager:some_other_context",
+            ]
+        }
+        assert {ALL_ACCESS_CONTEXT} == contexts_accessible_from_jwt(toy_decoded_jwt, [COUPON_MANAGEMENT_FEATURE_ROLE])
+        assert set() == contexts_accessible_from_jwt(toy_decoded_jwt, ['enterprise_data_admin'])
+
     @ddt.data(
         [COUPON_MANAGEMENT_FEATURE_ROLE, DATA_API_ACCESS_FEATURE_ROLE],
         [],
@@ -402,6 +469,58 @@ class TestUtils(TestCase):
         mock_jwt_from_cookie.assert_called_once_with(request)
         mock_jwt_from_auth.assert_called_once_with(request)
 
+    @mock.patch('edx_rbac.utils.get_decoded_jwt_from_auth', return_value=None)
+    @mock.patch('edx_rbac.utils.get_decoded_jwt_from_cookie')
+    def test_get_decoded_jwt_is_memoized_per_request(self, mock_jwt_from_cookie, mock_jwt_from_auth):
+        request = RequestFactory().get('/')
+
+        assert mock_jwt_from_cookie.return_value == get_decoded_jwt(request)
+        assert mock_jwt_from_cookie.return_value == get_decoded_jwt(request)
+
+        mock_jwt_from_cookie.assert_called_once_with(request)
+        mock_jwt_from_auth.assert_called_once_with(request)
+
+        # A different request decodes its own JWT.
+        get_decoded_jwt(RequestFactory().get('/'))
+        assert mock_jwt_from_cookie.call_count == 2
+
+    @mock.patch('edx_rbac.utils.get_decoded_jwt_from_auth', return_value=None)
+    @mock.patch('edx_rbac.utils.get_decoded_jwt_from_cookie', return_value=None)
+    def test_get_decoded_jwt_does_not_memoize_missing_jwt(self, mock_jwt_from_cookie, mock_jwt_from_auth):
+        request = RequestFactory().get('/')
+
+        assert {} == get_decoded_jwt(request)
+        assert {} == get_decoded_jwt(request)
+
+        assert mock_jwt_from_cookie.call_count == 2
+        assert mock_jwt_from_auth.call_count == 2
+
+    @mock.patch('edx_rbac.utils.get_decoded_jwt_from_auth', return_value=None)
+    @mock.patch('edx_rbac.utils.get_decoded_jwt_from_cookie')
+    def test_get_decoded_jwt_memoizes_invalid_token_errors(self, mock_jwt_from_cookie, mock_jwt_from_auth):
+        request = RequestFactory().get('/')
+        mock_jwt_from_cookie.side_effect = InvalidTokenError('foo')
+
+        for _ in range(2):
+            with self.assertRaises(InvalidTokenError):
+                get_decoded_jwt(request)
+
+        mock_jwt_from_cookie.assert_called_once_with(request)
+        mock_jwt_from_auth.assert_called_once_with(request)
+
+    @override_settings(**{IGNORE_INVALID_JWT_COOKIE_SETTING: True})
+    @mock.patch('edx_rbac.utils.get_decoded_jwt_from_auth', return_value=None)
+    @mock.patch('edx_rbac.utils.get_decoded_jwt_from_cookie')
+    def test_get_decoded_jwt_memoizes_ignored_invalid_token_errors(self, mock_jwt_from_cookie, mock_jwt_from_auth):
+        request = RequestFactory().get('/')
+        mock_jwt_from_cookie.side_effect = InvalidTokenError('foo')
+
+        assert {} == get_decoded_jwt(request)
+        assert {} == get_decoded_jwt(request)
+
+        mock_jwt_from_cookie.assert_called_once_with(request)
+        mock_jwt_from_auth.assert_called_once_with(request)
+
     @ddt.data(
         ({}, False),
         ({ALL_ACCESS_CONTEXT}, True),
@@ -620,6 +739,340 @@ class TestUtilsWithDatabaseRequirements(TestCase):
             'test_context'
         )
 
+    def test_contexts_accessible_from_database_memoized_per_request(self):
+        """
+        Within a request, the user's assignments of a class are fetched once and answered from memory.
+        """
+        other_role = ConcreteUserRole.objects.create(name='other-role')
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=other_role)
+        request = RequestFactory().get('/')
+        request.user = self.user
+        crum.set_current_request(request)
+        self.addCleanup(crum.set_current_request, None)
+
+        with self.create_user_role_assignment(), self.assertNumQueries(1):
+            assert user_has_access_via_database(self.user, 'coupon-manager', ConcreteUserRoleAssignment)
+            assert user_has_access_via_database(
+                self.user, 'coupon-manager', ConcreteUserRoleAssignment, 'a-test-context'
+            )
+            assert not user_has_access_via_database(self.user, 'not-a-role', ConcreteUserRoleAssignment)
+            assert contexts_accessible_from_database(
+                self.user, ['coupon-manager', 'other-role'], ConcreteUserRoleAssignment
+            ).roles == {'coupon-manager', 'other-role'}
+            assert contexts_accessible_from_database(
+                self.user, [], ConcreteUserRoleAssignment
+            ).roles == {'coupon-manager', 'other-role'}
+
+        # A different user, or a different class, is not answered from the request's memory.
+        with self.assertNumQueries(2):
+            other_user = User.objects.create(username='other_user', password='pw')
+            assert not user_has_access_via_database(other_user, 'coupon-manager', ConcreteUserRoleAssignment)
+        with self.assertNumQueries(1):
+            assert not user_has_access_via_database(
+                self.user, 'coupon-manager', ConcreteUserRoleAssignmentMultipleContexts
+            )
+
+    def test_contexts_accessible_from_database_memoized_for_lazy_request_user(self):
+        """
+        The assignments are memoized on the request when its user is a lazy object, as set by Django's
+        authentication middleware, wrapping the user whose access is checked.
+        """
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role)
+        other_role = ConcreteUserRole.objects.create(name='other-role')
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=other_role, context='context-a')
+        classes = [ConcreteUserRoleAssignment, ConcreteContextualUserRoleAssignment]
+        request = RequestFactory().get('/')
+        request.user = SimpleLazyObject(lambda: User.objects.get(pk=self.user.pk))
+        # As when ``request.user.has_perm()`` hands the user it wraps to rules predicates.
+        user = request.user._wrapped if request.user.is_authenticated else None  # pylint: disable=protected-access
+
+        with request_scope(request), self.assertNumQueries(2):
+            assert user_has_access_via_database(user, 'coupon-manager', ConcreteUserRoleAssignment, 'a-test-context')
+            assert async_to_sync(auser_has_access_via_database)(
+                user, 'coupon-manager', ConcreteUserRoleAssignment, 'a-test-context',
+            )
+            assert not user_has_access_via_database(user, 'other-role', ConcreteUserRoleAssignment)
+            assert contexts_accessible_from_databases(user, ['other-role'], classes) == {'context-a'}
+            assert contexts_accessible_from_databases(user, ['coupon-manager'], classes) == {'a-test-context'}
+
+        # A lazy user which was never evaluated isn't evaluated to tell whether it's the checked user.
+        lazy_user = mock.Mock(return_value=self.user)
+        request.user = SimpleLazyObject(lazy_user)
+        with request_scope(request):
+            assert user_has_access_via_database(self.user, 'coupon-manager', ConcreteUserRoleAssignment)
+        lazy_user.assert_not_called()
+
+    def test_all_contexts_assignment_within_a_request(self):
+        """
+        Within a request, an assignment that applies to all contexts is found by the query fetching every assignment.
+        """
+        role_assignment_class = ConcreteUserRoleAssignmentContextFields
+        role_assignment_class.objects.create(user=self.user, role=self.role, applies_to_all_contexts=True)
+        request = RequestFactory().get('/')
+        request.user = self.user
+
+        with request_scope(request), self.assertNumQueries(1):
+            assert user_has_access_via_database(self.user, 'coupon-manager', role_assignment_class, 'any-context')
+            assert async_to_sync(auser_has_access_via_database)(
+                self.user, 'coupon-manager', role_assignment_class, 'any-context'
+            )
+            assert not user_has_access_via_database(self.user, 'other-role', role_assignment_class)
+
+    def test_all_contexts_assignment_short_circuits_database_access(self):
+        """
+        An assignment that applies to all contexts is found with a single query, and grants any context.
+        """
+        role_assignment_class = ConcreteUserRoleAssignmentContextFields
+        role_assignment_class.objects.create(user=self.user, role=self.role, applies_to_all_contexts=True)
+
+        with self.assertNumQueries(1):
+            assert user_has_access_via_database(self.user, 'coupon-manager', role_assignment_class, 'any-context')
+        with self.assertNumQueries(1):
+            access_map = contexts_accessible_from_database(
+                self.user, ['coupon-manager', 'other-role'], role_assignment_class
+            )
+        assert access_map == {ALL_ACCESS_CONTEXT}
+        assert access_map.has_access_to_all(['coupon-manager'])
+
+        # Other roles are still enumerated.
+        with self.assertNumQueries(2):
+            assert not user_has_access_via_database(self.user, 'other-role', role_assignment_class)
+
+    def test_all_contexts_assignment_of_overridden_get_assignments(self):
+        """
+        Classes which override `get_assignments()` are never probed for an assignment that applies to all contexts.
+        """
+        role_assignment_class = ConcreteUserRoleAssignmentContextFields
+        role_assignment_class.objects.create(user=self.user, role=self.role, applies_to_all_contexts=True)
+
+        with mock.patch.object(role_assignment_class, 'get_assignments', classmethod(lambda cls, *args: iter(()))):
+            assert not contexts_accessible_from_database(self.user, ['coupon-manager'], role_assignment_class)
+            assert not user_has_access_via_database(self.user, 'coupon-manager', role_assignment_class, 'x')
+            assert not async_to_sync(auser_has_access_via_database)(
+                self.user, 'coupon-manager', role_assignment_class, 'x',
+            )
+
+    def test_user_has_access_via_contextual_assignments(self):
+        """
+        Context checks against a `ContextualUserRoleAssignment` are a single query, however many contexts there are.
+        """
+        ConcreteContextualUserRoleAssignment.objects.bulk_create([
+            ConcreteContextualUserRoleAssignment(user=self.user, role=self.role, context=f'context-{i}')
+            for i in range(50)
+        ])
+
+        with self.assertNumQueries(1):
+            assert user_has_access_via_database(
+                self.user, 'coupon-manager', ConcreteContextualUserRoleAssignment, ['context-1', 'context-49'],
+            )
+        with self.assertNumQueries(1):
+            assert not user_has_access_via_database(
+                self.user, 'coupon-manager', ConcreteContextualUserRoleAssignment, 'context-50',
+            )
+
+        # Once the request has loaded every assignment, checks are answered from memory.
+        request = RequestFactory().get('/')
+        request.user = self.user
+        crum.set_current_request(request)
+        self.addCleanup(crum.set_current_request, None)
+        contexts_accessible_from_database(self.user, [], ConcreteContextualUserRoleAssignment)
+        with self.assertNumQueries(0):
+            assert user_has_access_via_database(
+                self.user, 'coupon-manager', ConcreteContextualUserRoleAssignment, 'context-1',
+            )
+
+    def test_async_access_checks(self):
+        """
+        The async access checks give the same answers as the sync ones, with the same queries.
+        """
+        other_role = ConcreteUserRole.objects.create(name='other-role')
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role)
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=other_role, applies_to_all_contexts=True)
+        ConcreteUserRoleAssignmentContextFields.objects.create(
+            user=self.user, role=other_role, applies_to_all_contexts=True,
+        )
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context='context-a')
+
+        for role_assignment_class in (
+            ConcreteUserRoleAssignment, ConcreteUserRoleAssignmentContextFields, ConcreteContextualUserRoleAssignment,
+        ):
+            for role_names in (['coupon-manager'], ['other-role'], ['coupon-manager', 'other-role'], []):
+                assert async_to_sync(acontexts_accessible_from_database)(
+                    self.user, role_names, role_assignment_class,
+                ) == contexts_accessible_from_database(self.user, role_names, role_assignment_class)
+            for context in (None, 'a-test-context', 'context-a', ['context-a', 'context-b']):
+                assert async_to_sync(auser_has_access_via_database)(
+                    self.user, 'coupon-manager', role_assignment_class, context,
+                ) == user_has_access_via_database(self.user, 'coupon-manager', role_assignment_class, context)
+
+        with self.assertNumQueries(1):
+            assert async_to_sync(auser_has_access_via_database)(
+                self.user, 'other-role', ConcreteUserRoleAssignmentContextFields, 'any-context',
+            )
+        with self.assertNumQueries(1):
+            assert async_to_sync(auser_has_access_via_database)(
+                self.user, 'coupon-manager', ConcreteContextualUserRoleAssignment, 'context-a',
+            )
+        assert not async_to_sync(auser_has_access_via_database)(
+            AnonymousUser(), 'coupon-manager', ConcreteUserRoleAssignment,
+        )
+
+    def test_async_access_checks_share_the_request_memo(self):
+        """
+        The assignments memoized on the current request are shared by the sync and async access checks.
+        """
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role)
+        request = RequestFactory().get('/')
+        request.user = self.user
+
+        with request_scope(request):
+            with self.assertNumQueries(1):
+                assert async_to_sync(auser_has_access_via_database)(
+                    self.user, 'coupon-manager', ConcreteUserRoleAssignment, 'a-test-context',
+                )
+            with self.assertNumQueries(0):
+                assert async_to_sync(acontexts_accessible_from_database)(
+                    self.user, [], ConcreteUserRoleAssignment,
+                ) == {'a-test-context'}
+                assert user_has_access_via_database(self.user, 'coupon-manager', ConcreteUserRoleAssignment)
+
+    def test_acreate_role_auth_claim_for_user(self):
+        """
+        The async claim is identical to the sync one, and is fetched with the same queries.
+        """
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context='context-a')
+        ConcreteUserRoleAssignmentMultipleContexts.objects.create(user=self.user, role=self.role)
+        claim = create_role_auth_claim_for_user(self.user)
+
+        with self.assertNumQueries(3):
+            assert async_to_sync(acreate_role_auth_claim_for_user)(self.user) == claim
+        assert async_to_sync(acreate_role_auth_claim_for_user)(AnonymousUser()) == (
+            create_role_auth_claim_for_user(AnonymousUser())
+        )
+
+    def test_get_assignments_of_classes(self):
+        """
+        The assignments of every class that supports it are fetched with a single UNION ALL query.
+        """
+        other_role = ConcreteUserRole.objects.create(name='other-role')
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context='context-a')
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=other_role, context='context-b')
+        ConcreteUserRoleAssignmentContextFields.objects.create(
+            user=self.user, role=other_role, applies_to_all_contexts=True,
+        )
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role)
+        classes = [
+            ConcreteContextualUserRoleAssignment,
+            ConcreteUserRoleAssignment,
+            ConcreteUserRoleAssignmentContextFields,
+        ]
+
+        # ConcreteUserRoleAssignment computes its context in Python, so it's queried on its own.
+        with self.assertNumQueries(2):
+            assignments = get_assignments_of_classes(self.user, classes)
+        assert assignments.keys() == set(classes)
+        self.assertCountEqual(assignments[ConcreteContextualUserRoleAssignment], [
+            ('coupon-manager', 'context-a'), ('other-role', 'context-b'),
+        ])
+        assert assignments[ConcreteUserRoleAssignment] == [('coupon-manager', 'a-test-context')]
+        assert assignments[ConcreteUserRoleAssignmentContextFields] == [('other-role', ALL_ACCESS_CONTEXT)]
+
+        assert get_assignments_of_classes(self.user, classes, ['coupon-manager']) == {
+            ConcreteContextualUserRoleAssignment: [('coupon-manager', 'context-a')],
+            ConcreteUserRoleAssignment: [('coupon-manager', 'a-test-context')],
+            ConcreteUserRoleAssignmentContextFields: [],
+        }
+        assert get_assignments_of_classes(AnonymousUser(), classes) == {cls: [] for cls in classes}
+
+    def test_contexts_accessible_from_databases(self):
+        """
+        Contexts accessible through several classes are fetched together, and memoized on the request per class.
+        """
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context='context-a')
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=self.role)
+        classes = [ConcreteContextualUserRoleAssignment, ConcreteUserRoleAssignmentContextFields]
+
+        with self.assertNumQueries(1):
+            assert contexts_accessible_from_databases(self.user, ['coupon-manager'], classes) == {
+                'context-a', 'test_user',
+            }
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        crum.set_current_request(request)
+        self.addCleanup(crum.set_current_request, None)
+        with self.assertNumQueries(1):
+            assert contexts_accessible_from_databases(self.user, ['coupon-manager'], classes).roles == {
+                'coupon-manager',
+            }
+            assert not contexts_accessible_from_databases(self.user, ['other-role'], classes)
+            assert contexts_accessible_from_database(
+                self.user, ['coupon-manager'], ConcreteUserRoleAssignmentContextFields,
+            ) == {'test_user'}
+
+    def test_acontexts_accessible_from_databases(self):
+        """
+        The async contexts accessible through several classes are the sync ones, fetched with the same query.
+        """
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context='context-a')
+        ConcreteUserRoleAssignmentContextFields.objects.create(user=self.user, role=self.role)
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role)
+        classes = [ConcreteContextualUserRoleAssignment, ConcreteUserRoleAssignmentContextFields]
+
+        with self.assertNumQueries(1):
+            assert async_to_sync(acontexts_accessible_from_databases)(self.user, ['coupon-manager'], classes) == {
+                'context-a', 'test_user',
+            }
+        assert async_to_sync(acontexts_accessible_from_databases)(
+            self.user, [], [*classes, ConcreteUserRoleAssignment],
+        ) == contexts_accessible_from_databases(self.user, [], [*classes, ConcreteUserRoleAssignment])
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with request_scope(request), self.assertNumQueries(1):
+            assert async_to_sync(acontexts_accessible_from_databases)(self.user, ['other-role'], classes) == set()
+            assert contexts_accessible_from_databases(self.user, ['coupon-manager'], classes) == {
+                'context-a', 'test_user',
+            }
+
+    def test_contexts_accessible_from_databases_calls_overridden_get_assignments(self):
+        """
+        Classes which override `get_assignments()` are read through it, rather than with the other classes.
+        """
+        ConcreteContextualUserRoleAssignment.objects.create(user=self.user, role=self.role, context='context-a')
+        classes = [ConcreteContextualUserRoleAssignment, ConcreteUserRoleAssignmentContextFields]
+
+        with mock.patch.object(
+            ConcreteUserRoleAssignmentContextFields, 'get_assignments', classmethod(get_custom_assignments),
+        ):
+            assert contexts_accessible_from_databases(self.user, ['coupon-manager', 'custom-role'], classes) == {
+                'context-a', f'custom-context-{self.user.pk}',
+            }
+            assert async_to_sync(acontexts_accessible_from_database)(
+                self.user, ['custom-role'], ConcreteUserRoleAssignmentContextFields,
+            ) == contexts_accessible_from_database(self.user, ['custom-role'], ConcreteUserRoleAssignmentContextFields)
+
+    def test_get_assignments_of_all_contexts_assignment(self):
+        """
+        The context of an assignment that applies to all contexts is the wildcard, for classes which honor the flag.
+        """
+        ConcreteUserRoleAssignment.objects.create(user=self.user, role=self.role, applies_to_all_contexts=True)
+        ConcreteUserRoleAssignmentContextFields.objects.create(
+            user=self.user, role=self.role, applies_to_all_contexts=True,
+        )
+
+        role_assignment_class = ConcreteUserRoleAssignmentContextFields
+        assert list(role_assignment_class.get_assignments(self.user)) == [('coupon-manager', ALL_ACCESS_CONTEXT)]
+        assert role_assignment_class.get_all_contexts_role(self.user) == 'coupon-manager'
+        assert role_assignment_class.get_all_contexts_role(self.user, ['other-role']) is None
+        assert role_assignment_class.get_all_contexts_role(AnonymousUser()) is None
+
+        # Other classes return the context of the assignment, and aren't probed.
+        assert list(ConcreteUserRoleAssignment.get_assignments(self.user)) == [('coupon-manager', 'a-test-context')]
+        with self.assertNumQueries(0):
+            assert ConcreteUserRoleAssignment.get_all_contexts_role(self.user) is None
+        assert 'coupon-manager:a-test-context' in create_role_auth_claim_for_user(self.user)
+
     def test_create_role_auth_claim_for_user(self):
         """
         Helper function should create a list of strings based on the roles
@@ -654,3 +1107,165 @@ class TestUtilsWithDatabaseRequirements(TestCase):
             ]
             actual_claim = create_role_auth_claim_for_user(self.user)
             self.assertCountEqual(expected_claim, actual_claim)
+
+    def test_create_compact_role_auth_claim_for_user(self):
+        """
+        Helper function should group the contexts of each role when asked for the compact claim.
+        """
+        with self.create_user_role_assignment_duplicate_contexts():
+            actual_claim = create_role_auth_claim_for_user(self.user, claim_version=ROLES_CLAIM_VERSION_COMPACT)
+
+        assert actual_claim == {
+            'v': ROLES_CLAIM_VERSION_COMPACT,
+            'r': {
+                'coupon-manager': ['a-test-context', 'a-second-test-context'],
+                'test-role': [''],
+                'test-role2': [str(self.user.id)],
+            },
+        }
+
+    def test_create_role_auth_claim_for_user_within_budget(self):
+        """
+        Helper function should replace the contexts of roles that don't fit in the budget by an overflow marker.
+        """
+        with self.create_user_role_assignment_multiple_contexts():
+            actual_claim = create_role_auth_claim_for_user(self.user, max_claim_bytes=50)
+
+        assert actual_claim == [
+            f'coupon-manager:{ROLES_CLAIM_OVERFLOW_CONTEXT}',
+            'test-role',
+            f'test-role2:{ROLES_CLAIM_OVERFLOW_CONTEXT}',
+        ]
+
+    @override_settings(SYSTEM_WIDE_ROLE_CLASSES=[
+        'tests.ConcreteContextualUserRoleAssignment',
+        'tests.ConcreteUserRoleAssignmentMultipleContexts',
+        'tests.test_assignments.get_assigments',
+        'tests.ConcreteUserRoleAssignmentContextFields',
+    ])
+    def test_create_role_auth_claims_for_users(self):
+        """
+        The claims of many users are created with as many queries as the claim of one user, and are identical to it.
+        """
+        other_role = ConcreteUserRole.objects.create(name='other-role')
+        users = [self.user] + [User.objects.create(username=f'user-{i}') for i in range(3)]
+        for i, user in enumerate(users):
+            ConcreteContextualUserRoleAssignment.objects.create(user=user, role=self.role, context=f'context-{i}')
+            if i % 2:
+                ConcreteUserRoleAssignmentMultipleContexts.objects.create(user=user, role=other_role)
+                ConcreteUserRoleAssignmentContextFields.objects.create(user=user, role=self.role)
+            ConcreteContextualUserRoleAssignment.objects.create(user=user, role=other_role, context='shared')
+
+        with self.assertNumQueries(2):
+            create_role_auth_claim_for_user(self.user)
+        with self.assertNumQueries(2):
+            claims = create_role_auth_claims_for_users(users + [AnonymousUser()])
+
+        assert list(claims) == users + [AnonymousUser()]
+        for user in users:
+            assert claims[user] == create_role_auth_claim_for_user(user)
+        assert claims[users[1]] == [
+            'coupon-manager:context-1',
+            'other-role:shared',
+            'other-role:a-test-context',
+            'other-role:a-second-test-context',
+            'test-role',
+            f'test-role2:{users[1].id}',
+            'coupon-manager:user-0',
+        ]
+
+        with self.assertNumQueries(4):
+            assert get_claim_builder().build_for_users(users, chunk_size=2) == {
+                user: claims[user] for user in users
+            }
+
+
+@override_settings(RBAC_ROLES_CLAIM_OVERFLOW_SOURCE='tests.ConcreteUserRoleAssignmentMultipleContexts')
+class TestRolesClaimOverflow(TestCase):
+    """
+    Tests for resolving roles that overflowed the JWT roles claim.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='test_user', password='pw')
+        role = ConcreteUserRole.objects.create(name='coupon-manager')
+        ConcreteUserRoleAssignmentMultipleContexts.objects.create(user=self.user, role=role)
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+        self.decoded_jwt = {
+            'roles': [
+                f'coupon-manager:{ROLES_CLAIM_OVERFLOW_CONTEXT}',
+                'enterprise_admin:some_context',
+            ]
+        }
+        crum.set_current_request(self.request)
+        self.addCleanup(crum.set_current_request, None)
+
+    def test_contexts_accessible_from_request(self):
+        with mock.patch('edx_rbac.utils.get_decoded_jwt', return_value=self.decoded_jwt):
+            with self.assertNumQueries(1):
+                assert contexts_accessible_from_request(self.request, [COUPON_MANAGEMENT_FEATURE_ROLE]) == {
+                    'a-test-context', 'a-second-test-context', 'some_context',
+                }
+                # The overflow source is only queried once per request.
+                assert contexts_accessible_from_request(self.request, [COUPON_MANAGEMENT_FEATURE_ROLE]) == {
+                    'a-test-context', 'a-second-test-context', 'some_context',
+                }
+
+            with self.assertNumQueries(0):
+                assert contexts_accessible_from_request(self.request, [DATA_API_ACCESS_FEATURE_ROLE]) == {
+                    'some_context',
+                }
+
+    def test_acontexts_accessible_from_request(self):
+        jwt_threads = []
+
+        def decode_jwt(request):
+            jwt_threads.append(threading.current_thread())
+            return self.decoded_jwt
+
+        with mock.patch('edx_rbac.utils.get_decoded_jwt', side_effect=decode_jwt):
+            with self.assertNumQueries(1):
+                assert async_to_sync(acontexts_accessible_from_request)(
+                    self.request, [COUPON_MANAGEMENT_FEATURE_ROLE],
+                ) == contexts_accessible_from_request(self.request, [COUPON_MANAGEMENT_FEATURE_ROLE])
+            assert async_to_sync(acontexts_accessible_from_request)(self.request, [DATA_API_ACCESS_FEATURE_ROLE]) == {
+                'some_context',
+            }
+
+        # The JWT isn't decoded in the thread which runs the ORM.
+        assert jwt_threads[0] is not threading.current_thread()
+
+    def test_request_user_has_implicit_access_via_jwt(self):
+        assert request_user_has_implicit_access_via_jwt(
+            self.decoded_jwt, COUPON_MANAGEMENT_FEATURE_ROLE, 'a-second-test-context'
+        )
+        assert request_user_has_implicit_access_via_jwt(
+            self.decoded_jwt, COUPON_MANAGEMENT_FEATURE_ROLE, 'a-second-test-context', user=self.user
+        )
+        assert not request_user_has_implicit_access_via_jwt(
+            self.decoded_jwt, COUPON_MANAGEMENT_FEATURE_ROLE, 'not_the_right_context'
+        )
+        # The contexts memoized on the request for its user aren't those of another user.
+        other_user = User.objects.create(username='other_user', password='pw')
+        assert not request_user_has_implicit_access_via_jwt(
+            self.decoded_jwt, COUPON_MANAGEMENT_FEATURE_ROLE, 'a-second-test-context', user=other_user
+        )
+
+    @override_settings(RBAC_ROLES_CLAIM_OVERFLOW_SOURCE=None)
+    def test_no_overflow_source(self):
+        assert not request_user_has_implicit_access_via_jwt(
+            self.decoded_jwt, COUPON_MANAGEMENT_FEATURE_ROLE, 'a-second-test-context'
+        )
+        assert request_user_has_implicit_access_via_jwt(
+            self.decoded_jwt, COUPON_MANAGEMENT_FEATURE_ROLE, 'some_context'
+        )
+
+    @override_settings(RBAC_ROLES_CLAIM_OVERFLOW_SOURCE='tests.test_assignments.get_assigments')
+    def test_function_overflow_source(self):
+        decoded_jwt = {'roles': [f'test-role2:{ROLES_CLAIM_OVERFLOW_CONTEXT}']}
+
+        with override_settings(SYSTEM_TO_FEATURE_ROLE_MAPPING={'test-role2': ['test-feature-role']}):
+            assert request_user_has_implicit_access_via_jwt(decoded_jwt, 'test-feature-role', str(self.user.id))
+            assert not request_user_has_implicit_access_via_jwt(decoded_jwt, 'test-feature-role', 'some_context')